@@ -0,0 +1,58 @@
+"""Measure how long a fresh duckstack process takes to import, start its engine and answer a query.
+
+Each run is a new interpreter, so nothing is cached in-process between runs; the
+operating system's file cache stays warm after the first. Reports the median of
+--runs for each step and fails when the total exceeds --max-ms.
+
+    python benchmarks/cold_start.py --runs 5 --max-ms 1500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import duckstack.main as main
+imported = time.perf_counter()
+main.engine.start()
+engine_started = time.perf_counter()
+with main.engine.query_pool.cursor() as cursor:
+    cursor.execute("SELECT count(*) FROM range(1000)").fetchall()
+queried = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "engine_ms": (engine_started - imported) * 1000,
+    "first_query_ms": (queried - engine_started) * 1000,
+    "total_ms": (queried - started) * 1000,
+}))
+"""
+
+
+def probe() -> dict:
+    out = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=0, help="exit 1 when the median total is slower (0 = no limit)")
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    medians = {step: statistics.median(run[step] for run in runs) for step in runs[0]}
+    for step, ms in medians.items():
+        print(f"{step:>15} {ms:8.1f}")
+    if args.max_ms and medians["total_ms"] > args.max_ms:
+        print(f"cold start {medians['total_ms']:.0f} ms exceeds {args.max_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
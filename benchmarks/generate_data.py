@@ -0,0 +1,117 @@
+"""Generate synthetic event data as parquet for benchmarks.
+
+Writes the same `events` table in three layouts under --out:
+
+    events.parquet              one file
+    events_multi/part-*.parquet --files files of equal size
+    events_partitioned/         hive-partitioned by event_date (and region with --partition-region)
+
+Values are derived from the row number, so a given --rows always produces the same data.
+Roughly 22 bytes per row on disk with the default --note-bytes: --rows 100M is about 2 GB per layout.
+
+    python benchmarks/generate_data.py --rows 10M --files 16 --out /tmp/duckstack-bench
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import duckdb
+
+REGIONS = ["us-east", "us-west", "eu-west", "eu-central", "ap-south", "ap-east", "sa-east", "af-south"]
+PRODUCTS = 500
+CUSTOMERS = 100_000
+DAYS = 90
+
+LAYOUTS = ("single", "multi", "partitioned")
+
+
+def parse_count(value: str) -> int:
+    """Parse a row count such as 250000, 10M or 1.5B."""
+    value = value.strip().upper().replace("_", "")
+    scale = {"K": 10**3, "M": 10**6, "B": 10**9}.get(value[-1:], 1)
+    if scale != 1:
+        value = value[:-1]
+    return int(float(value) * scale)
+
+
+def rows_sql(start: int, stop: int, note_bytes: int) -> str:
+    regions = "[" + ", ".join(f"'{r}'" for r in REGIONS) + "]"
+    ts = f"TIMESTAMP '2024-01-01' + to_seconds((i * 7919) % ({DAYS} * 86400))"
+    return f"""
+        SELECT
+            i AS id,
+            {ts} AS ts,
+            CAST({ts} AS DATE) AS event_date,
+            {regions}[1 + {pick(0, len(REGIONS))}] AS region,
+            {pick(1, CUSTOMERS)} AS customer_id,
+            'product-' || {pick(2, PRODUCTS)} AS product,
+            CAST({pick(3, 100_000)} / 100 AS DECIMAL(12, 2)) AS amount,
+            1 + {pick(4, 20)} AS quantity,
+            repeat(chr(97 + {pick(5, 26)}), {note_bytes}) AS note
+        FROM range({start}, {stop}) t(i)
+    """
+
+
+def pick(seed: int, n: int) -> str:
+    """SQL for a pseudo-random integer in [0, n) derived from the row number."""
+    return f"CAST(hash(i, {seed}) % {n} AS INTEGER)"
+
+
+def copy(conn: duckdb.DuckDBPyConnection, query: str, target: Path, options: str = "") -> None:
+    conn.execute(f"COPY ({query}) TO '{target}' (FORMAT parquet, ROW_GROUP_SIZE 122880{options})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=parse_count, default=parse_count("1M"), help="rows per layout, e.g. 10M")
+    parser.add_argument("--files", type=int, default=8, help="files in the multi-file layout")
+    parser.add_argument("--note-bytes", type=int, default=16, help="width of the padding text column")
+    parser.add_argument("--partition-region", action="store_true", help="partition by region as well as date")
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=list(LAYOUTS))
+    parser.add_argument("--out", type=Path, default=Path(__file__).resolve().parent / "data")
+    parser.add_argument("--threads", type=int, default=None, help="DuckDB threads (default: all cores)")
+    args = parser.parse_args()
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    conn = duckdb.connect()
+    if args.threads:
+        conn.execute(f"SET threads = {args.threads}")
+    conn.execute("SET preserve_insertion_order = false")
+
+    for layout in args.layouts:
+        started = time.perf_counter()
+        if layout == "single":
+            target = args.out / "events.parquet"
+            copy(conn, rows_sql(0, args.rows, args.note_bytes), target)
+            files = [target]
+        elif layout == "multi":
+            target = args.out / "events_multi"
+            target.mkdir(exist_ok=True)
+            for old in target.glob("*.parquet"):
+                old.unlink()
+            step = -(-args.rows // args.files)
+            files = []
+            for n, start in enumerate(range(0, args.rows, step)):
+                path = target / f"part-{n:04d}.parquet"
+                copy(conn, rows_sql(start, min(start + step, args.rows), args.note_bytes), path)
+                files.append(path)
+        else:
+            target = args.out / "events_partitioned"
+            columns = "event_date, region" if args.partition_region else "event_date"
+            copy(
+                conn,
+                rows_sql(0, args.rows, args.note_bytes),
+                target,
+                f", PARTITION_BY ({columns}), OVERWRITE true",
+            )
+            files = list(target.rglob("*.parquet"))
+        size = sum(f.stat().st_size for f in files)
+        print(
+            f"{layout:<12} {target}  {len(files)} files  {size / 2**20:,.1f} MiB  "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
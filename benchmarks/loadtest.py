@@ -0,0 +1,314 @@
+"""Load-test a running duckstack server and compare the run against a stored baseline.
+
+Each scenario is run at every --concurrency level: that many clients send requests back to
+back until --requests have completed, after --warmup untimed ones. Throughput and
+p50/p95/p99 latency are reported per scenario and level.
+
+Scenarios that need the catalog (datasets, API sources) are skipped when the server has no
+DATABASE_URL; API source scenarios also need --stub-url (see stub_api.py). Data paths are
+as seen by the server, so start it on the same machine as generate_data.py wrote to.
+
+    python benchmarks/generate_data.py --rows 1M --out /tmp/duckstack-bench
+    python benchmarks/stub_api.py --port 8900 &
+    python benchmarks/loadtest.py --data-dir /tmp/duckstack-bench --stub-url http://127.0.0.1:8900 \\
+        --baseline benchmarks/baselines/local-1M.json
+
+A run regresses when a scenario's p95 latency grows, or its throughput drops, by more than
+--tolerance against the baseline, or when it fails requests the baseline didn't; the exit
+status is then 1. --save-baseline writes the run as the new baseline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PREFIX = "bench_"
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    # Request body for the i-th request, so requests can vary (and miss caches) deliberately
+    body: Callable[[int], dict] | None = None
+    headers: dict | None = None
+    needs_catalog: bool = False
+    needs_stub: bool = False
+
+
+def scenarios(data_dir: Path) -> list[Scenario]:
+    single = f"'{data_dir / 'events.parquet'}'"
+    multi = f"'{data_dir / 'events_multi' / '*.parquet'}'"
+
+    def query(sql: Callable[[int], str], **extra) -> Callable[[int], dict]:
+        return lambda i: {"sql": sql(i), **extra}
+
+    return [
+        Scenario("query_point", "POST", "/query", query(lambda i: f"SELECT * FROM {single} WHERE id = {i * 7919}")),
+        Scenario(
+            "query_aggregate",
+            "POST",
+            "/query",
+            query(
+                lambda i: f"SELECT region, count(*), sum(amount) FROM {multi} "
+                f"WHERE quantity > {i % 20} GROUP BY region"
+            ),
+        ),
+        Scenario(
+            "query_cached",
+            "POST",
+            "/query",
+            query(
+                lambda i: f"SELECT product, sum(amount) FROM {multi} GROUP BY product ORDER BY 2 DESC LIMIT 20",
+                cache=True,
+            ),
+        ),
+        Scenario(
+            "query_params",
+            "POST",
+            "/query",
+            lambda i: {"sql": f"SELECT count(*) FROM {single} WHERE customer_id = $1", "params": [i % 100_000]},
+        ),
+        Scenario(
+            "query_arrow",
+            "POST",
+            "/query",
+            query(lambda i: f"SELECT * FROM {single} LIMIT 50000 OFFSET {i % 10 * 1000}"),
+            headers={"Accept": ARROW_STREAM},
+        ),
+        Scenario(
+            "query_columnar",
+            "POST",
+            "/query",
+            query(lambda i: f"SELECT * FROM {single} LIMIT 10000 OFFSET {i % 10 * 1000}", format="columnar"),
+        ),
+        Scenario(
+            "query_partition_pruned",
+            "POST",
+            "/query",
+            query(
+                lambda i: f"SELECT region, sum(amount) FROM {PREFIX}events_partitioned "
+                f"WHERE event_date = DATE '2024-01-01' + INTERVAL {i % 90} DAY GROUP BY region"
+            ),
+            needs_catalog=True,
+        ),
+        Scenario(
+            "api_query",
+            "POST",
+            "/api-query",
+            lambda i: {"source": f"{PREFIX}stub", "params": {"symbol": f"S{i % 20}"}},
+            needs_catalog=True,
+            needs_stub=True,
+        ),
+        Scenario(
+            "api_query_sql",
+            "POST",
+            "/api-query",
+            lambda i: {
+                "source": f"{PREFIX}stub",
+                "params": {"symbol": f"S{i % 20}"},
+                "sql": f"SELECT count(*), avg(price) FROM {PREFIX}stub WHERE volume > {i % 1000}",
+            },
+            needs_catalog=True,
+            needs_stub=True,
+        ),
+        Scenario("catalog_list_datasets", "GET", "/datasets", needs_catalog=True),
+        Scenario("catalog_get_dataset", "GET", f"/datasets/{PREFIX}events", needs_catalog=True),
+        Scenario("catalog_list_api_sources", "GET", "/api-sources", needs_catalog=True),
+    ]
+
+
+async def setup_catalog(client: httpx.AsyncClient, data_dir: Path, stub_url: str | None) -> bool:
+    """Register the benchmark datasets and API source; False when the server has no catalog."""
+    if (await client.get("/datasets")).status_code == 503:
+        return False
+    datasets = [
+        {"name": f"{PREFIX}events", "path": str(data_dir / "events.parquet")},
+        {
+            "name": f"{PREFIX}events_partitioned",
+            "path": str(data_dir / "events_partitioned"),
+            "partition_columns": ["event_date"],
+        },
+    ]
+    for dataset in datasets:
+        await client.delete(f"/datasets/{dataset['name']}")
+        (await client.post("/datasets", json=dataset)).raise_for_status()
+    if stub_url:
+        await client.delete(f"/api-sources/{PREFIX}stub")
+        source = {
+            "name": f"{PREFIX}stub",
+            "endpoint_url": f"{stub_url.rstrip('/')}/records",
+            "response_path": "results",
+            "ttl_seconds": 60,
+            "pagination": {"type": "offset", "page_size": 500, "concurrency": 4},
+        }
+        (await client.post("/api-sources", json=source)).raise_for_status()
+    return True
+
+
+async def run_level(
+    client: httpx.AsyncClient, scenario: Scenario, concurrency: int, requests: int, warmup: int
+) -> dict:
+    latencies: list[float] = []
+    errors = 0
+
+    async def send(i: int) -> bool:
+        body = scenario.body(i) if scenario.body else None
+        resp = await client.request(scenario.method, scenario.path, json=body, headers=scenario.headers)
+        return resp.is_success
+
+    for i in range(warmup):
+        await send(i)
+    counter = iter(range(warmup, warmup + requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                ok = await send(i)
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    """The pct-th percentile of sorted values, interpolating between the closest ranks."""
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def compare(run: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Describe every scenario and level of run that regressed against baseline."""
+    regressions = []
+    for name, levels in run["results"].items():
+        for level, result in levels.items():
+            base = baseline["results"].get(name, {}).get(level)
+            if base is None:
+                continue
+            where = f"{name} @ {level}"
+            if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{where}: p95 {base['p95_ms']} -> {result['p95_ms']} ms")
+            if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{where}: throughput {base['throughput_rps']} -> {result['throughput_rps']} req/s"
+                )
+            if result["errors"] > base["errors"]:
+                regressions.append(f"{where}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+def report(run: dict, baseline: dict | None) -> None:
+    print(
+        f"{'scenario':<26} {'conc':>4} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>6}"
+        "  vs baseline p95"
+    )
+    for name, levels in run["results"].items():
+        for level, r in levels.items():
+            base = (baseline or {}).get("results", {}).get(name, {}).get(level)
+            delta = f"{(r['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%" if base and base["p95_ms"] else ""
+            print(
+                f"{name:<26} {level:>4} {r['throughput_rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} "
+                f"{r['p99_ms']:>9} {r['errors']:>6}  {delta}"
+            )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        has_catalog = await setup_catalog(client, args.data_dir, args.stub_url)
+        results: dict[str, dict] = {}
+        for scenario in scenarios(args.data_dir):
+            if args.scenarios and scenario.name not in args.scenarios:
+                continue
+            if (scenario.needs_catalog and not has_catalog) or (scenario.needs_stub and not args.stub_url):
+                print(f"skipping {scenario.name}: needs {'the catalog' if not has_catalog else '--stub-url'}")
+                continue
+            results[scenario.name] = {}
+            for concurrency in args.concurrency:
+                results[scenario.name][str(concurrency)] = await run_level(
+                    client, scenario, concurrency, args.requests, args.warmup
+                )
+    return {
+        "meta": {
+            "label": args.label,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "url": args.url,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "machine": f"{platform.machine()} {platform.system()}, python {platform.python_version()}",
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="duckstack base URL")
+    parser.add_argument("--data-dir", type=Path, default=Path(__file__).resolve().parent / "data")
+    parser.add_argument("--stub-url", help="stub API base URL, e.g. http://127.0.0.1:8900")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests before each level")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--scenarios", nargs="+", help="run only these scenarios")
+    parser.add_argument("--output", type=Path, help="write the run's results here")
+    parser.add_argument("--baseline", type=Path, help="compare against this baseline")
+    parser.add_argument("--save-baseline", type=Path, help="write the run's results as a baseline here")
+    parser.add_argument("--label", default="", help="describe the setup (data size, stub knobs) in the output")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown, e.g. 0.25")
+    args = parser.parse_args()
+    args.data_dir = args.data_dir.resolve()
+
+    result = asyncio.run(run(args))
+    baseline = json.loads(args.baseline.read_text()) if args.baseline and args.baseline.exists() else None
+    report(result, baseline)
+    for path in (args.output, args.save_baseline):
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(result, indent=2) + "\n")
+
+    if baseline is not None:
+        regressions = compare(result, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
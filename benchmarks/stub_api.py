@@ -0,0 +1,66 @@
+"""A local HTTP API standing in for API sources during benchmarks.
+
+Serves GET /records, a JSON API with offset pagination (`limit`/`offset`) and a `next` cursor
+token, so it works with the `none`, `offset` and `cursor` pagination types:
+
+    {"results": [{"id": 0, "symbol": "S0", "price": 10.5, "volume": 120, "note": "..."}, ...], "next": "100"}
+
+Each response is delayed by --latency-ms (plus up to --jitter-ms), and --row-bytes pads every
+record so payload size can be scaled independently of the row count.
+
+    python benchmarks/stub_api.py --port 8900 --rows 5000 --latency-ms 50 --row-bytes 200
+"""
+
+import argparse
+import asyncio
+import json
+import random
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+
+def create_app(rows: int, latency_ms: float, jitter_ms: float, row_bytes: int) -> Starlette:
+    padding = "x" * max(row_bytes, 0)
+
+    async def records(request: Request) -> Response:
+        delay = latency_ms + random.uniform(0, jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        params = request.query_params
+        offset = int(params.get("offset") or params.get("cursor") or 0)
+        limit = int(params.get("limit") or rows)
+        stop = min(offset + limit, rows)
+        # Any query parameter not used for paging (e.g. symbol=) is echoed into every record
+        tag = {k: v for k, v in params.items() if k not in ("limit", "offset", "cursor")}
+        body = {
+            "results": [
+                {"id": i, "symbol": f"S{i % 100}", "price": round(10 + i % 997 / 10, 2), "volume": i % 5000,
+                 "note": padding, **tag}
+                for i in range(offset, stop)
+            ],
+            "next": str(stop) if stop < rows else None,
+        }
+        return Response(json.dumps(body), media_type="application/json")
+
+    return Starlette(routes=[Route("/records", records)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--rows", type=int, default=1000, help="records available in total")
+    parser.add_argument("--latency-ms", type=float, default=20, help="delay before each response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="extra random delay, up to this much")
+    parser.add_argument("--row-bytes", type=int, default=64, help="padding added to every record")
+    args = parser.parse_args()
+    app = create_app(args.rows, args.latency_ms, args.jitter_ms, args.row_bytes)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,83 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
 import os
 
-import duckdb
 import httpx
+import pyarrow as pa
+from starlette.concurrency import run_in_threadpool
 
-from duckstack import cache
+from duckstack import cache, metrics
+from duckstack.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upstream fetches currently running, by cache key; concurrent misses share one
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build the process-wide pooled client used for every API source."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        ),
+        timeout=settings.http_timeout_seconds,
+        http2=settings.http2,
+    )
 
 
 async def fetch_api_data(
-    source: dict, runtime_params: dict, db: duckdb.DuckDBPyConnection
-) -> tuple[list[str], list[list], bool]:
-    """Fetch from an external API, cache the result, and return (columns, rows, was_cached)."""
+    source: dict, runtime_params: dict, client: httpx.AsyncClient
+) -> tuple[pa.Table, bool, bool]:
+    """Fetch from an external API, cache the result, and return (table, was_cached, is_stale).
+
+    An entry past its TTL but still inside the source's stale_ttl_seconds
+    window is returned straight away, flagged as stale, while a background
+    fetch replaces it.
+    """
+    params, headers, cache_key = _prepare_request(source, runtime_params)
+
+    # Check cache
+    found = await cache.lookup_async(cache_key)
+    if found is not None:
+        table, fresh_for = found
+        if fresh_for <= 0:
+            _start_fetch(source, params, headers, cache_key, client)
+        return table, True, fresh_for <= 0
+
+    return await asyncio.shield(_start_fetch(source, params, headers, cache_key, client)), False, False
+
+
+async def prewarm_forever(catalog_cache, client: httpx.AsyncClient, interval_seconds: float) -> None:
+    """Keep every source's prewarm_params fresh; run as a background task."""
+    while True:
+        try:
+            sources = catalog_cache.list_prewarm_sources()
+            await asyncio.gather(*(_prewarm(source, client, interval_seconds) for source in sources))
+        except Exception:
+            logger.exception("API source pre-warm pass failed")
+        await asyncio.sleep(interval_seconds)
+
+
+async def _prewarm(source: dict, client: httpx.AsyncClient, interval_seconds: float) -> None:
+    fetches = []
+    for runtime_params in source["prewarm_params"]:
+        params, headers, cache_key = _prepare_request(source, runtime_params)
+        fresh_for = await cache.freshness(cache_key)
+        # Refresh anything that would otherwise go stale before the next pass
+        if fresh_for is None or fresh_for <= 2 * interval_seconds:
+            fetches.append(asyncio.shield(_start_fetch(source, params, headers, cache_key, client)))
+    # Failures are logged by _fetch_done; one bad parameter set shouldn't stop the rest
+    await asyncio.gather(*fetches, return_exceptions=True)
+
+
+def _prepare_request(source: dict, runtime_params: dict) -> tuple[dict, dict[str, str], str]:
+    """Return the (params, headers, cache_key) for one call to source."""
 
     # Merge query params: source defaults + runtime overrides
     params = {**source["query_params"], **runtime_params}
@@ -27,30 +92,147 @@ async def fetch_api_data(
     elif source["auth_header"] and api_key:
         headers[source["auth_header"]] = f"Bearer {api_key}"
 
-    # Check cache
     cache_key = f"{source['name']}:{sorted(params.items())}"
-    cached_data = cache.get(cache_key)
-    if cached_data is not None:
-        return cached_data[0], cached_data[1], True
-
-    # Fetch from API
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            source["endpoint_url"], params=params, headers=headers, timeout=30.0
-        )
+    return params, headers, cache_key
+
+
+def _start_fetch(
+    source: dict, params: dict, headers: dict[str, str], cache_key: str, client: httpx.AsyncClient
+) -> asyncio.Task:
+    # Join a fetch already in flight for this key, or start one. The fetch runs
+    # as its own task so one caller disconnecting doesn't cancel it for the rest.
+    task = _inflight.get(cache_key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_and_cache(source, params, headers, cache_key, client))
+        _inflight[cache_key] = task
+        task.add_done_callback(lambda t: _fetch_done(cache_key, t))
+    return task
+
+
+async def _fetch_and_cache(
+    source: dict,
+    params: dict,
+    headers: dict[str, str],
+    cache_key: str,
+    client: httpx.AsyncClient,
+) -> pa.Table:
+    pagination = source.get("pagination") or {}
+    strategy = pagination.get("type", "none")
+    if strategy in ("offset", "page"):
+        pages = await _fetch_numbered_pages(source, params, headers, client, pagination)
+    elif strategy in ("cursor", "link"):
+        pages = await _fetch_chained_pages(source, params, headers, client, pagination)
+    else:
+        table, _, _ = await _fetch_page(source, source["endpoint_url"], params, headers, client)
+        pages = [table]
+
+    with metrics.phase("convert"):
+        table = await run_in_threadpool(_concat_pages, pages)
+
+    # Cache; off the event loop, since the shared tier writes a file
+    await run_in_threadpool(cache.put, cache_key, table, source["ttl_seconds"], source.get("stale_ttl_seconds", 0))
+
+    return table
+
+
+async def _fetch_page(
+    source: dict, url: str | httpx.URL, params: dict | None, headers: dict[str, str], client: httpx.AsyncClient
+) -> tuple[pa.Table, httpx.Response, dict]:
+    """GET one page and return (rows as Arrow, response, decoded body)."""
+    with metrics.phase("upstream"):
+        resp = await client.get(url, params=params, headers=headers)
         resp.raise_for_status()
+    with metrics.phase("convert"):
         json_data = resp.json()
 
-    # Extract data array using response_path
-    data = _extract_path(json_data, source["response_path"])
+        # Extract data array using response_path
+        data = _extract_path(json_data, source["response_path"])
+
+        # Convert straight to Arrow; only the columnar page outlives this call
+        return await run_in_threadpool(_to_arrow, data), resp, json_data
+
+
+async def _fetch_numbered_pages(
+    source: dict, params: dict, headers: dict[str, str], client: httpx.AsyncClient, pagination: dict
+) -> list[pa.Table]:
+    """Fetch offset/limit or page-number pages, `concurrency` pages at a time.
+
+    The total page count is unknown up front, so pages are requested in
+    waves until one comes back short (fewer than page_size rows) or
+    max_pages is reached.
+    """
+    page_size = pagination.get("page_size", 100)
+    max_pages = pagination.get("max_pages", 100)
+    fan_out = max(1, pagination.get("concurrency", 4))
+
+    def page_params(index: int) -> dict:
+        if pagination["type"] == "offset":
+            position = {pagination.get("offset_param", "offset"): str(index * page_size)}
+        else:
+            position = {pagination.get("page_param", "page"): str(pagination.get("first_page", 1) + index)}
+        return {**params, pagination.get("limit_param", "limit"): str(page_size), **position}
+
+    pages = []
+    for start in range(0, max_pages, fan_out):
+        wave = range(start, min(start + fan_out, max_pages))
+        results = await asyncio.gather(
+            *(_fetch_page(source, source["endpoint_url"], page_params(i), headers, client) for i in wave)
+        )
+        for table, _, _ in results:
+            pages.append(table)
+            if table.num_rows < page_size:
+                return pages
+    return pages
+
 
-    # Convert to tabular via DuckDB
-    columns, rows = _to_tabular(data, db)
+async def _fetch_chained_pages(
+    source: dict, params: dict, headers: dict[str, str], client: httpx.AsyncClient, pagination: dict
+) -> list[pa.Table]:
+    """Fetch cursor/next-token or Link-header pages, each one naming the next."""
+    max_pages = pagination.get("max_pages", 100)
+    url = source["endpoint_url"]
+    pages = []
+    while len(pages) < max_pages:
+        table, resp, json_data = await _fetch_page(source, url, params, headers, client)
+        pages.append(table)
 
-    # Cache
-    cache.put(cache_key, (columns, rows), source["ttl_seconds"])
+        if pagination["type"] == "cursor":
+            token = _lookup(json_data, pagination.get("next_cursor_path", "next"))
+            if not token:
+                break
+            params = {**params, pagination.get("cursor_param", "cursor"): str(token)}
+        else:
+            next_url = resp.links.get("next", {}).get("url")
+            if not next_url:
+                break
+            # The next link carries its own query string; only re-send the API key
+            url = httpx.URL(next_url)
+            api_key_param = source["api_key_param"]
+            if api_key_param in params:
+                url = url.copy_merge_params({api_key_param: params[api_key_param]})
+            params = None
+    return pages
 
-    return columns, rows, False
+
+def _concat_pages(pages: list[pa.Table]) -> pa.Table:
+    tables = [table for table in pages if table.num_columns]
+    if not tables:
+        return pa.table({})
+    if len(tables) == 1:
+        return tables[0]
+    try:
+        # Unifies schemas across pages: missing columns become nulls, types widen
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return _to_arrow([row for table in tables for row in table.to_pylist()])
+
+
+def _fetch_done(cache_key: str, task: asyncio.Task) -> None:
+    if _inflight.get(cache_key) is task:
+        del _inflight[cache_key]
+    # Retrieve the exception even if every waiter has gone away (e.g. a background refresh)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Fetch for %s failed: %s", cache_key.split(":", 1)[0], task.exception())
 
 
 def _resolve_api_key(source: dict) -> str:
@@ -68,12 +250,38 @@ def _extract_path(data: dict, path: str) -> list[dict]:
     return data
 
 
-def _to_tabular(
-    records: list[dict], db: duckdb.DuckDBPyConnection
-) -> tuple[list[str], list[list]]:
-    """Use DuckDB read_json_auto to convert a list of dicts to columns+rows."""
-    json_str = json.dumps(records)
-    result = db.execute("SELECT * FROM read_json_auto(?)", [json_str])
-    columns = [desc[0] for desc in result.description]
-    rows = [list(r) for r in result.fetchall()]
-    return columns, rows
+def _lookup(data: dict, path: str):
+    """Like _extract_path, but returns None when any key along the path is missing."""
+    for key in path.split("."):
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def _to_arrow(records: list[dict]) -> pa.Table:
+    """Convert a list of JSON objects to an Arrow table, one column per key."""
+    if not records:
+        return pa.table({})
+    try:
+        # Infers one struct type across all records, so keys missing from
+        # some records become nulls rather than being dropped
+        return pa.Table.from_struct_array(pa.array(records))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return _to_arrow_by_column(records)
+
+
+def _to_arrow_by_column(records: list[dict]) -> pa.Table:
+    names = list(dict.fromkeys(key for record in records for key in record))
+    columns = {}
+    for name in names:
+        values = [record.get(name) for record in records]
+        try:
+            columns[name] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed types in one field: keep the values as text
+            columns[name] = pa.array(
+                [v if v is None or isinstance(v, str) else json.dumps(v) for v in values],
+                pa.string(),
+            )
+    return pa.table(columns)
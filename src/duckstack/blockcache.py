@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_TMP_SUFFIX = ".tmp"
+
+
+class BlockCache:
+    """A read-through cache of fixed-size object blocks on local disk.
+
+    Each block is one file, named by a hash of the object path, its ETag
+    and the block's position, so a rewritten object (new ETag) never hits
+    stale blocks. The in-memory index is rebuilt from the directory at
+    startup, oldest-accessed first, so the LRU order survives restarts.
+    Blocks are written to a temporary file and renamed into place, so a
+    crash can leave stray temporaries (removed on recovery) but never a
+    torn block.
+    """
+
+    def __init__(self, directory: str | os.PathLike, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        # key -> size, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._recover()
+
+    @staticmethod
+    def block_key(path: str, etag: str, start: int, end: int) -> str:
+        return hashlib.sha256(f"{path}\0{etag}\0{start}\0{end}".encode()).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            known = key in self._entries
+            if known:
+                self._entries.move_to_end(key)
+        if known:
+            path = self._file(key)
+            try:
+                data = path.read_bytes()
+                # Recovery orders blocks by mtime, so keep it tracking the last access
+                os.utime(path)
+            except FileNotFoundError:
+                # Removed behind our back; forget it and treat it as a miss
+                with self._lock:
+                    size = self._entries.pop(key, None)
+                    if size is not None:
+                        self._bytes -= size
+            else:
+                with self._lock:
+                    self._hits += 1
+                return data
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        size = len(data)
+        if size > self.max_bytes:
+            return
+        target = self._file(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{uuid.uuid4().hex}{_TMP_SUFFIX}")
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old
+            self._entries[key] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest, oldest_size = self._entries.popitem(last=False)
+                self._bytes -= oldest_size
+                self._evictions += 1
+                evicted.append(oldest)
+        for key in evicted:
+            self._file(key).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "blocks": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+    def _file(self, key: str) -> Path:
+        # Fan out over subdirectories so no single directory gets huge
+        return self.directory / key[:2] / key
+
+    def _recover(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        found = []
+        for entry in self.directory.glob("*/*"):
+            if entry.name.endswith(_TMP_SUFFIX):
+                entry.unlink(missing_ok=True)
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            found.append((st.st_mtime, entry.name, st.st_size))
+        found.sort()
+        for _, key, size in found:
+            self._entries[key] = size
+            self._bytes += size
+        if found:
+            logger.info("Recovered %d cached blocks (%d bytes) from %s", len(found), self._bytes, self.directory)
+        # The capacity may have been lowered since the last run
+        evicted = []
+        while self._bytes > self.max_bytes:
+            oldest, oldest_size = self._entries.popitem(last=False)
+            self._bytes -= oldest_size
+            evicted.append(oldest)
+        for key in evicted:
+            self._file(key).unlink(missing_ok=True)
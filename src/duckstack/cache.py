@@ -1,27 +1,242 @@
 from __future__ import annotations
 
+import asyncio
+import sys
+import threading
 import time
+from collections import OrderedDict
 from typing import Any
 
-_cache: dict[str, tuple[float, Any]] = {}
+import pyarrow as pa
+from starlette.concurrency import run_in_threadpool
+
+from duckstack.config import settings
+from duckstack.sharedcache import SharedCache
+
+
+class ResultCache:
+    """Thread-safe TTL cache with LRU eviction under a byte budget.
+
+    Every operation holds the lock only for O(1) dictionary work, so the
+    cache can be used from both the event loop and threadpool workers.
+    Expired entries are dropped when read and by sweep(), which the
+    service runs periodically in the background.
+
+    An entry can outlive its TTL by stale_seconds. get() never returns it
+    once the TTL has passed, but lookup() does, flagged as stale, so a
+    caller can serve it while fetching a replacement.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        # key -> (fresh_until, expires_at, size, value)
+        self._entries: OrderedDict[str, tuple[float, float, int, Any]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: str) -> Any | None:
+        found = self._lookup(key, touch=True, allow_stale=False)
+        return None if found is None else found[0]
+
+    def lookup(self, key: str, touch: bool = True) -> tuple[Any, float] | None:
+        """Return (value, seconds of freshness left), including stale entries.
+
+        Freshness left is <= 0 for an entry past its TTL but still inside its
+        stale window. With touch=False the lookup doesn't count towards the
+        hit/miss statistics or LRU order.
+        """
+        return self._lookup(key, touch, allow_stale=True)
+
+    def put(self, key: str, value: Any, ttl_seconds: float, stale_seconds: float = 0) -> None:
+        size = sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if size > self.max_bytes:
+                # Caching it would evict everything else for one oversized entry
+                return
+            fresh_until = time.monotonic() + ttl_seconds
+            self._entries[key] = (fresh_until, fresh_until + stale_seconds, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest, oldest_entry = next(iter(self._entries.items()))
+                self._remove(oldest, oldest_entry[2])
+                self._evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._remove(key, entry[2])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """Drop every expired entry and return how many were removed."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [(k, e[2]) for k, e in self._entries.items() if now >= e[1]]
+            for key, size in expired:
+                self._remove(key, size)
+            self._expirations += len(expired)
+        return len(expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+    def _lookup(self, key: str, touch: bool, allow_stale: bool) -> tuple[Any, float] | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry[1]:
+                self._remove(key, entry[2])
+                self._expirations += 1
+                entry = None
+            if entry is not None and not allow_stale and now >= entry[0]:
+                entry = None
+            if entry is None:
+                if touch:
+                    self._misses += 1
+                return None
+            if touch:
+                self._entries.move_to_end(key)
+                self._hits += 1
+            return entry[3], entry[0] - now
+
+    def _remove(self, key: str, size: int) -> None:
+        del self._entries[key]
+        self._bytes -= size
+
+
+def sizeof(value: Any) -> int:
+    """Approximate the memory held by a cached value, in bytes."""
+    # Arrow tables and record batches know their own buffer sizes
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+
+    total = 0
+    seen: set[int] = set()
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return total
+
+
+_cache = ResultCache(settings.cache_max_bytes)
+# Arrow tables are also published here for the other worker processes on this host
+_shared = SharedCache(settings.shared_cache_dir, settings.shared_cache_max_bytes) if settings.shared_cache_dir else None
 
 
 def get(key: str) -> Any | None:
-    if key in _cache:
-        expires_at, value = _cache[key]
-        if time.time() < expires_at:
-            return value
-        del _cache[key]
+    value = _cache.get(key)
+    if value is None and _shared is not None:
+        found = _from_shared(key, touch=True)
+        if found is not None and found[1] > 0:
+            value = found[0]
+    return value
+
+
+def lookup(key: str, touch: bool = True) -> tuple[Any, float] | None:
+    found = _cache.lookup(key, touch)
+    if found is None and _shared is not None:
+        found = _from_shared(key, touch)
+    return found
+
+
+async def lookup_async(key: str) -> tuple[Any, float] | None:
+    """lookup() for the event loop: reading the shared tier is file I/O, so it runs in the threadpool."""
+    found = _cache.lookup(key)
+    if found is None and _shared is not None:
+        found = await run_in_threadpool(_from_shared, key, True)
+    return found
+
+
+async def freshness(key: str) -> float | None:
+    """Seconds of freshness key has left (<= 0 when stale), None when it isn't cached.
+
+    Doesn't count towards the statistics or LRU order, and reads only the
+    shared tier's metadata, not the value.
+    """
+    found = _cache.lookup(key, touch=False)
+    if found is not None:
+        return found[1]
+    if _shared is not None:
+        return await run_in_threadpool(_shared.freshness, key)
     return None
 
 
-def put(key: str, value: Any, ttl_seconds: int) -> None:
-    _cache[key] = (time.time() + ttl_seconds, value)
+def put(key: str, value: Any, ttl_seconds: int, stale_seconds: int = 0) -> None:
+    """Cache value in this process, and an Arrow table for every worker when the shared tier is on.
+
+    Writing the shared tier does file I/O, so call this off the event loop.
+    """
+    _cache.put(key, value, ttl_seconds, stale_seconds)
+    if _shared is not None and isinstance(value, pa.Table):
+        _shared.put(key, value, ttl_seconds, stale_seconds)
 
 
 def invalidate(key: str) -> None:
-    _cache.pop(key, None)
+    _cache.invalidate(key)
+    if _shared is not None:
+        _shared.invalidate(key)
 
 
 def clear() -> None:
     _cache.clear()
+    if _shared is not None:
+        _shared.clear()
+
+
+def stats() -> dict:
+    return _cache.stats()
+
+
+def shared_stats() -> dict:
+    return _shared.stats() if _shared is not None else {}
+
+
+async def sweep_forever(interval_seconds: float) -> None:
+    """Periodically drop expired entries; run as a background task."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        _cache.sweep()
+        if _shared is not None:
+            await run_in_threadpool(_shared.sweep)
+
+
+def _from_shared(key: str, touch: bool) -> tuple[Any, float] | None:
+    found = _shared.get(key, touch)
+    if found is None:
+        return None
+    table, fresh_for, expires_in = found
+    if touch:
+        # Keep it in this process too, for as long as it has left
+        _cache.put(key, table, fresh_for, expires_in - fresh_for)
+    return table, fresh_for
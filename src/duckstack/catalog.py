@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import json
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 import asyncpg
 
 CREATE_DATASETS = """
@@ -8,6 +12,7 @@ CREATE TABLE IF NOT EXISTS datasets (
     name        TEXT UNIQUE NOT NULL,
     path        TEXT NOT NULL,
     description TEXT NOT NULL DEFAULT '',
+    partition_columns JSONB NOT NULL DEFAULT '[]',
     created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
 )
 """
@@ -22,6 +27,32 @@ CREATE TABLE IF NOT EXISTS dataset_columns (
 )
 """
 
+# Parquet footer statistics per file, used to skip files a query's predicates rule out
+CREATE_FILES = """
+CREATE TABLE IF NOT EXISTS dataset_files (
+    id              SERIAL PRIMARY KEY,
+    dataset_id      INT NOT NULL REFERENCES datasets(id) ON DELETE CASCADE,
+    path            TEXT NOT NULL,
+    row_count       BIGINT,
+    row_group_count INT,
+    column_stats    JSONB NOT NULL DEFAULT '{}',
+    partition_values JSONB NOT NULL DEFAULT '{}',
+    UNIQUE(dataset_id, path)
+)
+"""
+
+# Datasets defined by a query whose result is written to parquet and refreshed over time
+CREATE_MATERIALIZATIONS = """
+CREATE TABLE IF NOT EXISTS materializations (
+    dataset_id      INT PRIMARY KEY REFERENCES datasets(id) ON DELETE CASCADE,
+    sql             TEXT NOT NULL,
+    refresh_interval_seconds INT NOT NULL DEFAULT 0,
+    watermark_column TEXT,
+    watermark       TEXT,
+    refreshed_at    TIMESTAMPTZ
+)
+"""
+
 CREATE_API_SOURCES = """
 CREATE TABLE IF NOT EXISTS api_sources (
     id              SERIAL PRIMARY KEY,
@@ -35,66 +66,293 @@ CREATE TABLE IF NOT EXISTS api_sources (
     response_path   TEXT NOT NULL DEFAULT 'results',
     ttl_seconds     INT NOT NULL DEFAULT 300,
     description     TEXT NOT NULL DEFAULT '',
+    pagination      JSONB NOT NULL DEFAULT '{}',
+    stale_ttl_seconds INT NOT NULL DEFAULT 0,
+    prewarm_params  JSONB NOT NULL DEFAULT '[]',
     created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
 )
 """
 
+# Columns added after the initial schema; CREATE TABLE IF NOT EXISTS won't add them to old tables
+MIGRATE_DATASETS = """
+ALTER TABLE datasets ADD COLUMN IF NOT EXISTS partition_columns JSONB NOT NULL DEFAULT '[]';
+ALTER TABLE dataset_files ADD COLUMN IF NOT EXISTS partition_values JSONB NOT NULL DEFAULT '{}';
+"""
+
+MIGRATE_API_SOURCES = """
+ALTER TABLE api_sources ADD COLUMN IF NOT EXISTS pagination JSONB NOT NULL DEFAULT '{}';
+ALTER TABLE api_sources ADD COLUMN IF NOT EXISTS stale_ttl_seconds INT NOT NULL DEFAULT 0;
+ALTER TABLE api_sources ADD COLUMN IF NOT EXISTS prewarm_params JSONB NOT NULL DEFAULT '[]';
+"""
+
+
+# Every write to a catalog table NOTIFYs its name so each worker's CatalogCache can reload it
+NOTIFY_CHANNEL = "duckstack_catalog"
+
+CREATE_NOTIFY_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION duckstack_catalog_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+CREATE_NOTIFY_TRIGGER = """
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_trigger
+        WHERE tgname = 'duckstack_catalog_notify' AND tgrelid = '{table}'::regclass
+    ) THEN
+        CREATE TRIGGER duckstack_catalog_notify
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION duckstack_catalog_notify();
+    END IF;
+END
+$$
+"""
+
+CATALOG_TABLES = ("datasets", "dataset_columns", "dataset_files", "materializations", "api_sources")
+
 
 async def init_catalog(database_url: str) -> asyncpg.Pool:
     pool = await asyncpg.create_pool(database_url)
     async with pool.acquire() as conn:
-        await conn.execute(CREATE_DATASETS)
-        await conn.execute(CREATE_COLUMNS)
-        await conn.execute(CREATE_API_SOURCES)
+        async with conn.transaction():
+            # Workers start concurrently; serialize schema setup across them
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('duckstack_catalog_schema'))")
+            await conn.execute(CREATE_DATASETS)
+            await conn.execute(CREATE_COLUMNS)
+            await conn.execute(CREATE_FILES)
+            await conn.execute(MIGRATE_DATASETS)
+            await conn.execute(CREATE_MATERIALIZATIONS)
+            await conn.execute(CREATE_API_SOURCES)
+            await conn.execute(MIGRATE_API_SOURCES)
+            await conn.execute(CREATE_NOTIFY_FUNCTION)
+            for table in CATALOG_TABLES:
+                await conn.execute(CREATE_NOTIFY_TRIGGER.format(table=table))
     return pool
 
 
-async def list_datasets(pool: asyncpg.Pool) -> list[dict]:
+_DATASET_COLS = "id, name, path, description, partition_columns, created_at"
+_FILE_COLS = "path, row_count, row_group_count, column_stats, partition_values"
+_MATERIALIZATION_COLS = "sql, refresh_interval_seconds, watermark_column, watermark, refreshed_at"
+
+
+async def load_datasets(pool: asyncpg.Pool) -> list[dict]:
+    """Fetch every dataset with its columns, files and materialization in four queries."""
     async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            "SELECT id, name, path, description, created_at FROM datasets ORDER BY id"
-        )
-    return [dict(r) for r in rows]
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            rows = await conn.fetch(
+                f"SELECT {_DATASET_COLS} FROM datasets ORDER BY id"
+            )
+            columns = await conn.fetch(
+                "SELECT dataset_id, name, dtype FROM dataset_columns ORDER BY id"
+            )
+            files = await conn.fetch(
+                f"SELECT dataset_id, {_FILE_COLS} FROM dataset_files ORDER BY dataset_id, path"
+            )
+            materializations = await conn.fetch(
+                f"SELECT dataset_id, {_MATERIALIZATION_COLS} FROM materializations"
+            )
+    columns_by_dataset: dict[int, list[dict]] = {}
+    for c in columns:
+        columns_by_dataset.setdefault(c["dataset_id"], []).append({"name": c["name"], "dtype": c["dtype"]})
+    files_by_dataset: dict[int, list[dict]] = {}
+    for f in files:
+        files_by_dataset.setdefault(f["dataset_id"], []).append(_decode_file(f))
+    materialization_by_dataset = {m["dataset_id"]: _decode_materialization(m) for m in materializations}
+    return [
+        {
+            **_with_files(_decode_dataset(r), columns_by_dataset.get(r["id"], []), files_by_dataset.get(r["id"], [])),
+            "materialization": materialization_by_dataset.get(r["id"]),
+        }
+        for r in rows
+    ]
+
+
+async def create_dataset(
+    pool: asyncpg.Pool,
+    name: str,
+    path: str,
+    description: str,
+    columns: list[dict],
+    files: list[dict] | None = None,
+    partition_columns: list[str] | None = None,
+) -> dict:
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            row = await _insert_dataset(conn, name, path, description, columns, files or [], partition_columns)
+    return _with_files(_decode_dataset(row), columns, files or [])
+
 
+async def create_datasets(pool: asyncpg.Pool, datasets: list[dict]) -> list[dict]:
+    """Register many datasets in one transaction; return those created.
 
-async def get_dataset(pool: asyncpg.Pool, name: str) -> dict | None:
+    Each of datasets has the arguments of create_dataset as keys. Names
+    already in the catalog are skipped rather than failing the rest. The
+    datasets go in with one INSERT, and their columns and files with one
+    COPY each, so the round-trips don't grow with the number of datasets.
+    """
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            rows = await conn.fetch(
+                "INSERT INTO datasets (name, path, description, partition_columns) "
+                "SELECT name, path, description, partition_columns::jsonb "
+                "FROM unnest($1::text[], $2::text[], $3::text[], $4::text[]) AS d(name, path, description, partition_columns) "
+                f"ON CONFLICT (name) DO NOTHING RETURNING {_DATASET_COLS}",
+                [d["name"] for d in datasets],
+                [d["path"] for d in datasets],
+                [d.get("description", "") for d in datasets],
+                [json.dumps(d.get("partition_columns") or []) for d in datasets],
+            )
+            by_name = {d["name"]: d for d in datasets}
+            created = [(row, by_name[row["name"]]) for row in rows]
+            await conn.copy_records_to_table(
+                "dataset_columns",
+                columns=["dataset_id", "name", "dtype"],
+                records=[(row["id"], c["name"], c["dtype"]) for row, d in created for c in d["columns"]],
+            )
+            await conn.copy_records_to_table(
+                "dataset_files",
+                columns=["dataset_id", "path", "row_count", "row_group_count", "column_stats", "partition_values"],
+                records=[(row["id"], *_file_record(f)) for row, d in created for f in d.get("files") or []],
+            )
+    return [_with_files(_decode_dataset(row), d["columns"], d.get("files") or []) for row, d in created]
+
+
+async def create_materialized(
+    pool: asyncpg.Pool,
+    name: str,
+    path: str,
+    description: str,
+    columns: list[dict],
+    files: list[dict],
+    materialization: dict,
+) -> dict:
+    """Register a materialized dataset: its first files, and the query they came from."""
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            row = await _insert_dataset(conn, name, path, description, columns, files)
+            m = await conn.fetchrow(
+                "INSERT INTO materializations (dataset_id, sql, refresh_interval_seconds, watermark_column, watermark, refreshed_at) "
+                f"VALUES ($1, $2, $3, $4, $5, now()) RETURNING {_MATERIALIZATION_COLS}",
+                row["id"],
+                materialization["sql"],
+                materialization["refresh_interval_seconds"],
+                materialization["watermark_column"],
+                materialization["watermark"],
+            )
+    return {**_with_files(_decode_dataset(row), columns, files), "materialization": _decode_materialization(m)}
+
+
+async def get_materialization(pool: asyncpg.Pool, name: str) -> dict | None:
+    """Fetch a materialized dataset's definition and current columns straight from the database."""
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
-            "SELECT id, name, path, description, created_at FROM datasets WHERE name = $1",
+            "SELECT m.* FROM materializations m JOIN datasets d ON d.id = m.dataset_id WHERE d.name = $1",
             name,
         )
         if row is None:
             return None
         columns = await conn.fetch(
             "SELECT name, dtype FROM dataset_columns WHERE dataset_id = $1 ORDER BY id",
-            row["id"],
+            row["dataset_id"],
         )
-    return {**dict(row), "columns": [dict(c) for c in columns]}
+    return {**_decode_materialization(row), "columns": [dict(c) for c in columns]}
 
 
-async def create_dataset(
+async def update_materialized(
     pool: asyncpg.Pool,
     name: str,
-    path: str,
-    description: str,
     columns: list[dict],
-) -> dict:
+    added: list[dict],
+    replace: bool,
+    watermark: str | None,
+) -> tuple[dict | None, list[str]]:
+    """Record a materialization run: its new files and watermark.
+
+    With replace, the new files supersede all existing ones, whose paths
+    are returned so they can be deleted once nothing refers to them.
+    Returns (None, []) if the dataset no longer exists.
+    """
     async with pool.acquire() as conn:
         async with conn.transaction():
             row = await conn.fetchrow(
-                "INSERT INTO datasets (name, path, description) VALUES ($1, $2, $3) RETURNING id, name, path, description, created_at",
+                f"SELECT {_DATASET_COLS} FROM datasets WHERE name = $1 FOR UPDATE",
                 name,
-                path,
-                description,
             )
-            for col in columns:
-                await conn.execute(
-                    "INSERT INTO dataset_columns (dataset_id, name, dtype) VALUES ($1, $2, $3)",
-                    row["id"],
-                    col["name"],
-                    col["dtype"],
-                )
-    return {**dict(row), "columns": columns}
+            if row is None:
+                return None, []
+            removed = []
+            if replace:
+                deleted = await conn.fetch("DELETE FROM dataset_files WHERE dataset_id = $1 RETURNING path", row["id"])
+                removed = [r["path"] for r in deleted]
+            await _replace_columns(conn, row["id"], columns)
+            await _insert_files(conn, row["id"], added)
+            m = await conn.fetchrow(
+                f"UPDATE materializations SET watermark = $2, refreshed_at = now() WHERE dataset_id = $1 RETURNING {_MATERIALIZATION_COLS}",
+                row["id"],
+                watermark,
+            )
+            files = await conn.fetch(
+                f"SELECT {_FILE_COLS} FROM dataset_files WHERE dataset_id = $1 ORDER BY path",
+                row["id"],
+            )
+    dataset = _with_files(_decode_dataset(row), columns, [_decode_file(f) for f in files])
+    return {**dataset, "materialization": _decode_materialization(m) if m else None}, removed
+
+
+@asynccontextmanager
+async def materialization_lock(pool: asyncpg.Pool, name: str) -> AsyncIterator[bool]:
+    """Try to take the cluster-wide lock on refreshing a materialized dataset.
+
+    Yields whether it was taken; it is held, on its own connection, until
+    the block exits.
+    """
+    key = f"duckstack_materialize:{name}"
+    async with pool.acquire() as conn:
+        locked = await conn.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", key)
+        try:
+            yield locked
+        finally:
+            if locked:
+                await conn.execute("SELECT pg_advisory_unlock(hashtext($1))", key)
+
+
+async def refresh_dataset(
+    pool: asyncpg.Pool,
+    name: str,
+    columns: list[dict],
+    added: list[dict],
+    removed: list[str],
+) -> dict | None:
+    """Replace a dataset's columns and apply a file index delta; None if it doesn't exist.
+
+    Only the added and removed files are written, so refreshing a few
+    partitions of a large dataset doesn't rewrite its whole index.
+    """
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            row = await conn.fetchrow(
+                f"SELECT {_DATASET_COLS} FROM datasets WHERE name = $1 FOR UPDATE",
+                name,
+            )
+            if row is None:
+                return None
+            await _replace_columns(conn, row["id"], columns)
+            await conn.execute(
+                "DELETE FROM dataset_files WHERE dataset_id = $1 AND path = ANY($2::text[])",
+                row["id"],
+                removed,
+            )
+            await _insert_files(conn, row["id"], added)
+            files = await conn.fetch(
+                f"SELECT {_FILE_COLS} FROM dataset_files WHERE dataset_id = $1 ORDER BY path",
+                row["id"],
+            )
+    return _with_files(_decode_dataset(row), columns, [_decode_file(f) for f in files])
 
 
 async def delete_dataset(pool: asyncpg.Pool, name: str) -> bool:
@@ -103,35 +361,98 @@ async def delete_dataset(pool: asyncpg.Pool, name: str) -> bool:
     return result == "DELETE 1"
 
 
-# --- API Sources ---
+async def _insert_dataset(
+    conn: asyncpg.Connection,
+    name: str,
+    path: str,
+    description: str,
+    columns: list[dict],
+    files: list[dict],
+    partition_columns: list[str] | None = None,
+) -> asyncpg.Record:
+    row = await conn.fetchrow(
+        f"INSERT INTO datasets (name, path, description, partition_columns) VALUES ($1, $2, $3, $4::jsonb) RETURNING {_DATASET_COLS}",
+        name,
+        path,
+        description,
+        json.dumps(partition_columns or []),
+    )
+    await conn.executemany(
+        "INSERT INTO dataset_columns (dataset_id, name, dtype) VALUES ($1, $2, $3)",
+        [(row["id"], c["name"], c["dtype"]) for c in columns],
+    )
+    await _insert_files(conn, row["id"], files)
+    return row
 
-_API_SOURCE_COLS = "id, name, endpoint_url, query_params, auth_header, auth_env_var, api_key_param, api_key_override, response_path, ttl_seconds, description, created_at"
-_API_SOURCE_SUMMARY_COLS = "id, name, endpoint_url, description, ttl_seconds, created_at"
 
+async def _replace_columns(conn: asyncpg.Connection, dataset_id: int, columns: list[dict]) -> None:
+    await conn.execute("DELETE FROM dataset_columns WHERE dataset_id = $1", dataset_id)
+    await conn.executemany(
+        "INSERT INTO dataset_columns (dataset_id, name, dtype) VALUES ($1, $2, $3)",
+        [(dataset_id, c["name"], c["dtype"]) for c in columns],
+    )
 
-async def list_api_sources(pool: asyncpg.Pool) -> list[dict]:
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            f"SELECT {_API_SOURCE_SUMMARY_COLS} FROM api_sources ORDER BY id"
-        )
-    return [dict(r) for r in rows]
 
+async def _insert_files(conn: asyncpg.Connection, dataset_id: int, files: list[dict]) -> None:
+    await conn.executemany(
+        "INSERT INTO dataset_files (dataset_id, path, row_count, row_group_count, column_stats, partition_values) "
+        "VALUES ($1, $2, $3, $4, $5::jsonb, $6::jsonb)",
+        [(dataset_id, *_file_record(f)) for f in files],
+    )
 
-async def get_api_source(pool: asyncpg.Pool, name: str) -> dict | None:
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            f"SELECT {_API_SOURCE_COLS} FROM api_sources WHERE name = $1",
-            name,
-        )
-    if row is None:
-        return None
+
+def _file_record(f: dict) -> tuple:
+    return (
+        f["path"],
+        f.get("row_count"),
+        f.get("row_group_count"),
+        json.dumps(f.get("column_stats") or {}),
+        json.dumps(f.get("partition_values") or {}),
+    )
+
+
+def _decode_dataset(row: asyncpg.Record) -> dict:
     result = dict(row)
-    import json
-    if isinstance(result["query_params"], str):
-        result["query_params"] = json.loads(result["query_params"])
+    if isinstance(result.get("partition_columns"), str):
+        result["partition_columns"] = json.loads(result["partition_columns"])
+    return result
+
+
+def _decode_file(row: asyncpg.Record) -> dict:
+    result = {key: row[key] for key in ("path", "row_count", "row_group_count", "column_stats", "partition_values")}
+    for key in ("column_stats", "partition_values"):
+        if isinstance(result[key], str):
+            result[key] = json.loads(result[key])
     return result
 
 
+def _decode_materialization(row: asyncpg.Record) -> dict:
+    return {key: row[key] for key in _MATERIALIZATION_COLS.split(", ")}
+
+
+def _with_files(dataset: dict, columns: list[dict], files: list[dict]) -> dict:
+    row_counts = [f.get("row_count") for f in files]
+    return {
+        **dataset,
+        "columns": columns,
+        "files": files,
+        "file_count": len(files),
+        "row_count": sum(row_counts) if row_counts and None not in row_counts else None,
+    }
+
+
+# --- API Sources ---
+
+_API_SOURCE_COLS = "id, name, endpoint_url, query_params, auth_header, auth_env_var, api_key_param, api_key_override, response_path, ttl_seconds, description, pagination, stale_ttl_seconds, prewarm_params, created_at"
+
+
+async def load_api_sources(pool: asyncpg.Pool) -> list[dict]:
+    """Fetch every API source with all of its settings."""
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(f"SELECT {_API_SOURCE_COLS} FROM api_sources ORDER BY id")
+    return [_decode_api_source(r) for r in rows]
+
+
 async def create_api_source(
     pool: asyncpg.Pool,
     name: str,
@@ -144,13 +465,15 @@ async def create_api_source(
     response_path: str,
     ttl_seconds: int,
     description: str,
+    pagination: dict,
+    stale_ttl_seconds: int,
+    prewarm_params: list[dict],
 ) -> dict:
-    import json
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
-            """INSERT INTO api_sources (name, endpoint_url, query_params, auth_header, auth_env_var, api_key_param, api_key_override, response_path, ttl_seconds, description)
-            VALUES ($1, $2, $3::jsonb, $4, $5, $6, $7, $8, $9, $10)
-            RETURNING id, name, endpoint_url, query_params, auth_header, auth_env_var, api_key_param, response_path, ttl_seconds, description, created_at""",
+            f"""INSERT INTO api_sources (name, endpoint_url, query_params, auth_header, auth_env_var, api_key_param, api_key_override, response_path, ttl_seconds, description, pagination, stale_ttl_seconds, prewarm_params)
+            VALUES ($1, $2, $3::jsonb, $4, $5, $6, $7, $8, $9, $10, $11::jsonb, $12, $13::jsonb)
+            RETURNING {_API_SOURCE_COLS}""",
             name,
             endpoint_url,
             json.dumps(query_params),
@@ -161,14 +484,23 @@ async def create_api_source(
             response_path,
             ttl_seconds,
             description,
+            json.dumps(pagination),
+            stale_ttl_seconds,
+            json.dumps(prewarm_params),
         )
-    result = dict(row)
-    if isinstance(result["query_params"], str):
-        result["query_params"] = json.loads(result["query_params"])
-    return result
+    return _decode_api_source(row)
 
 
 async def delete_api_source(pool: asyncpg.Pool, name: str) -> bool:
     async with pool.acquire() as conn:
         result = await conn.execute("DELETE FROM api_sources WHERE name = $1", name)
     return result == "DELETE 1"
+
+
+def _decode_api_source(row: asyncpg.Record) -> dict:
+    # asyncpg returns JSONB columns as text unless a codec is registered
+    result = dict(row)
+    for key in ("query_params", "pagination", "prewarm_params"):
+        if isinstance(result.get(key), str):
+            result[key] = json.loads(result[key])
+    return result
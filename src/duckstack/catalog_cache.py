@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Awaitable, Callable
+
+import asyncpg
+
+from duckstack import catalog
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogCache:
+    """In-memory mirror of the catalog tables, kept coherent via LISTEN/NOTIFY.
+
+    Reads never touch Postgres. Every write to a catalog table, from any
+    worker, fires a statement trigger that NOTIFYs the table name, and each
+    worker's listener reloads the affected table. Writes made through this
+    worker are also applied locally right away, so they are visible to the
+    next request without waiting for the notification round-trip.
+
+    on_datasets_loaded, if given, is awaited with the full dataset list after
+    every load of the datasets table, so derived state (such as the DuckDB
+    views over each dataset) can follow changes made by other workers.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        on_datasets_loaded: Callable[[list[dict]], Awaitable[None]] | None = None,
+    ) -> None:
+        self._pool = pool
+        self._on_datasets_loaded = on_datasets_loaded
+        self._datasets: dict[str, dict] = {}
+        self._api_sources: dict[str, dict] = {}
+        self._listener: asyncpg.Connection | None = None
+        self._reloads: dict[str, asyncio.Task] = {}
+        self._pending: set[str] = set()
+        self._reconnect_task: asyncio.Task | None = None
+        self._closed = False
+
+    async def start(self) -> None:
+        # Listen before the initial load so no change can slip in between
+        await self._listen()
+        await self.reload_all()
+
+    async def close(self) -> None:
+        self._closed = True
+        tasks = [*self._reloads.values()]
+        if self._reconnect_task is not None:
+            tasks.append(self._reconnect_task)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        if self._listener is not None:
+            with contextlib.suppress(Exception):
+                await self._listener.remove_listener(catalog.NOTIFY_CHANNEL, self._on_notify)
+            await self._pool.release(self._listener)
+            self._listener = None
+
+    # --- Reads ---
+
+    def list_datasets(self) -> list[dict]:
+        return sorted(self._datasets.values(), key=lambda d: d["id"])
+
+    def get_dataset(self, name: str) -> dict | None:
+        return self._datasets.get(name)
+
+    def list_api_sources(self) -> list[dict]:
+        return sorted(self._api_sources.values(), key=lambda s: s["id"])
+
+    def get_api_source(self, name: str) -> dict | None:
+        return self._api_sources.get(name)
+
+    def list_prewarm_sources(self) -> list[dict]:
+        return [s for s in self.list_api_sources() if s.get("prewarm_params")]
+
+    # --- Local writes ---
+
+    def put_dataset(self, dataset: dict) -> None:
+        self._datasets = {**self._datasets, dataset["name"]: dataset}
+
+    def drop_dataset(self, name: str) -> None:
+        self._datasets = {k: v for k, v in self._datasets.items() if k != name}
+
+    def put_api_source(self, source: dict) -> None:
+        self._api_sources = {**self._api_sources, source["name"]: source}
+
+    def drop_api_source(self, name: str) -> None:
+        self._api_sources = {k: v for k, v in self._api_sources.items() if k != name}
+
+    # --- Synchronization ---
+
+    async def reload_all(self) -> None:
+        await asyncio.gather(self._load("datasets"), self._load("api_sources"))
+
+    async def _load(self, table: str) -> None:
+        # Swap in a whole new dict so readers never see a half-built one
+        if table == "datasets":
+            rows = await catalog.load_datasets(self._pool)
+            self._datasets = {d["name"]: d for d in rows}
+            if self._on_datasets_loaded is not None:
+                await self._on_datasets_loaded(rows)
+        else:
+            rows = await catalog.load_api_sources(self._pool)
+            self._api_sources = {s["name"]: s for s in rows}
+
+    async def _listen(self) -> None:
+        conn = await self._pool.acquire()
+        try:
+            await conn.add_listener(catalog.NOTIFY_CHANNEL, self._on_notify)
+        except BaseException:
+            await self._pool.release(conn)
+            raise
+        conn.add_termination_listener(self._on_terminated)
+        self._listener = conn
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        self._schedule("api_sources" if payload == "api_sources" else "datasets")
+
+    def _schedule(self, table: str) -> None:
+        # Coalesce bursts of notifications: one reload running, at most one queued
+        task = self._reloads.get(table)
+        if task is not None and not task.done():
+            self._pending.add(table)
+            return
+        self._reloads[table] = asyncio.ensure_future(self._reload(table))
+
+    async def _reload(self, table: str) -> None:
+        while True:
+            try:
+                await self._load(table)
+            except Exception:
+                logger.exception("Reloading catalog table %s failed", table)
+            if table not in self._pending:
+                return
+            self._pending.discard(table)
+
+    def _on_terminated(self, conn) -> None:
+        if not self._closed and self._reconnect_task is None:
+            self._reconnect_task = asyncio.ensure_future(self._reconnect(conn))
+
+    async def _reconnect(self, broken: asyncpg.Connection) -> None:
+        with contextlib.suppress(Exception):
+            await self._pool.release(broken)
+        self._listener = None
+        delay = 0.5
+        try:
+            while not self._closed:
+                try:
+                    if self._listener is None:
+                        await self._listen()
+                    # Notifications sent while we were disconnected are lost
+                    await self.reload_all()
+                    return
+                except Exception:
+                    logger.exception("Reconnecting catalog listener failed; retrying in %.1fs", delay)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+        finally:
+            self._reconnect_task = None
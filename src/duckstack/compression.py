@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import zlib
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # optional: the "zstd" extra
+    zstandard = None
+
+# Preferred first when a client accepts several equally
+ENCODINGS = ("zstd", "gzip")
+
+# Bodies at least this large are compressed off the event loop
+THREADPOOL_MIN_BYTES = 256 * 1024
+
+
+class CompressionMiddleware:
+    """Compress responses with zstd or gzip, as negotiated with Accept-Encoding.
+
+    Bodies smaller than minimum_size are sent as they are, since compressing
+    them saves little and costs time on both ends. Streamed responses are
+    compressed chunk by chunk and flushed after each chunk, so the client
+    can decode every chunk as soon as it arrives. zstd is offered only when
+    the zstandard package is installed.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.available = tuple(e for e in ENCODINGS if e != "zstd" or zstandard is not None)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.available)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _Responder(self, encoding, send).send)
+
+    def compressor(self, encoding: str):
+        if encoding == "zstd":
+            return _ZstdCompressor(self.zstd_level)
+        return _GzipCompressor(self.gzip_level)
+
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self.inner_send = send
+        self.start: Message | None = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.inner_send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if "content-encoding" in headers or (not more and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                await self.inner_send(self.start)
+                await self.inner_send(message)
+                return
+            self.compressor = self.middleware.compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more:
+                # The compressed length isn't known until the stream ends
+                del headers["Content-Length"]
+            else:
+                body = await _run(self.compressor.finish, body)
+                headers["Content-Length"] = str(len(body))
+                await self.inner_send(self.start)
+                await self.inner_send({"type": "http.response.body", "body": body})
+                return
+            await self.inner_send(self.start)
+
+        body = await _run(self.compressor.chunk if more else self.compressor.finish, body)
+        await self.inner_send({"type": "http.response.body", "body": body, "more_body": more})
+
+
+async def _run(compress, body: bytes) -> bytes:
+    if len(body) >= THREADPOOL_MIN_BYTES:
+        return await run_in_threadpool(compress, body)
+    return compress(body)
+
+
+class _GzipCompressor:
+    def __init__(self, level: int) -> None:
+        # wbits 31: a gzip header and trailer around the deflate stream
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes) -> bytes:
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int) -> None:
+        self._zstd = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._zstd.compress(data) + self._zstd.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes) -> bytes:
+        return self._zstd.compress(data) + self._zstd.flush()
+
+
+def negotiate(accept_encoding: str, available: tuple[str, ...]) -> str | None:
+    """Pick the available encoding the client rates highest; None for no compression."""
+    ratings: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ratings[name] = quality
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = ratings.get(encoding, ratings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
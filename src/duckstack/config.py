@@ -5,8 +5,52 @@ class Settings(BaseSettings):
     aws_access_key_id: str = ""
     aws_secret_access_key: str = ""
     aws_region: str = "us-east-1"
+    s3_endpoint_url: str = ""  # e.g. "http://localhost:9000" for MinIO; empty = AWS
     database_url: str = ""
     data_dir: str = ""
+    stream_batch_size: int = 10_000
+    query_max_concurrency: int = 0  # 0 = one per CPU core
+    query_max_queue: int = 64
+    query_queue_timeout_seconds: float = 30.0
+    query_timeout_ms: int = 30_000  # 0 = no deadline
+    query_statement_cache_size: int = 64  # prepared statements kept per pooled cursor
+    query_cursor_page_size: int = 1000
+    query_cursor_idle_seconds: float = 300.0
+    query_cursor_max_per_client: int = 8
+    query_cursor_max_open: int = 256
+    duckdb_memory_limit: str = ""  # e.g. "4GB"; empty = DuckDB default (80% of RAM)
+    duckdb_temp_directory: str = ""  # where queries spill when they exceed memory_limit
+    duckdb_max_temp_directory_size: str = ""
+    cache_max_bytes: int = 256 * 1024 * 1024
+    cache_sweep_interval_seconds: float = 30.0
+    shared_cache_dir: str = ""  # empty = no cross-process cache; e.g. /dev/shm/duckstack
+    shared_cache_max_bytes: int = 1024**3
+    query_cache_ttl_seconds: int = 300
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http_timeout_seconds: float = 30.0
+    http2: bool = False  # requires the "http2" extra
+    api_prewarm_interval_seconds: float = 30.0
+    s3_block_cache_dir: str = ""  # empty = no block cache; requires the "s3cache" extra
+    s3_block_cache_max_bytes: int = 10 * 1024**3
+    s3_block_cache_block_size: int = 1024 * 1024
+    dataset_bulk_concurrency: int = 8  # datasets inspected at once by POST /datasets/bulk
+    engine_warmup_datasets: str = ""  # comma-separated dataset names to preload metadata for; "*" = all
+    materialized_dir: str = ""  # empty = "materialized" under the data directory
+    materialize_check_interval_seconds: float = 30.0
+    materialize_retain_seconds: float = 600.0  # how long files a refresh replaced stay readable
+    jobs_dir: str = ""  # empty = "duckstack-jobs" in the system temp directory
+    jobs_max_workers: int = 2
+    jobs_max_queued: int = 100
+    jobs_result_ttl_seconds: int = 3600
+    jobs_page_size: int = 1000
+    compression_enabled: bool = True
+    compression_min_bytes: int = 1024  # smaller responses are sent uncompressed
+    compression_gzip_level: int = 6
+    compression_zstd_level: int = 3
+    slow_query_ms: int = 0  # log queries slower than this; 0 = off
+    slow_query_profile: bool = True  # include DuckDB's operator timings in the log
 
 
 settings = Settings()
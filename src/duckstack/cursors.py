@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import duckdb
+import pyarrow as pa
+
+from duckstack import formats, pruning
+from duckstack.pool import QueryTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class CursorLimit(Exception):
+    """Raised when a client, or the server, has too many result cursors open."""
+
+
+class ResultCursor:
+    """A query result held open on its own DuckDB cursor, read a page at a time.
+
+    Rows are pulled from DuckDB's streaming result only as pages are
+    requested, so a page costs the rows it returns rather than a re-run of
+    the query up to its offset.
+    """
+
+    def __init__(
+        self,
+        client: str,
+        cursor: duckdb.DuckDBPyConnection,
+        reader: pa.RecordBatchReader,
+        shadows: list[str],
+    ) -> None:
+        self.token = uuid.uuid4().hex
+        self.client = client
+        self.last_used = time.monotonic()
+        self.exhausted = False
+        self._cursor = cursor
+        self._reader = reader
+        self._shadows = shadows
+        # Rows read from DuckDB but past the end of the last page
+        self._pending: pa.RecordBatch | None = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def columns(self) -> list[str]:
+        return self._reader.schema.names
+
+    def fetch(self, size: int, timeout: float | None = None) -> pa.Table:
+        """Return the next size rows; exhausted is set once none are left.
+
+        The query is interrupted, leaving the cursor unusable, if producing
+        the page takes longer than timeout seconds.
+        """
+        with self._lock:
+            if self._closed:
+                raise duckdb.InvalidInputException("Cursor is closed")
+            with _deadline(self._cursor, timeout):
+                batches = []
+                rows = 0
+                while rows < size and not self.exhausted:
+                    batch = self._next_batch()
+                    if batch is None:
+                        break
+                    if rows + batch.num_rows > size:
+                        self._pending = batch.slice(size - rows)
+                        batch = batch.slice(0, size - rows)
+                    batches.append(batch)
+                    rows += batch.num_rows
+                # Look ahead so the last page already reports that nothing follows
+                if self._pending is None and not self.exhausted:
+                    self._pending = self._next_batch()
+            self.last_used = time.monotonic()
+            return pa.Table.from_batches(batches, schema=self._reader.schema)
+
+    def close(self) -> None:
+        self._cursor.interrupt()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                pruning.drop(self._cursor, self._shadows)
+            finally:
+                self._cursor.close()
+
+    def _next_batch(self) -> pa.RecordBatch | None:
+        if self._pending is not None:
+            batch, self._pending = self._pending, None
+            return batch
+        try:
+            return self._reader.read_next_batch()
+        except StopIteration:
+            self.exhausted = True
+            return None
+
+
+class CursorRegistry:
+    """The open result cursors, with per-client and overall caps.
+
+    Each open cursor holds a DuckDB connection and the state of its running
+    query, so cursors idle for longer than idle_seconds are closed by
+    sweep(), which the service runs periodically in the background.
+    """
+
+    def __init__(
+        self,
+        db: duckdb.DuckDBPyConnection,
+        max_per_client: int,
+        max_open: int,
+        idle_seconds: float,
+        batch_size: int,
+    ) -> None:
+        self.max_per_client = max_per_client
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._db = db
+        self._batch_size = batch_size
+        self._cursors: dict[str, ResultCursor] = {}
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def open(
+        self, client: str, sql: str, timeout: float | None = None, params: list | dict | None = None
+    ) -> ResultCursor:
+        """Run sql on a new cursor, leaving its result open for fetching."""
+        with self._lock:
+            self._check_limits(client)
+        cursor = self._db.cursor()
+        shadows: list[str] = []
+        try:
+            shadows = pruning.shadow(cursor, sql, params)
+            with _deadline(cursor, timeout):
+                reader = formats.arrow_reader(cursor.execute(sql, params), self._batch_size)
+        except BaseException:
+            try:
+                pruning.drop(cursor, shadows)
+            finally:
+                cursor.close()
+            raise
+        result = ResultCursor(client, cursor, reader, shadows)
+        with self._lock:
+            try:
+                # Checked again: other requests may have opened cursors meanwhile
+                self._check_limits(client)
+            except CursorLimit:
+                result.close()
+                raise
+            self._cursors[result.token] = result
+        return result
+
+    def get(self, token: str) -> ResultCursor | None:
+        return self._cursors.get(token)
+
+    def close(self, token: str) -> bool:
+        with self._lock:
+            result = self._cursors.pop(token, None)
+        if result is None:
+            return False
+        result.close()
+        return True
+
+    def sweep(self) -> None:
+        """Close cursors that have been idle for longer than idle_seconds."""
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [c for c in self._cursors.values() if c.last_used < cutoff]
+            for result in idle:
+                del self._cursors[result.token]
+            self._evictions += len(idle)
+        for result in idle:
+            result.close()
+
+    async def sweep_forever(self, interval_seconds: float) -> None:
+        """Periodically close idle cursors; run as a background task."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("Closing idle result cursors failed")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._cursors), "evictions": self._evictions}
+
+    def close_all(self) -> None:
+        with self._lock:
+            results = list(self._cursors.values())
+            self._cursors.clear()
+        for result in results:
+            result.close()
+
+    def _check_limits(self, client: str) -> None:
+        if len(self._cursors) >= self.max_open:
+            raise CursorLimit(f"Too many open cursors ({self.max_open})")
+        if sum(1 for c in self._cursors.values() if c.client == client) >= self.max_per_client:
+            raise CursorLimit(f"Too many open cursors for this client ({self.max_per_client})")
+
+
+@contextmanager
+def _deadline(cursor: duckdb.DuckDBPyConnection, timeout: float | None) -> Iterator[None]:
+    """Interrupt cursor's query if the block runs longer than timeout seconds."""
+    if not timeout:
+        yield
+        return
+    expired = threading.Event()
+
+    def expire() -> None:
+        expired.set()
+        cursor.interrupt()
+
+    timer = threading.Timer(timeout, expire)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    except duckdb.InterruptException:
+        if expired.is_set():
+            raise QueryTimeout(f"Query exceeded timeout of {timeout * 1000:.0f} ms")
+        raise
+    finally:
+        timer.cancel()
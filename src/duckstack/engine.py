@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import duckdb
+
+from duckstack import cursors, jobs, views
+from duckstack.blockcache import BlockCache
+from duckstack.config import Settings
+from duckstack.pool import CursorPool
+
+logger = logging.getLogger(__name__)
+
+# URL schemes DuckDB reads through httpfs (or the S3 block cache)
+_REMOTE = re.compile(r"\b(?:s3a?|s3n|gcs|gs|r2|https?|hf|az|abfss?)://", re.IGNORECASE)
+
+
+class _State:
+    """Everything opened for one process: a DuckDB database and what holds its connections."""
+
+    def __init__(self, db, query_pool, result_cursors, job_manager) -> None:
+        self.pid = os.getpid()
+        self.db: duckdb.DuckDBPyConnection = db
+        self.query_pool: CursorPool = query_pool
+        self.result_cursors: cursors.CursorRegistry = result_cursors
+        self.job_manager: jobs.JobManager = job_manager
+        self.block_cache: BlockCache | None = None
+        self.remote = False
+
+
+class Engine:
+    """The DuckDB database the service queries, and the pools and managers built on it.
+
+    Nothing is opened on import: the service starts the engine from its
+    lifespan, so each worker process opens its own database after any
+    pre-fork. Anything touching the engine before that starts it on the
+    spot, and a process that finds itself forked from the one that started
+    it opens a fresh database rather than sharing its parent's.
+
+    httpfs (and the S3 block cache) are set up on first use, when a query
+    or dataset names a remote URL, so local-only deployments never pay for
+    loading them, or for INSTALL going to the network.
+    """
+
+    def __init__(self, settings: Settings, data_dir: Path) -> None:
+        self.settings = settings
+        self.data_dir = data_dir
+        # Seconds the last start took, for the logs and /metrics
+        self.start_seconds: float | None = None
+        self._state: _State | None = None
+        self._lock = threading.RLock()
+
+    @property
+    def started(self) -> bool:
+        state = self._state
+        return state is not None and state.pid == os.getpid()
+
+    @property
+    def db(self) -> duckdb.DuckDBPyConnection:
+        return self._current().db
+
+    @property
+    def query_pool(self) -> CursorPool:
+        return self._current().query_pool
+
+    @property
+    def result_cursors(self) -> cursors.CursorRegistry:
+        return self._current().result_cursors
+
+    @property
+    def job_manager(self) -> jobs.JobManager:
+        return self._current().job_manager
+
+    @property
+    def block_cache(self) -> BlockCache | None:
+        return self._state.block_cache if self.started else None
+
+    def start(self) -> None:
+        """Open the database, unless this process already has."""
+        self._current()
+
+    def require_remote(self, *texts: str) -> None:
+        """Load httpfs first if any of texts (SQL, dataset paths) names a remote URL.
+
+        A failure is logged rather than raised, and retried next time; the
+        query that needed httpfs then fails with DuckDB's own error.
+        """
+        if not any(text and _REMOTE.search(text) for text in texts):
+            return
+        state = self._current()
+        if state.remote:
+            return
+        with self._lock:
+            if state.remote:
+                return
+            try:
+                self._load_remote(state)
+            except (duckdb.Error, ImportError):
+                logger.exception("Loading remote file support failed")
+                return
+            state.remote = True
+
+    def warm_up(self, names: list[str]) -> None:
+        """Read the parquet footers of the named registered datasets into DuckDB's metadata cache.
+
+        count(*) over parquet is answered from the footers alone, so this
+        touches every file's metadata without reading its data.
+        """
+        for name in names:
+            dataset = views.get(name)
+            if dataset is None:
+                logger.warning("Warm-up skipped unknown dataset %s", name)
+                continue
+            started = time.perf_counter()
+            self.require_remote(dataset["path"])
+            try:
+                with self.query_pool.cursor() as cursor:
+                    cursor.execute(f"SELECT count(*) FROM {views.quote_identifier(dataset['name'])}").fetchall()
+            except duckdb.Error:
+                logger.exception("Warming up dataset %s failed", name)
+                continue
+            logger.info(
+                "Warmed up dataset %s (%d files) in %.0f ms",
+                name,
+                len(dataset["files"]),
+                (time.perf_counter() - started) * 1000,
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            state = self._state
+            if state is None or state.pid != os.getpid():
+                return
+            state.job_manager.close()
+            state.result_cursors.close_all()
+            state.query_pool.close()
+            state.db.close()
+            self._state = None
+
+    def stats(self) -> dict:
+        return {"started": self.started, "start_seconds": self.start_seconds or 0.0}
+
+    def _current(self) -> _State:
+        state = self._state
+        if state is not None and state.pid == os.getpid():
+            return state
+        with self._lock:
+            state = self._state
+            if state is None or state.pid != os.getpid():
+                if state is not None:
+                    # The parent's connections and worker threads don't survive a fork; leave them be
+                    logger.info("Process was forked; opening a new DuckDB database")
+                started = time.perf_counter()
+                state = self._state = self._open()
+                self.start_seconds = time.perf_counter() - started
+                logger.info("DuckDB engine started in %.0f ms", self.start_seconds * 1000)
+            return state
+
+    def _open(self) -> _State:
+        settings = self.settings
+        db = duckdb.connect()
+        db.execute(f"SET GLOBAL home_directory = '{os.environ.get('DUCKDB_HOME', '/tmp')}'")
+        db.execute(f"SET GLOBAL file_search_path = '{self.data_dir}'")
+        # Keep parquet footers in memory so dataset views don't re-read them on every query
+        db.execute("SET GLOBAL parquet_metadata_cache = true")
+
+        # DuckDB scopes memory and spill settings to the database instance, not the connection
+        if settings.duckdb_memory_limit:
+            db.execute(f"SET GLOBAL memory_limit = '{settings.duckdb_memory_limit}'")
+        if settings.duckdb_temp_directory:
+            db.execute(f"SET GLOBAL temp_directory = '{settings.duckdb_temp_directory}'")
+        if settings.duckdb_max_temp_directory_size:
+            db.execute(f"SET GLOBAL max_temp_directory_size = '{settings.duckdb_max_temp_directory_size}'")
+
+        # A new database has none of the views registered against an earlier one
+        views.forget_all()
+        return _State(
+            db,
+            CursorPool(
+                db,
+                max_concurrency=settings.query_max_concurrency or os.cpu_count() or 1,
+                max_queue=settings.query_max_queue,
+                queue_timeout=settings.query_queue_timeout_seconds,
+            ),
+            cursors.CursorRegistry(
+                db,
+                max_per_client=settings.query_cursor_max_per_client,
+                max_open=settings.query_cursor_max_open,
+                idle_seconds=settings.query_cursor_idle_seconds,
+                batch_size=settings.stream_batch_size,
+            ),
+            jobs.JobManager(
+                db,
+                settings.jobs_dir or Path(tempfile.gettempdir()) / "duckstack-jobs",
+                max_workers=settings.jobs_max_workers,
+                max_queued=settings.jobs_max_queued,
+                result_ttl=settings.jobs_result_ttl_seconds,
+                batch_size=settings.stream_batch_size,
+            ),
+        )
+
+    def _load_remote(self, state: _State) -> None:
+        settings = self.settings
+        db = state.db
+        started = time.perf_counter()
+        # INSTALL is skipped when pre-installed, e.g. in Docker
+        try:
+            db.execute("INSTALL httpfs")
+        except duckdb.Error:
+            pass  # already installed (e.g. baked into container image)
+        db.execute("LOAD httpfs")
+        if settings.aws_access_key_id:
+            db.execute(f"SET GLOBAL s3_access_key_id = '{settings.aws_access_key_id}'")
+            db.execute(f"SET GLOBAL s3_secret_access_key = '{settings.aws_secret_access_key}'")
+            db.execute(f"SET GLOBAL s3_region = '{settings.aws_region}'")
+        if settings.s3_endpoint_url:
+            endpoint = urlsplit(settings.s3_endpoint_url)
+            db.execute(f"SET GLOBAL s3_endpoint = '{endpoint.netloc}'")
+            db.execute(f"SET GLOBAL s3_use_ssl = {endpoint.scheme == 'https'}")
+            db.execute("SET GLOBAL s3_url_style = 'path'")
+
+        # Read s3:// through a local disk cache of object blocks instead of going to S3 every time
+        if settings.s3_block_cache_dir:
+            from duckstack import s3cache
+
+            state.block_cache = BlockCache(settings.s3_block_cache_dir, settings.s3_block_cache_max_bytes)
+            s3cache.install(
+                db,
+                state.block_cache,
+                settings.s3_block_cache_block_size,
+                key=settings.aws_access_key_id or None,
+                secret=settings.aws_secret_access_key or None,
+                client_kwargs={"region_name": settings.aws_region, "endpoint_url": settings.s3_endpoint_url or None},
+            )
+        logger.info("Loaded remote file support in %.0f ms", (time.perf_counter() - started) * 1000)
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from duckstack import formats, pruning
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+INTERRUPT_RETRY_SECONDS = 0.05
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting for a worker."""
+
+
+class Job:
+    def __init__(self, sql: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.sql = sql
+        self.status = QUEUED
+        self.error: str | None = None
+        self.submitted_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        # Rows written to the result file so far
+        self.row_count = 0
+        self.path: Path | None = None
+        self.cursor: duckdb.DuckDBPyConnection | None = None
+        self.future: Future | None = None
+
+    def progress(self) -> float | None:
+        """Percent complete, if DuckDB can estimate it."""
+        if self.status == SUCCEEDED:
+            return 100.0
+        cursor = self.cursor
+        if self.status != RUNNING or cursor is None:
+            return None
+        try:
+            value = cursor.query_progress()
+        except duckdb.Error:
+            return None
+        return value if value >= 0 else None
+
+    def elapsed(self) -> float | None:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobManager:
+    """Runs SQL in the background and keeps each result in a parquet file.
+
+    Jobs run on a fixed number of worker threads, each on its own DuckDB
+    cursor, so they neither hold an HTTP request open nor take cursors from
+    the /query pool. Results are written batch by batch, so a job's memory
+    stays bounded whatever its result size, and read back a page at a time.
+    A finished job and its file are kept for result_ttl seconds.
+
+    Jobs are kept in memory: a job is only known to the process that
+    accepted it.
+    """
+
+    def __init__(
+        self,
+        db: duckdb.DuckDBPyConnection,
+        directory: str | os.PathLike,
+        max_workers: int,
+        max_queued: int,
+        result_ttl: float,
+        batch_size: int,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self._db = db
+        self._batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="duckstack-job")
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, sql: str) -> Job:
+        job = Job(sql)
+        with self._lock:
+            if sum(1 for j in self._jobs.values() if j.status == QUEUED) >= self.max_queued:
+                raise JobQueueFull(f"Job queue full ({self.max_queued} waiting)")
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def delete(self, job_id: str) -> bool:
+        """Cancel a job if it hasn't finished, and discard it and its result."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            active = job.status in (QUEUED, RUNNING)
+            cursor = job.cursor
+            if active:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        if active and not job.future.cancel() and cursor is not None:
+            _stop(job.future, cursor)
+        # A running job removes its own partial file once it sees the cancellation
+        if job.path is not None:
+            job.path.unlink(missing_ok=True)
+        return True
+
+    def sweep(self) -> None:
+        """Drop finished jobs past their TTL, and result files nobody owns any more."""
+        now = time.time()
+        with self._lock:
+            expired = [
+                j for j in self._jobs.values() if j.finished_at is not None and now - j.finished_at > self.result_ttl
+            ]
+            for job in expired:
+                del self._jobs[job.id]
+            owned = {j.path.name for j in self._jobs.values() if j.path is not None}
+        for job in expired:
+            if job.path is not None:
+                job.path.unlink(missing_ok=True)
+        # Left behind by a crashed or restarted process; running jobs keep
+        # touching their files, so only long-untouched ones are removed
+        for entry in self.directory.glob("*.parquet*"):
+            try:
+                if entry.name not in owned and now - entry.stat().st_mtime > self.result_ttl:
+                    entry.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+
+    async def sweep_forever(self, interval_seconds: float) -> None:
+        """Periodically expire old jobs; run as a background task."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("Sweeping job results failed")
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [j.status for j in self._jobs.values()]
+        return {status: statuses.count(status) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)}
+
+    def close(self) -> None:
+        for job_id in list(self._jobs):
+            self.delete(job_id)
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job: Job) -> None:
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.cursor = cursor = self._db.cursor()
+        path = self.directory / f"{job.id}.parquet"
+        # Written under a temporary name so a half-written file is never paged through
+        tmp = path.with_name(f"{path.name}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            cursor.execute("SET enable_progress_bar = true")
+            cursor.execute("SET enable_progress_bar_print = false")
+            with pruning.pruned(cursor, job.sql):
+                reader = formats.arrow_reader(cursor.execute(job.sql), self._batch_size)
+                with pq.ParquetWriter(tmp, reader.schema) as writer:
+                    for batch in reader:
+                        if job.status != RUNNING:
+                            break
+                        writer.write_batch(batch)
+                        job.row_count += batch.num_rows
+            os.replace(tmp, path)
+            self._finish(job, SUCCEEDED, path=path)
+        except Exception as e:
+            self._finish(job, FAILED, error=str(e))
+        finally:
+            tmp.unlink(missing_ok=True)
+            job.cursor = None
+            cursor.close()
+
+    def _finish(self, job: Job, status: str, path: Path | None = None, error: str | None = None) -> None:
+        with self._lock:
+            if job.status == RUNNING:
+                job.status = status
+                job.path = path
+                job.error = error
+                job.finished_at = time.time()
+                return
+        # Cancelled while running: whatever it produced is unwanted
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+
+def _stop(future: Future, cursor: duckdb.DuckDBPyConnection) -> None:
+    """Interrupt a job's cursor until the job has finished.
+
+    An interrupt only stops the statement running at that moment, so one
+    sent just before the job starts its query would be lost.
+    """
+    while not future.done():
+        try:
+            cursor.interrupt()
+        except duckdb.ConnectionException:
+            # The job closed its cursor on the way out
+            pass
+        # The job records its own outcome; this only waits for it
+        with contextlib.suppress(FutureTimeout):
+            future.result(timeout=INTERRUPT_RETRY_SECONDS)
+
+
+def read_page(path: Path, offset: int, limit: int) -> tuple[pa.Table, int]:
+    """Read rows [offset, offset + limit) of a result file, and its total row count.
+
+    Only the row groups overlapping the page are read.
+    """
+    parquet = pq.ParquetFile(path)
+    groups: list[int] = []
+    skip = 0
+    start = 0
+    for index in range(parquet.num_row_groups):
+        rows = parquet.metadata.row_group(index).num_rows
+        if start + rows > offset and start < offset + limit:
+            if not groups:
+                skip = offset - start
+            groups.append(index)
+        start += rows
+    if not groups:
+        return parquet.schema_arrow.empty_table(), parquet.metadata.num_rows
+    return parquet.read_row_groups(groups).slice(skip, limit), parquet.metadata.num_rows
@@ -1,57 +1,206 @@
-import os
+import asyncio
+import contextlib
+import itertools
+import logging
+from collections.abc import AsyncIterator, Iterator
 from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Literal, Optional
 
 import duckdb
-from fastapi import FastAPI, HTTPException
+import pyarrow as pa
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
-from duckstack import catalog
-from duckstack.api_client import fetch_api_data
+from duckstack import (
+    api_client,
+    cache,
+    catalog,
+    cursors,
+    formats,
+    jobs,
+    materialize,
+    metrics,
+    pruning,
+    query_cache,
+    slowlog,
+    statements,
+    stats,
+    views,
+)
+from duckstack.catalog_cache import CatalogCache
+from duckstack.compression import CompressionMiddleware
 from duckstack.config import settings
+from duckstack.engine import Engine
+from duckstack.pool import Lease, PoolSaturated, QueryCancelled, QueryTimeout
 from duckstack.schemas import (
     ApiQueryRequest,
     ApiQueryResponse,
     ApiSourceCreate,
     ApiSourceDetail,
     ApiSourceSummary,
+    DatasetBulkCreate,
+    DatasetBulkResponse,
+    DatasetBulkResult,
     DatasetCreate,
     DatasetDetail,
+    DatasetRefresh,
     DatasetSummary,
+    JobCreate,
+    JobResults,
+    JobStatus,
+    MaterializedCreate,
+    MaterializedRefresh,
+    PartitionInfo,
     QueryRequest,
     QueryResponse,
 )
 
+logger = logging.getLogger(__name__)
+
 DATA_DIR = Path(settings.data_dir) if settings.data_dir else Path(__file__).resolve().parent.parent.parent / "data"
+MATERIALIZED_DIR = Path(settings.materialized_dir).resolve() if settings.materialized_dir else DATA_DIR / "materialized"
 
-db = duckdb.connect()
-db.execute(f"SET home_directory = '{os.environ.get('DUCKDB_HOME', '/tmp')}'")
-db.execute(f"SET file_search_path = '{DATA_DIR}'")
+engine = Engine(settings, DATA_DIR)
 
-# S3 support via httpfs (INSTALL is skipped when pre-installed, e.g. in Docker)
-try:
-    db.execute("INSTALL httpfs")
-except duckdb.Error:
-    pass  # already installed (e.g. baked into container image)
-db.execute("LOAD httpfs")
-if settings.aws_access_key_id:
-    db.execute(f"SET s3_access_key_id = '{settings.aws_access_key_id}'")
-    db.execute(f"SET s3_secret_access_key = '{settings.aws_secret_access_key}'")
-    db.execute(f"SET s3_region = '{settings.aws_region}'")
+statement_cache = statements.StatementCache(settings.query_statement_cache_size)
+
+slow_queries = slowlog.SlowQueryLog(settings.slow_query_ms, settings.slow_query_profile)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Opened here rather than on import, so each worker process gets its own database
+    await run_in_threadpool(engine.start)
     if settings.database_url:
         app.state.catalog_pool = await catalog.init_catalog(settings.database_url)
+        app.state.catalog_cache = CatalogCache(app.state.catalog_pool, on_datasets_loaded=_sync_views)
+        await app.state.catalog_cache.start()
     else:
         app.state.catalog_pool = None
+        app.state.catalog_cache = None
+    app.state.http_client = api_client.create_http_client()
+    background = [
+        asyncio.create_task(cache.sweep_forever(settings.cache_sweep_interval_seconds)),
+        asyncio.create_task(engine.job_manager.sweep_forever(settings.cache_sweep_interval_seconds)),
+        asyncio.create_task(engine.result_cursors.sweep_forever(settings.cache_sweep_interval_seconds)),
+    ]
+    if app.state.catalog_cache is not None:
+        background.append(
+            asyncio.create_task(
+                api_client.prewarm_forever(
+                    app.state.catalog_cache, app.state.http_client, settings.api_prewarm_interval_seconds
+                )
+            )
+        )
+        background.append(asyncio.create_task(_materialize_forever(settings.materialize_check_interval_seconds)))
+    if settings.engine_warmup_datasets:
+        background.append(asyncio.create_task(run_in_threadpool(engine.warm_up, _warmup_datasets())))
     yield
+    for task in background:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await app.state.http_client.aclose()
     if app.state.catalog_pool is not None:
+        await app.state.catalog_cache.close()
         await app.state.catalog_pool.close()
+    await run_in_threadpool(engine.close)
+
+
+def _warmup_datasets() -> list[str]:
+    names = [name.strip() for name in settings.engine_warmup_datasets.split(",") if name.strip()]
+    if "*" in names:
+        return sorted(views.registered())
+    return names
 
 
 app = FastAPI(title="Duckstack", version="0.1.0", lifespan=lifespan)
 
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_bytes,
+        gzip_level=settings.compression_gzip_level,
+        zstd_level=settings.compression_zstd_level,
+    )
+# Added last so it is outermost: durations include compression, and bytes are as sent
+app.add_middleware(metrics.MetricsMiddleware, endpoints=["/query", "/api-query"])
+
+metrics.registry.collector(
+    metrics.stats_collector(
+        "duckstack_query_pool", "Query cursor pool", lambda: engine.query_pool.stats(), counters=["rejected"]
+    )
+)
+metrics.registry.collector(
+    metrics.stats_collector(
+        "duckstack_result_cache",
+        "In-process result cache",
+        cache.stats,
+        counters=["hits", "misses", "evictions", "expirations"],
+    )
+)
+metrics.registry.collector(
+    metrics.stats_collector(
+        "duckstack_shared_cache",
+        "Cross-process result cache",
+        cache.shared_stats,
+        counters=["hits", "misses", "writes", "evictions", "expirations"],
+    )
+)
+metrics.registry.collector(
+    metrics.stats_collector(
+        "duckstack_statement_cache",
+        "Prepared statement cache",
+        statement_cache.stats,
+        counters=["hits", "misses", "evictions"],
+    )
+)
+metrics.registry.collector(
+    metrics.stats_collector(
+        "duckstack_result_cursors", "Open result cursors", lambda: engine.result_cursors.stats(), ["evictions"]
+    )
+)
+metrics.registry.collector(
+    metrics.stats_collector("duckstack_jobs", "Background jobs by status", lambda: engine.job_manager.stats())
+)
+metrics.registry.collector(
+    metrics.stats_collector("duckstack", "Slow query log", slow_queries.stats, counters=["slow_queries"])
+)
+metrics.registry.collector(
+    metrics.stats_collector(
+        "duckstack_block_cache",
+        "S3 block cache",
+        # Only set up once a query reads from S3
+        lambda: engine.block_cache.stats() if engine.block_cache is not None else {},
+        counters=["hits", "misses", "evictions"],
+    )
+)
+metrics.registry.collector(metrics.stats_collector("duckstack_engine", "DuckDB engine", engine.stats))
+
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request, exc: PoolSaturated):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(cursors.CursorLimit)
+async def cursor_limit_handler(request, exc: cursors.CursorLimit):
+    return JSONResponse(status_code=429, content={"detail": str(exc)})
+
+
+@app.exception_handler(QueryTimeout)
+async def query_timeout_handler(request, exc: QueryTimeout):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+@app.exception_handler(QueryCancelled)
+async def query_cancelled_handler(request, exc: QueryCancelled):
+    # 499 is the de facto status for "client closed request"; nobody is listening anyway
+    return JSONResponse(status_code=499, content={"detail": str(exc)})
+
 
 def _require_catalog(app: FastAPI):
     pool = getattr(app.state, "catalog_pool", None)
@@ -60,60 +209,602 @@ def _require_catalog(app: FastAPI):
     return pool
 
 
+def _require_catalog_cache(app: FastAPI) -> CatalogCache:
+    _require_catalog(app)
+    return app.state.catalog_cache
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
-@app.post("/query", response_model=QueryResponse)
-def query(req: QueryRequest):
-    try:
-        result = db.execute(req.sql)
-        columns = [desc[0] for desc in result.description]
-        rows = result.fetchall()
+@app.get("/metrics", response_class=Response, responses={200: {"content": {metrics.CONTENT_TYPE: {}}}})
+def get_metrics():
+    """Request timings and cache, pool, cursor and job counters in Prometheus text format."""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.post(
+    "/query",
+    response_model=QueryResponse,
+    responses={200: {"content": {formats.ARROW_STREAM: {}, formats.NDJSON: {}}}},
+)
+async def query(req: QueryRequest, request: Request, accept: str = Header(default="")):
+    timeout = _query_timeout(req.timeout_ms)
+    if req.cursor:
+        if req.stream or req.cache:
+            raise HTTPException(status_code=400, detail="cursor cannot be combined with stream or cache")
+        client = request.client.host if request.client else ""
+        try:
+            return await run_in_threadpool(_open_cursor, client, req, accept, timeout)
+        except duckdb.Error as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if req.stream:
+        return await run_in_threadpool(_stream_query, req.sql, req.params, accept, timeout)
+
+    def work(cursor: duckdb.DuckDBPyConnection):
+        if req.cache:
+            return _cached_query(cursor, req.sql, req.params, accept, req.format)
+        with pruning.pruned(cursor, req.sql, req.params), slow_queries.watch(cursor, req.sql):
+            result = _execute(cursor, req.sql, req.params)
+            if formats.accepts(accept, formats.ARROW_STREAM):
+                # Encoded batch by batch as DuckDB produces them, so fetching and serializing overlap
+                with metrics.phase("fetch"):
+                    body = formats.arrow_ipc_bytes(_counted(formats.arrow_reader(result)))
+                return Response(content=body, media_type=formats.ARROW_STREAM)
+            if req.format == "columnar":
+                with metrics.phase("fetch"):
+                    table = formats.arrow_reader(result).read_all()
+                return _columnar_response(table, cached=False)
+            columns = [desc[0] for desc in result.description]
+            with metrics.phase("fetch"):
+                rows = result.fetchall()
+        metrics.record_rows(len(rows))
         return QueryResponse(
             columns=columns,
             rows=[list(r) for r in rows],
             row_count=len(rows),
         )
+
+    try:
+        return await engine.query_pool.run(work, timeout, request.is_disconnected)
+    except duckdb.Error as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _execute(
+    cursor: duckdb.DuckDBPyConnection, sql: str, params: Optional[statements.Params]
+) -> duckdb.DuckDBPyConnection:
+    # A remote URL may come in as a parameter value, as in read_parquet($1)
+    engine.require_remote(sql, *statements.text_values(params))
+    # Parameterized queries are templates worth keeping prepared; others run as they are
+    with metrics.phase("execute"):
+        if params is None:
+            return cursor.execute(sql)
+        return statement_cache.execute(cursor, sql, params)
+
+
+def _counted(reader: pa.RecordBatchReader) -> pa.RecordBatchReader:
+    """Pass reader's batches through, counting their rows for the request's metrics."""
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        for batch in reader:
+            metrics.record_rows(batch.num_rows)
+            yield batch
+
+    return pa.RecordBatchReader.from_batches(reader.schema, batches())
+
+
+def _arrow_response(table: pa.Table, headers: Optional[dict] = None) -> Response:
+    metrics.record_rows(table.num_rows)
+    with metrics.phase("serialize"):
+        body = formats.arrow_ipc_bytes(table.to_reader())
+    return Response(content=body, media_type=formats.ARROW_STREAM, headers=headers)
+
+
+def _columnar_response(table: pa.Table, **fields) -> Response:
+    metrics.record_rows(table.num_rows)
+    with metrics.phase("serialize"):
+        body = formats.columnar_json(table, **fields)
+    return Response(content=body, media_type=formats.JSON)
+
+
+def _cached_query(
+    cursor: duckdb.DuckDBPyConnection,
+    sql: str,
+    params: Optional[statements.Params],
+    accept: str,
+    format: str = "rows",
+):
+    # The cache key stats the files the query reads, which may be remote
+    engine.require_remote(sql, *statements.text_values(params))
+    with metrics.phase("cache"):
+        key = query_cache.cache_key(cursor, sql, params)
+        table = cache.get(key)
+    was_cached = table is not None
+    if table is None:
+        with pruning.pruned(cursor, sql, params), slow_queries.watch(cursor, sql):
+            result = _execute(cursor, sql, params)
+            with metrics.phase("fetch"):
+                table = formats.arrow_reader(result).read_all()
+        cache.put(key, table, settings.query_cache_ttl_seconds)
+
+    if formats.accepts(accept, formats.ARROW_STREAM):
+        return _arrow_response(table, headers={"X-Duckstack-Cache": "hit" if was_cached else "miss"})
+    if format == "columnar":
+        return _columnar_response(table, cached=was_cached)
+    metrics.record_rows(table.num_rows)
+    return QueryResponse(
+        columns=table.column_names,
+        rows=formats.table_rows(table),
+        row_count=table.num_rows,
+        cached=was_cached,
+    )
+
+
+@app.get(
+    "/query/cursors/{token}",
+    response_model=QueryResponse,
+    responses={200: {"content": {formats.ARROW_STREAM: {}}}},
+)
+async def fetch_cursor(
+    token: str,
+    page_size: Optional[int] = Query(default=None, gt=0, le=100_000),
+    format: Literal["rows", "columnar"] = "rows",
+    accept: str = Header(default=""),
+):
+    """Return the next page of an open result cursor."""
+    result = engine.result_cursors.get(token)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Cursor not found; it may have expired")
+    try:
+        return await run_in_threadpool(_cursor_page, result, page_size, accept, _query_timeout(None), format)
+    except duckdb.Error as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.delete("/query/cursors/{token}", status_code=204)
+async def close_cursor(token: str):
+    if not await run_in_threadpool(engine.result_cursors.close, token):
+        raise HTTPException(status_code=404, detail="Cursor not found; it may have expired")
+
+
+def _open_cursor(client: str, req: QueryRequest, accept: str, timeout: Optional[float]):
+    engine.require_remote(req.sql, *statements.text_values(req.params))
+    with metrics.phase("execute"):
+        result = engine.result_cursors.open(client, req.sql, timeout, req.params)
+    return _cursor_page(result, req.page_size, accept, timeout, req.format)
+
+
+def _cursor_page(
+    result: cursors.ResultCursor,
+    page_size: Optional[int],
+    accept: str,
+    timeout: Optional[float],
+    format: str = "rows",
+):
+    try:
+        with metrics.phase("fetch"):
+            table = result.fetch(page_size or settings.query_cursor_page_size, timeout)
+    except BaseException:
+        # An interrupted or failed result can't be resumed
+        engine.result_cursors.close(result.token)
+        raise
+    token = result.token
+    if result.exhausted:
+        engine.result_cursors.close(token)
+        token = None
+
+    if formats.accepts(accept, formats.ARROW_STREAM):
+        return _arrow_response(table, headers={"X-Duckstack-Cursor": token} if token else {})
+    if format == "columnar":
+        return _columnar_response(table, cached=False, cursor=token)
+    metrics.record_rows(table.num_rows)
+    return QueryResponse(
+        columns=table.column_names,
+        rows=formats.table_rows(table),
+        row_count=table.num_rows,
+        cursor=token,
+    )
+
+
+def _query_timeout(timeout_ms: Optional[int]) -> Optional[float]:
+    """Seconds until a query is interrupted, or None for no deadline."""
+    if timeout_ms is None:
+        timeout_ms = settings.query_timeout_ms
+    return timeout_ms / 1000 if timeout_ms > 0 else None
+
+
+def _stream_query(
+    sql: str, params: Optional[statements.Params], accept: str, timeout: Optional[float]
+) -> StreamingResponse:
+    # The lease is held until the last chunk has been sent, and its deadline
+    # covers the whole stream, not just the time to the first batch
+    with metrics.phase("queue"):
+        lease = engine.query_pool.lease(timeout)
+    shadows: list[str] = []
+    try:
+        with metrics.phase("prune"):
+            shadows = pruning.shadow(lease.cursor, sql, params)
+        _execute(lease.cursor, sql, params)
+    except duckdb.InterruptException:
+        _finish(lease, shadows)
+        if lease.timed_out:
+            raise QueryTimeout(f"Query exceeded timeout of {timeout * 1000:.0f} ms")
+        raise
     except duckdb.Error as e:
+        _finish(lease, shadows)
         raise HTTPException(status_code=400, detail=str(e))
 
+    reader = _counted(formats.arrow_reader(lease.cursor, settings.stream_batch_size))
+    if formats.accepts(accept, formats.ARROW_STREAM):
+        chunks, media_type = formats.arrow_ipc_chunks(reader), formats.ARROW_STREAM
+    else:
+        chunks, media_type = formats.ndjson_chunks(reader), formats.NDJSON
+
+    # Pull the first chunk here so the generator is started (and its finally
+    # block guaranteed to release the cursor) before the response is handed off
+    stream = _releasing(chunks, lease, shadows)
+    try:
+        first = next(stream, None)
+    except duckdb.Error as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    body = itertools.chain([first] if first is not None else [], stream)
+    return StreamingResponse(_interrupt_on_disconnect(body, lease), media_type=media_type)
+
+
+def _releasing(chunks: Iterator[bytes], lease: Lease, shadows: list[str]) -> Iterator[bytes]:
+    try:
+        yield from chunks
+    finally:
+        _finish(lease, shadows)
+
+
+def _finish(lease: Lease, shadows: list[str]) -> None:
+    try:
+        pruning.drop(lease.cursor, shadows)
+    finally:
+        lease.release()
+
+
+async def _interrupt_on_disconnect(body: Iterator[bytes], lease: Lease) -> AsyncIterator[bytes]:
+    # Starlette cancels the response when the client disconnects; stop the query with it
+    try:
+        async for chunk in iterate_in_threadpool(body):
+            yield chunk
+    except BaseException:
+        lease.interrupt()
+        raise
+
+
+# --- Jobs ---
+
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_job(body: JobCreate):
+    """Run SQL in the background; poll GET /jobs/{id} and page through the results."""
+    await run_in_threadpool(engine.require_remote, body.sql)
+    try:
+        job = engine.job_manager.submit(body.sql)
+    except jobs.JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return _job_status(job)
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    return _job_status(_require_job(job_id))
+
+
+@app.get(
+    "/jobs/{job_id}/results",
+    response_model=JobResults,
+    responses={200: {"content": {formats.ARROW_STREAM: {}}}},
+)
+async def get_job_results(
+    job_id: str,
+    page: int = Query(default=0, ge=0),
+    page_size: int = Query(default=settings.jobs_page_size, gt=0, le=100_000),
+    accept: str = Header(default=""),
+):
+    job = _require_job(job_id)
+    if job.status != jobs.SUCCEEDED:
+        detail = f"Job failed: {job.error}" if job.status == jobs.FAILED else f"Job is {job.status}"
+        raise HTTPException(status_code=409, detail=detail)
+    try:
+        table, total = await run_in_threadpool(jobs.read_page, job.path, page * page_size, page_size)
+    except FileNotFoundError:
+        # Expired or deleted between the lookup and the read
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+    next_page = page + 1 if (page + 1) * page_size < total else None
+    if formats.accepts(accept, formats.ARROW_STREAM):
+        headers = {"X-Duckstack-Total-Rows": str(total)}
+        if next_page is not None:
+            headers["X-Duckstack-Next-Page"] = str(next_page)
+        return Response(
+            content=formats.arrow_ipc_bytes(table.to_reader()), media_type=formats.ARROW_STREAM, headers=headers
+        )
+    return JobResults(
+        columns=table.column_names,
+        rows=formats.table_rows(table),
+        row_count=table.num_rows,
+        page=page,
+        page_size=page_size,
+        total_rows=total,
+        next_page=next_page,
+    )
+
+
+@app.delete("/jobs/{job_id}", status_code=204)
+async def delete_job(job_id: str):
+    """Cancel a job that hasn't finished, and discard its results."""
+    if not await run_in_threadpool(engine.job_manager.delete, job_id):
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+
+def _require_job(job_id: str) -> jobs.Job:
+    job = engine.job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+def _job_status(job: jobs.Job) -> JobStatus:
+    def timestamp(seconds: Optional[float]) -> Optional[datetime]:
+        return None if seconds is None else datetime.fromtimestamp(seconds, timezone.utc)
+
+    finished_at = job.finished_at
+    return JobStatus(
+        id=job.id,
+        status=job.status,
+        sql=job.sql,
+        submitted_at=timestamp(job.submitted_at),
+        started_at=timestamp(job.started_at),
+        finished_at=timestamp(finished_at),
+        elapsed_seconds=job.elapsed(),
+        progress=job.progress(),
+        row_count=job.row_count,
+        error=job.error,
+        expires_at=timestamp(finished_at + engine.job_manager.result_ttl if finished_at is not None else None),
+    )
+
 
 @app.get("/datasets", response_model=list[DatasetSummary])
 async def list_datasets():
-    pool = _require_catalog(app)
-    datasets = await catalog.list_datasets(pool)
-    return datasets
+    return _require_catalog_cache(app).list_datasets()
 
 
 @app.post("/datasets", response_model=DatasetDetail, status_code=201)
 async def create_dataset(body: DatasetCreate):
     pool = _require_catalog(app)
+    if body.partition_columns and any(c in body.path for c in "*?["):
+        raise HTTPException(
+            status_code=400, detail="The path of a partitioned dataset must be its root directory, without globs"
+        )
 
-    # Infer columns from the parquet file using DuckDB
+    # Infer columns and collect per-file statistics using DuckDB
+    spec = {"name": body.name, "path": body.path, "partition_columns": body.partition_columns}
     try:
-        result = db.execute(f"DESCRIBE SELECT * FROM '{body.path}'")
-        columns = [{"name": row[0], "dtype": row[1]} for row in result.fetchall()]
+        columns, files = await run_in_threadpool(_with_cursor, _inspect, spec)
     except duckdb.Error as e:
         raise HTTPException(status_code=400, detail=f"Cannot read file: {e}")
 
     try:
         dataset = await catalog.create_dataset(
-            pool, body.name, body.path, body.description, columns
+            pool, body.name, body.path, body.description, columns, files, body.partition_columns
         )
     except Exception as e:
         if "unique" in str(e).lower() or "duplicate" in str(e).lower():
             raise HTTPException(status_code=409, detail=f"Dataset '{body.name}' already exists")
         raise
 
+    app.state.catalog_cache.put_dataset(dataset)
+    await _register_view(dataset)
     return dataset
 
 
+@app.post("/datasets/bulk", response_model=DatasetBulkResponse)
+async def create_datasets(body: DatasetBulkCreate):
+    """Register every dataset found under a prefix, and/or a list of them, in one transaction.
+
+    Schemas and file statistics are read DATASET_BULK_CONCURRENCY datasets
+    at a time. One dataset failing, or already existing, doesn't stop the
+    rest; each gets its own status in the response.
+    """
+    pool = _require_catalog(app)
+    specs = [{**d.model_dump(), "description": d.description or body.description} for d in body.datasets]
+    if body.prefix:
+        await run_in_threadpool(engine.require_remote, body.prefix)
+        try:
+            found = await run_in_threadpool(_with_cursor, views.discover, body.prefix)
+        except duckdb.Error as e:
+            raise HTTPException(status_code=400, detail=f"Cannot list files: {e}")
+        specs += [{"partition_columns": [], **d, "description": body.description} for d in found]
+    if not specs:
+        raise HTTPException(status_code=400, detail="Give a prefix or a list of datasets")
+
+    results: list[DatasetBulkResult] = []
+    # The result of each name's first occurrence; later ones fail as duplicates
+    by_name: dict[str, DatasetBulkResult] = {}
+    todo = []
+    for spec in specs:
+        name, path = spec["name"], spec["path"]
+        result = DatasetBulkResult(name=name, path=path, status="created")
+        results.append(result)
+        if name in by_name:
+            result.status, result.error = "failed", f"Dataset '{name}' is given more than once"
+            continue
+        by_name[name] = result
+        if app.state.catalog_cache.get_dataset(name) is not None:
+            result.status = "exists"
+        elif "error" in spec:
+            result.status, result.error = "failed", spec["error"]
+        elif spec["partition_columns"] and any(c in path for c in "*?["):
+            result.status = "failed"
+            result.error = "The path of a partitioned dataset must be its root directory, without globs"
+        else:
+            todo.append(spec)
+
+    # Bounded so a bulk load neither overflows the query pool's queue nor starves other queries
+    limit = asyncio.Semaphore(max(1, settings.dataset_bulk_concurrency))
+
+    async def inspect(spec: dict) -> tuple[list[dict], list[dict]]:
+        async with limit:
+            return await run_in_threadpool(_with_cursor, _inspect, spec)
+
+    inspected = await asyncio.gather(*(inspect(spec) for spec in todo), return_exceptions=True)
+    ready = []
+    for spec, outcome in zip(todo, inspected):
+        if isinstance(outcome, duckdb.Error):
+            by_name[spec["name"]].status = "failed"
+            by_name[spec["name"]].error = f"Cannot read file: {outcome}"
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            columns, files = outcome
+            ready.append({**spec, "columns": columns, "files": files})
+
+    created = await catalog.create_datasets(pool, ready) if ready else []
+    for dataset in created:
+        by_name[dataset["name"]].file_count = dataset["file_count"]
+        by_name[dataset["name"]].row_count = dataset["row_count"]
+        app.state.catalog_cache.put_dataset(dataset)
+        await _register_view(dataset)
+    # Created by someone else since the check above
+    created_names = {d["name"] for d in created}
+    for spec in ready:
+        if spec["name"] not in created_names:
+            by_name[spec["name"]].status = "exists"
+
+    return DatasetBulkResponse(
+        created=len(created), failed=sum(r.status == "failed" for r in results), results=results
+    )
+
+
+@app.post("/datasets/{name}/refresh", response_model=DatasetDetail)
+async def refresh_dataset(name: str, body: Optional[DatasetRefresh] = None):
+    """Re-list a dataset's files (or some partitions') and update its file index.
+
+    Only files not yet in the index have their footers read, unless full is set.
+    """
+    pool = _require_catalog(app)
+    body = body or DatasetRefresh()
+    dataset = app.state.catalog_cache.get_dataset(name)
+    if dataset is None:
+        raise HTTPException(status_code=404, detail=f"Dataset '{name}' not found")
+    if dataset.get("materialization"):
+        # Re-listing would drop the files of a rebuild still being written, or keep superseded ones
+        raise HTTPException(
+            status_code=409, detail=f"'{name}' is materialized; refresh it with POST /materialized/{name}/refresh"
+        )
+    unknown = {key for partition in body.partitions for key in partition} - set(dataset["partition_columns"])
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Not partition columns of '{name}': {sorted(unknown)}")
+
+    in_scope = [
+        f for f in dataset["files"] if not body.partitions or any(_in_partition(f, p) for p in body.partitions)
+    ]
+    known = {} if body.full else {f["path"]: f for f in in_scope}
+    try:
+        columns, files = await run_in_threadpool(_with_cursor, _inspect, dataset, known, body.partitions)
+    except duckdb.Error as e:
+        raise HTTPException(status_code=400, detail=f"Cannot read file: {e}")
+
+    listed = {f["path"] for f in files}
+    added = [f for f in files if f["path"] not in known]
+    removed = [f["path"] for f in in_scope if body.full or f["path"] not in listed]
+    dataset = await catalog.refresh_dataset(pool, name, columns, added, removed)
+    if dataset is None:
+        raise HTTPException(status_code=404, detail=f"Dataset '{name}' not found")
+    app.state.catalog_cache.put_dataset(dataset)
+    await _register_view(dataset)
+    return dataset
+
+
+@app.get("/datasets/{name}/partitions", response_model=list[PartitionInfo])
+async def list_partitions(name: str):
+    dataset = _require_catalog_cache(app).get_dataset(name)
+    if dataset is None:
+        raise HTTPException(status_code=404, detail=f"Dataset '{name}' not found")
+    partitions: dict[tuple, dict] = {}
+    for f in dataset["files"]:
+        values = f.get("partition_values") or {}
+        entry = partitions.setdefault(
+            tuple(values.get(c) for c in dataset["partition_columns"]),
+            {"values": values, "file_count": 0, "row_count": 0},
+        )
+        entry["file_count"] += 1
+        if entry["row_count"] is not None and f.get("row_count") is not None:
+            entry["row_count"] += f["row_count"]
+        else:
+            entry["row_count"] = None
+    return list(partitions.values())
+
+
+def _in_partition(file: dict, partition: dict) -> bool:
+    values = file.get("partition_values") or {}
+    return all(values.get(key) == value for key, value in partition.items())
+
+
+async def _register_view(dataset: dict) -> None:
+    await run_in_threadpool(engine.require_remote, dataset["path"])
+    try:
+        await run_in_threadpool(_with_cursor, views.register, dataset)
+    except duckdb.Error:
+        # The dataset is in the catalog; the next catalog reload retries the view
+        logger.exception("Registering view for dataset %s failed", dataset["name"])
+
+
+async def _sync_views(datasets: list[dict]) -> None:
+    await run_in_threadpool(engine.require_remote, *(d["path"] for d in datasets))
+    await run_in_threadpool(_with_cursor, views.sync, datasets)
+
+
+def _with_cursor(fn, *args):
+    with engine.query_pool.cursor() as cursor:
+        return fn(cursor, *args)
+
+
+def _inspect(
+    cursor: duckdb.DuckDBPyConnection,
+    dataset: dict,
+    known: Optional[dict[str, dict]] = None,
+    partitions: Optional[list[dict]] = None,
+) -> tuple[list[dict], list[dict]]:
+    """Return the columns of a dataset's files, and one entry per file.
+
+    Parquet files get their footer statistics recorded (see stats.collect);
+    other formats only their paths. Entries in known are reused as they
+    are, so only new files are read. partitions limits the listing to those
+    partitions of a partitioned dataset.
+    """
+    engine.require_remote(dataset["path"])
+    patterns = [views.file_pattern(dataset, p) for p in partitions] if partitions else [views.file_pattern(dataset)]
+    paths = sorted({f for pattern in patterns for f in views.resolve_files(cursor, pattern)})
+    if not paths:
+        if partitions:
+            # The partitions are gone; nothing to describe
+            return dataset["columns"], []
+        raise duckdb.IOException(f"No files found that match the pattern \"{patterns[0]}\"")
+    result = cursor.execute(f"DESCRIBE SELECT * FROM {views.reader_sql(dataset, paths)}")
+    columns = [{"name": row[0], "dtype": row[1]} for row in result.fetchall()]
+
+    known = known or {}
+    new = [p for p in paths if p not in known]
+    if views.reader_function(dataset["path"]) == "read_parquet" and new:
+        read = {entry["path"]: entry for entry in stats.collect(cursor, new, columns)}
+    else:
+        read = {p: {"path": p} for p in new}
+    if dataset.get("partition_columns"):
+        read = {p: stats.with_partition_stats(e, views.partition_values(dataset, p)) for p, e in read.items()}
+    return columns, [known.get(p) or read[p] for p in paths]
+
+
 @app.get("/datasets/{name}", response_model=DatasetDetail)
 async def get_dataset(name: str):
-    pool = _require_catalog(app)
-    dataset = await catalog.get_dataset(pool, name)
+    dataset = _require_catalog_cache(app).get_dataset(name)
     if dataset is None:
         raise HTTPException(status_code=404, detail=f"Dataset '{name}' not found")
     return dataset
@@ -122,9 +813,147 @@ async def get_dataset(name: str):
 @app.delete("/datasets/{name}", status_code=204)
 async def delete_dataset(name: str):
     pool = _require_catalog(app)
+    dataset = app.state.catalog_cache.get_dataset(name)
     deleted = await catalog.delete_dataset(pool, name)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"Dataset '{name}' not found")
+    app.state.catalog_cache.drop_dataset(name)
+    await run_in_threadpool(_with_cursor, views.unregister, name)
+    if dataset is not None and dataset.get("materialization"):
+        # Materialized files belong to the dataset; nothing else reads them
+        await run_in_threadpool(materialize.remove_directory, MATERIALIZED_DIR, name)
+
+
+# --- Materialized datasets ---
+
+
+@app.get("/materialized", response_model=list[DatasetDetail])
+async def list_materialized():
+    return [d for d in _require_catalog_cache(app).list_datasets() if d.get("materialization")]
+
+
+@app.post("/materialized", response_model=DatasetDetail, status_code=201)
+async def create_materialized(body: MaterializedCreate):
+    """Run a query, write its result to parquet and register it as a dataset."""
+    pool = _require_catalog(app)
+    if app.state.catalog_cache.get_dataset(body.name) is not None:
+        raise HTTPException(status_code=409, detail=f"Dataset '{body.name}' already exists")
+
+    try:
+        target = materialize.directory(MATERIALIZED_DIR, body.name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await run_in_threadpool(engine.require_remote, body.sql)
+    try:
+        columns, entry, watermark, _ = await run_in_threadpool(
+            _with_cursor, materialize.run, target, body.sql, body.watermark_column
+        )
+    except duckdb.Error as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    definition = {
+        "sql": body.sql,
+        "refresh_interval_seconds": body.refresh_interval_seconds,
+        "watermark_column": body.watermark_column,
+        "watermark": watermark,
+    }
+    path = materialize.dataset_path(MATERIALIZED_DIR, body.name)
+    try:
+        dataset = await catalog.create_materialized(pool, body.name, path, body.description, columns, [entry], definition)
+    except Exception as e:
+        materialize.remove([entry["path"]])
+        if "unique" in str(e).lower() or "duplicate" in str(e).lower():
+            raise HTTPException(status_code=409, detail=f"Dataset '{body.name}' already exists")
+        raise
+
+    app.state.catalog_cache.put_dataset(dataset)
+    await _register_view(dataset)
+    return dataset
+
+
+@app.post("/materialized/{name}/refresh", response_model=DatasetDetail)
+async def refresh_materialized(name: str, body: Optional[MaterializedRefresh] = None):
+    _require_catalog(app)
+    body = body or MaterializedRefresh()
+    try:
+        dataset = await _materialize(name, body.full)
+    except (duckdb.Error, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if dataset is None:
+        raise HTTPException(status_code=409, detail=f"Materialized dataset '{name}' is already being refreshed")
+    return dataset
+
+
+async def _materialize(name: str, full: bool = False, if_due: bool = False) -> Optional[dict]:
+    """Refresh a materialized dataset: append rows past its watermark, or recompute it.
+
+    Returns None, doing nothing, if another worker is refreshing it right
+    now, or if if_due is set and its refresh interval hasn't passed yet.
+    """
+    pool = app.state.catalog_pool
+    async with catalog.materialization_lock(pool, name) as locked:
+        if not locked:
+            return None
+        # Read the definition under the lock: another worker may have just refreshed it
+        materialization = await catalog.get_materialization(pool, name)
+        if materialization is None:
+            raise HTTPException(status_code=404, detail=f"Materialized dataset '{name}' not found")
+        if if_due and not materialize.is_due(materialization):
+            return None
+
+        await run_in_threadpool(engine.require_remote, materialization["sql"])
+        columns, entry, watermark, replace = await run_in_threadpool(
+            _with_cursor,
+            materialize.run,
+            materialize.directory(MATERIALIZED_DIR, name),
+            materialization["sql"],
+            materialization["watermark_column"],
+            None if full else materialization["watermark"],
+            materialization["columns"],
+        )
+        added = [entry] if entry else []
+        try:
+            dataset, removed = await catalog.update_materialized(pool, name, columns, added, replace, watermark)
+        except BaseException:
+            materialize.remove([f["path"] for f in added])
+            raise
+    if dataset is None:
+        materialize.remove([f["path"] for f in added])
+        raise HTTPException(status_code=404, detail=f"Materialized dataset '{name}' not found")
+
+    app.state.catalog_cache.put_dataset(dataset)
+    await _register_view(dataset)
+    # Other workers' views, and running queries, cursors and jobs, may still read the
+    # superseded files; they are removed by a later sweep, after MATERIALIZE_RETAIN_SECONDS
+    await run_in_threadpool(materialize.retire, removed)
+    return dataset
+
+
+async def _materialize_forever(interval_seconds: float) -> None:
+    """Refresh every scheduled materialized dataset that is due; run as a background task."""
+    while True:
+        for dataset in app.state.catalog_cache.list_datasets():
+            materialization = dataset.get("materialization")
+            if not materialization or not materialize.is_due(materialization):
+                continue
+            try:
+                await _materialize(dataset["name"], if_due=True)
+            except Exception:
+                logger.exception("Refreshing materialized dataset %s failed", dataset["name"])
+        for dataset in app.state.catalog_cache.list_datasets():
+            if not dataset.get("materialization"):
+                continue
+            try:
+                await run_in_threadpool(
+                    materialize.sweep,
+                    MATERIALIZED_DIR,
+                    dataset["name"],
+                    [f["path"] for f in dataset["files"]],
+                    settings.materialize_retain_seconds,
+                )
+            except (OSError, ValueError):
+                logger.exception("Removing superseded files of %s failed", dataset["name"])
+        await asyncio.sleep(interval_seconds)
 
 
 # --- API Sources ---
@@ -132,8 +961,7 @@ async def delete_dataset(name: str):
 
 @app.get("/api-sources", response_model=list[ApiSourceSummary])
 async def list_api_sources():
-    pool = _require_catalog(app)
-    return await catalog.list_api_sources(pool)
+    return _require_catalog_cache(app).list_api_sources()
 
 
 @app.post("/api-sources", response_model=ApiSourceDetail, status_code=201)
@@ -152,18 +980,21 @@ async def create_api_source(body: ApiSourceCreate):
             body.response_path,
             body.ttl_seconds,
             body.description,
+            body.pagination.model_dump(),
+            body.stale_ttl_seconds,
+            body.prewarm_params,
         )
     except Exception as e:
         if "unique" in str(e).lower() or "duplicate" in str(e).lower():
             raise HTTPException(status_code=409, detail=f"API source '{body.name}' already exists")
         raise
+    app.state.catalog_cache.put_api_source(source)
     return source
 
 
 @app.get("/api-sources/{name}", response_model=ApiSourceDetail)
 async def get_api_source(name: str):
-    pool = _require_catalog(app)
-    source = await catalog.get_api_source(pool, name)
+    source = _require_catalog_cache(app).get_api_source(name)
     if source is None:
         raise HTTPException(status_code=404, detail=f"API source '{name}' not found")
     return source
@@ -175,36 +1006,65 @@ async def delete_api_source(name: str):
     deleted = await catalog.delete_api_source(pool, name)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"API source '{name}' not found")
+    app.state.catalog_cache.drop_api_source(name)
 
 
-@app.post("/api-query", response_model=ApiQueryResponse)
-async def api_query(req: ApiQueryRequest):
-    pool = _require_catalog(app)
-    source = await catalog.get_api_source(pool, req.source)
+@app.post(
+    "/api-query",
+    response_model=ApiQueryResponse,
+    responses={200: {"content": {formats.ARROW_STREAM: {}}}},
+)
+async def api_query(req: ApiQueryRequest, request: Request, accept: str = Header(default="")):
+    with metrics.phase("catalog"):
+        source = _require_catalog_cache(app).get_api_source(req.source)
     if source is None:
         raise HTTPException(status_code=404, detail=f"API source '{req.source}' not found")
 
     try:
-        columns, rows, was_cached = await fetch_api_data(source, req.params, db)
+        table, was_cached, is_stale = await api_client.fetch_api_data(
+            source, req.params, app.state.http_client
+        )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"API fetch failed: {e}")
 
     # Optional SQL filtering on fetched data
     if req.sql:
         try:
-            import json
-            json_str = json.dumps([dict(zip(columns, row)) for row in rows])
-            db.execute(f"CREATE OR REPLACE TEMP TABLE {req.source} AS SELECT * FROM read_json_auto(?)", [json_str])
-            result = db.execute(req.sql)
-            columns = [desc[0] for desc in result.description]
-            rows = [list(r) for r in result.fetchall()]
+            table = await engine.query_pool.run(
+                lambda cursor: _filter_api_table(cursor, req.source, req.sql, table),
+                _query_timeout(None),
+                request.is_disconnected,
+            )
         except duckdb.Error as e:
             raise HTTPException(status_code=400, detail=str(e))
 
+    if formats.accepts(accept, formats.ARROW_STREAM):
+        return _arrow_response(
+            table, headers={"X-Duckstack-Cache": ("stale" if is_stale else "hit") if was_cached else "miss"}
+        )
+    if req.format == "columnar":
+        return _columnar_response(table, cached=was_cached, source_name=req.source, stale=is_stale)
+    metrics.record_rows(table.num_rows)
     return ApiQueryResponse(
-        columns=columns,
-        rows=rows,
-        row_count=len(rows),
+        columns=table.column_names,
+        rows=formats.table_rows(table),
+        row_count=table.num_rows,
         cached=was_cached,
+        stale=is_stale,
         source_name=req.source,
     )
+
+
+def _filter_api_table(
+    cursor: duckdb.DuckDBPyConnection, source_name: str, sql: str, table: pa.Table
+) -> pa.Table:
+    # Expose the Arrow table to DuckDB as a view by reference; nothing is copied
+    cursor.register(source_name, table)
+    try:
+        with slow_queries.watch(cursor, sql):
+            result = _execute(cursor, sql, None)
+            with metrics.phase("fetch"):
+                return formats.arrow_reader(result).read_all()
+    finally:
+        # Pooled cursors are reused, so don't leave the view behind
+        cursor.unregister(source_name)
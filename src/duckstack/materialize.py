@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import duckdb
+
+from duckstack import stats, views
+
+
+def directory(root: str | os.PathLike, name: str) -> Path:
+    """Return the directory holding a materialized dataset's parquet files.
+
+    Raises ValueError for a name that would put it anywhere but directly
+    inside root (an absolute path, "..", a nested path).
+    """
+    root = Path(root).resolve()
+    path = (root / name).resolve()
+    if path.parent != root:
+        raise ValueError(f"Materialized dataset name '{name}' is not a valid directory name")
+    return path
+
+
+def dataset_path(root: str | os.PathLike, name: str) -> str:
+    return str(directory(root, name) / "*.parquet")
+
+
+def describe(cursor: duckdb.DuckDBPyConnection, sql: str) -> list[dict]:
+    result = cursor.execute(f"DESCRIBE SELECT * FROM ({_strip(sql)})")
+    return [{"name": row[0], "dtype": row[1]} for row in result.fetchall()]
+
+
+def run(
+    cursor: duckdb.DuckDBPyConnection,
+    target: Path,
+    sql: str,
+    watermark_column: str | None = None,
+    watermark: str | None = None,
+    columns: list[dict] | None = None,
+) -> tuple[list[dict], dict | None, str | None, bool]:
+    """Write the result of sql to a new parquet file in target.
+
+    When the definition has a watermark column and a watermark from an
+    earlier run, only rows past it are written, to be appended to the
+    dataset's existing files; otherwise the whole result is written, to
+    replace them. An append whose result no longer has the dataset's
+    columns recomputes everything instead, since the files must share one
+    schema.
+
+    Returns the result's columns, the new file's entry with its statistics
+    (None when an append found no new rows), the new watermark, and
+    whether the new file replaces the existing ones.
+    """
+    result_columns = describe(cursor, sql)
+    dtypes = {c["name"]: c["dtype"] for c in result_columns}
+    if watermark_column is not None and watermark_column not in dtypes:
+        raise duckdb.BinderException(f'Watermark column "{watermark_column}" is not in the query result')
+    replace = watermark is None or watermark_column is None or result_columns != columns
+
+    query = f"SELECT * FROM ({_strip(sql)})"
+    if not replace:
+        column = views.quote_identifier(watermark_column)
+        query += f" WHERE {column} > CAST({views.quote_literal(watermark)} AS {dtypes[watermark_column]})"
+
+    target.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path = target / f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet"
+    # Written under a name the dataset's glob doesn't match, then renamed into place
+    tmp = path.with_name(f"{path.name}.tmp")
+    try:
+        cursor.execute(f"COPY ({query}) TO {views.quote_literal(str(tmp))} (FORMAT parquet)")
+        top = f"max({views.quote_identifier(watermark_column)})::VARCHAR" if watermark_column else "NULL"
+        row_count, latest = cursor.execute(
+            f"SELECT count(*), {top} FROM read_parquet({views.quote_literal(str(tmp))})"
+        ).fetchone()
+        if row_count == 0 and not replace:
+            tmp.unlink()
+            return result_columns, None, watermark, False
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    entry = stats.collect(cursor, [str(path)], result_columns)[0]
+    return result_columns, entry, latest if latest is not None else watermark, replace
+
+
+def remove(paths: list[str]) -> None:
+    for path in paths:
+        Path(path).unlink(missing_ok=True)
+
+
+def retire(paths: list[str]) -> None:
+    """Mark files a refresh superseded; sweep() removes them once their grace period is over.
+
+    They aren't removed straight away: other workers' views, and queries,
+    cursors and jobs already running, still read them until they move on.
+    The grace period counts from now, so it is kept in the file's mtime.
+    """
+    for path in paths:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+
+def sweep(root: str | os.PathLike, name: str, files: list[str], grace_seconds: float) -> list[str]:
+    """Remove parquet files of a materialized dataset that it no longer lists and nothing has
+    touched for grace_seconds; return their paths.
+
+    Files written by a refresh that hasn't reached the catalog yet are new,
+    so they are left alone too.
+    """
+    listed = {os.path.realpath(f) for f in files}
+    cutoff = time.time() - grace_seconds
+    removed = []
+    for path in sorted(directory(root, name).glob("*.parquet")):
+        try:
+            if str(path) in listed or os.path.realpath(path) in listed or path.stat().st_mtime > cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        path.unlink(missing_ok=True)
+        removed.append(str(path))
+    return removed
+
+
+def remove_directory(root: str | os.PathLike, name: str) -> None:
+    try:
+        path = directory(root, name)
+    except ValueError:
+        # Never materialized under this name, so there is nothing of ours to remove
+        return
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def is_due(materialization: dict, now: datetime | None = None) -> bool:
+    """Whether a scheduled materialization's refresh interval has passed."""
+    interval = materialization["refresh_interval_seconds"]
+    if not interval:
+        return False
+    if materialization["refreshed_at"] is None:
+        return True
+    now = now or datetime.now(timezone.utc)
+    return (now - materialization["refreshed_at"]).total_seconds() >= interval
+
+
+def _strip(sql: str) -> str:
+    # The query is embedded as a subquery, where a trailing semicolon is a syntax error
+    return sql.strip().rstrip(";").rstrip()
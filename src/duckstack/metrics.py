@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import contextvars
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; from sub-millisecond catalog lookups to multi-minute scans
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTE_BUCKETS = (256, 1024, 16 * 1024, 256 * 1024, 1024**2, 16 * 1024**2, 256 * 1024**2, 1024**3)
+
+Labels = tuple[str, ...]
+# A collector returns (name, type, help, [(labels, value), ...]) for each metric it reports
+Sample = tuple[dict[str, str], float]
+Collector = Callable[[], Iterable[tuple[str, str, str, list[Sample]]]]
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_number(self._value)}"]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Labels = (), buckets: tuple = DURATION_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (count per bucket, sum, count)
+        self._series: dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = _labels(self.labelnames + ("le",), labels + (_number(bound),))
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _labels(self.labelnames + ("le",), labels + ("+Inf",))
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """Metrics kept by the service, plus collectors that report gauges when scraped.
+
+    Counters and histograms are updated on the hot path; anything that can
+    be read off an existing stats() call (cache sizes, pool occupancy) is
+    registered as a collector instead, so it costs nothing between scrapes.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: list[Counter | Gauge | Histogram] = []
+        self._collectors: list[Collector] = []
+
+    def counter(self, name: str, help: str, labelnames: Labels = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        metric = Gauge(name, help)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Labels = (), buckets: tuple = DURATION_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect: Collector) -> None:
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    "duckstack_request_duration_seconds", "Time from request to last response byte", ("endpoint", "status")
+)
+request_phase = registry.histogram(
+    "duckstack_request_phase_seconds", "Time spent in each step of a request", ("endpoint", "phase")
+)
+request_rows = registry.histogram(
+    "duckstack_request_rows", "Rows returned per request", ("endpoint",), buckets=ROW_BUCKETS
+)
+response_bytes = registry.histogram(
+    "duckstack_response_bytes", "Response body bytes sent per request", ("endpoint",), buckets=BYTE_BUCKETS
+)
+requests_in_flight = registry.gauge("duckstack_requests_in_flight", "HTTP requests being handled")
+
+
+class RequestTimings:
+    """Per-phase timings and counts for one request."""
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.rows: int | None = None
+        self.bytes = 0
+        # When the last phase ended; the time after it, until the response starts, is serialization
+        self.mark = self.started
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+            self.mark = time.perf_counter()
+
+    def observe(self, status: int) -> None:
+        request_duration.observe(time.perf_counter() - self.started, self.endpoint, str(status))
+        for phase, seconds in self.phases.items():
+            request_phase.observe(seconds, self.endpoint, phase)
+        if self.rows is not None:
+            request_rows.observe(self.rows, self.endpoint)
+        response_bytes.observe(self.bytes, self.endpoint)
+
+
+_current: contextvars.ContextVar[RequestTimings | None] = contextvars.ContextVar("duckstack_timings", default=None)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time the enclosed block as a phase of the current request, if it is instrumented.
+
+    The timings travel in a context variable, so threadpool work and tasks
+    started by the request record into it too. Phases that run concurrently
+    (pages of one API fetch) are summed, and can add up to more than the
+    request took.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def record_rows(rows: int) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.rows = (timings.rows or 0) + rows
+
+
+class MetricsMiddleware:
+    """Record per-phase timings, rows and bytes for the instrumented endpoints.
+
+    Besides the phases the handlers mark, two are measured here:
+    "serialize" runs from the end of the last marked phase until the
+    response starts, which is where FastAPI encodes JSON bodies, and "send"
+    from then until the last body byte, which covers streamed results.
+    """
+
+    def __init__(self, app: ASGIApp, endpoints: Iterable[str]) -> None:
+        self.app = app
+        self.endpoints = frozenset(endpoints)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requests_in_flight.inc()
+        try:
+            if scope["path"] in self.endpoints:
+                await self._instrumented(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            requests_in_flight.dec()
+
+    async def _instrumented(self, scope: Scope, receive: Receive, send: Send) -> None:
+        timings = RequestTimings(scope["path"])
+        token = _current.set(timings)
+        status = 500
+        response_started = 0.0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, response_started
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_started = time.perf_counter()
+                timings.add("serialize", response_started - timings.mark)
+            elif message["type"] == "http.response.body":
+                timings.bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if response_started:
+                timings.add("send", time.perf_counter() - response_started)
+            timings.observe(status)
+
+
+def stats_collector(prefix: str, help: str, stats: Callable[[], dict], counters: Iterable[str] = ()) -> Collector:
+    """A collector exporting the numeric fields of a stats() dict as <prefix>_<field>.
+
+    Fields named in counters are exported as counters (with a _total
+    suffix), the rest as gauges. Stats with hits and misses also get a
+    <prefix>_hit_ratio gauge.
+    """
+    counters = frozenset(counters)
+
+    def collect():
+        values = stats()
+        if "hits" in values and "misses" in values:
+            lookups = values["hits"] + values["misses"]
+            ratio = values["hits"] / lookups if lookups else 0.0
+            yield f"{prefix}_hit_ratio", "gauge", f"{help}: hits / (hits + misses)", [({}, ratio)]
+        for field, value in values.items():
+            # hit_rate is the ratio above under another name
+            if field == "hit_rate" or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if field in counters:
+                yield f"{prefix}_{field}_total", "counter", f"{help}: {field}", [({}, value)]
+            else:
+                yield f"{prefix}_{field}", "gauge", f"{help}: {field}", [({}, value)]
+
+    return collect
+
+
+def _labels(names: Labels, values: Labels) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
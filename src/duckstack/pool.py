@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from typing import TypeVar
+
+import duckdb
+from starlette.concurrency import run_in_threadpool
+
+from duckstack import metrics
+
+T = TypeVar("T")
+
+# How often a running query checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class PoolSaturated(Exception):
+    """Raised when a query cannot be admitted to the cursor pool."""
+
+
+class QueryTimeout(Exception):
+    """Raised when a query is interrupted for running past its deadline."""
+
+
+class QueryCancelled(Exception):
+    """Raised when a query is interrupted because its client went away."""
+
+
+class Lease:
+    """A checked-out cursor with an optional deadline.
+
+    When the deadline passes the running query is interrupted. interrupt()
+    and release() are safe to call from any thread and become no-ops once
+    the cursor has gone back to the pool, so a late interrupt can never hit
+    another request's query.
+    """
+
+    def __init__(self, pool: CursorPool, cursor: duckdb.DuckDBPyConnection, timeout: float | None) -> None:
+        self.cursor = cursor
+        self.timed_out = False
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._released = False
+        self._timer: threading.Timer | None = None
+        if timeout:
+            self._timer = threading.Timer(timeout, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def interrupt(self) -> None:
+        with self._lock:
+            if not self._released:
+                self.cursor.interrupt()
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self._pool.release(self.cursor)
+
+    def _expire(self) -> None:
+        with self._lock:
+            if not self._released:
+                self.timed_out = True
+                self.cursor.interrupt()
+
+
+class CursorPool:
+    """A bounded set of DuckDB cursors sharing one database instance.
+
+    Each checkout gets its own cursor (a separate connection to the same
+    database), so concurrent requests never share result state. At most
+    ``max_concurrency`` cursors are checked out at once; up to ``max_queue``
+    further callers wait for one to be released, and anything beyond that
+    is rejected immediately.
+    """
+
+    def __init__(
+        self,
+        db: duckdb.DuckDBPyConnection,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+    ) -> None:
+        self._db = db
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._idle: list[duckdb.DuckDBPyConnection] = []
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._rejected = 0
+        self._cond = threading.Condition()
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def acquire(self) -> duckdb.DuckDBPyConnection:
+        with self._cond:
+            if not self._available():
+                if self._waiting >= self.max_queue:
+                    self._rejected += 1
+                    raise PoolSaturated("Query queue is full")
+                self._waiting += 1
+                try:
+                    admitted = self._cond.wait_for(self._available, self.queue_timeout)
+                finally:
+                    self._waiting -= 1
+                if not admitted:
+                    self._rejected += 1
+                    raise PoolSaturated("Timed out waiting for a query slot")
+
+            self._in_use += 1
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        try:
+            return self._db.cursor()
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, cursor: duckdb.DuckDBPyConnection) -> None:
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(cursor)
+            self._cond.notify()
+
+    @contextmanager
+    def cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        cursor = self.acquire()
+        try:
+            yield cursor
+        finally:
+            self.release(cursor)
+
+    def lease(self, timeout: float | None = None) -> Lease:
+        """Check out a cursor whose query is interrupted after timeout seconds."""
+        return Lease(self, self.acquire(), timeout)
+
+    async def run(
+        self,
+        work: Callable[[duckdb.DuckDBPyConnection], T],
+        timeout: float | None = None,
+        is_disconnected: Callable[[], Awaitable[bool]] | None = None,
+    ) -> T:
+        """Run work(cursor) on the threadpool under a deadline.
+
+        If is_disconnected is given it is polled while the query runs, and
+        the query is interrupted as soon as the client has gone away.
+        """
+        with metrics.phase("queue"):
+            acquiring = asyncio.ensure_future(run_in_threadpool(self.lease, timeout))
+            try:
+                await asyncio.wait({acquiring})
+            except asyncio.CancelledError:
+                # The waiting thread may still be handed a cursor; give it back rather than leak it
+                await asyncio.wait({acquiring})
+                if not acquiring.cancelled() and acquiring.exception() is None:
+                    acquiring.result().release()
+                raise
+            lease = acquiring.result()
+        try:
+            task = asyncio.ensure_future(run_in_threadpool(work, lease.cursor))
+            disconnected = False
+            try:
+                while is_disconnected is not None:
+                    done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+                    if done:
+                        break
+                    if await is_disconnected():
+                        disconnected = True
+                        lease.interrupt()
+                        break
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                # Never hand the cursor back while the query is still running on it
+                lease.interrupt()
+                await asyncio.wait({task})
+                raise
+
+            try:
+                return task.result()
+            except duckdb.InterruptException:
+                if lease.timed_out:
+                    raise QueryTimeout(f"Query exceeded timeout of {timeout * 1000:.0f} ms")
+                if disconnected:
+                    raise QueryCancelled("Client disconnected")
+                raise
+        finally:
+            lease.release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "max_queue": self.max_queue,
+                "cursors": self._created,
+                "rejected": self._rejected,
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            for cursor in self._idle:
+                cursor.close()
+            self._idle.clear()
+
+    def _available(self) -> bool:
+        return self._in_use < self.max_concurrency
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import decimal
+import json
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import duckdb
+
+from duckstack import metrics, query_cache, stats, views
+
+logger = logging.getLogger(__name__)
+
+# AST comparison type -> operator, and the operator to use when the column is on the right
+_COMPARISONS = {
+    "COMPARE_EQUAL": ("=", "="),
+    "COMPARE_LESSTHAN": ("<", ">"),
+    "COMPARE_LESSTHANOREQUALTO": ("<=", ">="),
+    "COMPARE_GREATERTHAN": (">", "<"),
+    "COMPARE_GREATERTHANOREQUALTO": (">=", "<="),
+}
+
+# Casts of a text constant whose result stats.coerce derives from the same text
+_TEXT_CASTS = ("DATE", "TIMESTAMP", "VARCHAR")
+
+# How a query parameter's JSON value is typed when it stands in for a constant
+_PARAM_TYPES = {bool: "BOOLEAN", int: "BIGINT", float: "DOUBLE", str: "VARCHAR"}
+
+
+def shadow(cursor: duckdb.DuckDBPyConnection, sql: str, params: list | dict | None = None) -> list[str]:
+    """Shadow dataset views with temp views over only the files sql can match.
+
+    For every registered dataset the query reads with usable predicates,
+    files whose recorded min/max/null statistics rule out all rows are left
+    out, so DuckDB never opens them. The temp views live on this cursor
+    only and take precedence over the shared views; pass the returned
+    names to drop() once the query's results have been consumed. Parameters
+    in sql are compared by the values in params.
+    """
+    candidates = {
+        name
+        for name in query_cache.referenced_identifiers(sql)
+        if (d := views.get(name)) is not None and len(d["files"]) > 1
+    }
+    if not candidates:
+        return []
+    try:
+        tree = json.loads(cursor.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+    except duckdb.Error:
+        return []
+    if tree.get("error"):
+        # Anything but a single SELECT; let DuckDB read every file
+        return []
+    if params:
+        tree = _bind(tree, params)
+
+    created = []
+    for name, conjunct_sets in _scans(tree, candidates).items():
+        dataset = views.get(name)
+        files = select_files(dataset, conjunct_sets)
+        if len(files) == len(dataset["files"]):
+            continue
+        if files:
+            body = f"SELECT * FROM {views.reader_sql(dataset, files)}"
+        else:
+            body = f"SELECT * FROM {views.reader_sql(dataset, [dataset['files'][0]['path']])} LIMIT 0"
+        cursor.execute(f"CREATE OR REPLACE TEMP VIEW {views.quote_identifier(dataset['name'])} AS {body}")
+        created.append(dataset["name"])
+        logger.debug("Pruned dataset %s to %d of %d files", name, len(files), len(dataset["files"]))
+    return created
+
+
+def drop(cursor: duckdb.DuckDBPyConnection, names: list[str]) -> None:
+    for name in names:
+        statement = f"DROP VIEW IF EXISTS temp.{views.quote_identifier(name)}"
+        try:
+            cursor.execute(statement)
+        except duckdb.InterruptException:
+            # A deadline can fire just as the query finishes; an interrupt only
+            # stops the statement it lands on, and a shadow must never outlive its query
+            cursor.execute(statement)
+
+
+@contextmanager
+def pruned(cursor: duckdb.DuckDBPyConnection, sql: str, params: list | dict | None = None) -> Iterator[None]:
+    with metrics.phase("prune"):
+        names = shadow(cursor, sql, params)
+    try:
+        yield
+    finally:
+        drop(cursor, names)
+
+
+def select_files(dataset: dict, conjunct_sets: list[list[tuple]]) -> list[str]:
+    """Return the files that may hold rows matching any of the conjunct sets."""
+    columns = {c["name"].lower(): c for c in dataset.get("columns", [])}
+    return [
+        f["path"]
+        for f in dataset["files"]
+        if any(all(_may_match(f, columns, c) for c in conjuncts) for conjuncts in conjunct_sets)
+    ]
+
+
+def _scans(tree: Any, candidates: set[str]) -> dict[str, list[list[tuple]]]:
+    """Map each candidate dataset to the predicates of every scan of it.
+
+    A dataset is only returned if each of its scans is the sole FROM item of
+    a SELECT with at least one usable predicate; a scan in a join or one
+    without a WHERE clause could need any file.
+    """
+    scans: dict[str, list[list[tuple]]] = {}
+    references: dict[str, int] = {}
+    for node in _walk(tree):
+        if node.get("type") == "BASE_TABLE":
+            name = _dataset_name(node, candidates)
+            if name is not None:
+                references[name] = references.get(name, 0) + 1
+        elif node.get("type") == "SELECT_NODE":
+            from_table = node.get("from_table") or {}
+            name = _dataset_name(from_table, candidates) if from_table.get("type") == "BASE_TABLE" else None
+            if name is None:
+                continue
+            qualifiers = {name, from_table.get("alias", "").lower()} - {""}
+            terms = _and_terms(node.get("where_clause"))
+            conjuncts = [c for c in (_conjunct(t, qualifiers) for t in terms) if c is not None]
+            scans.setdefault(name, []).append(conjuncts)
+    return {
+        name: sets
+        for name, sets in scans.items()
+        if len(sets) == references.get(name) and all(sets)
+    }
+
+
+def _walk(tree: Any):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            yield node
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+def _dataset_name(table: dict, candidates: set[str]) -> str | None:
+    if table.get("catalog_name") or table.get("schema_name", "").lower() not in ("", "main"):
+        return None
+    name = table.get("table_name", "").lower()
+    return name if name in candidates else None
+
+
+def _and_terms(expr: dict | None) -> list[dict]:
+    if expr is None:
+        return []
+    if expr.get("type") == "CONJUNCTION_AND":
+        return [term for child in expr["children"] for term in _and_terms(child)]
+    return [expr]
+
+
+def _conjunct(expr: dict, qualifiers: set[str]) -> tuple | None:
+    """Turn a simple predicate into (column, op, values), or None if it isn't one."""
+    kind = expr.get("type")
+    if kind in _COMPARISONS:
+        left, right = expr["left"], expr["right"]
+        if _column(left, qualifiers) is not None and _literal(right) is not None:
+            return _column(left, qualifiers), _COMPARISONS[kind][0], [_literal(right)]
+        if _column(right, qualifiers) is not None and _literal(left) is not None:
+            return _column(right, qualifiers), _COMPARISONS[kind][1], [_literal(left)]
+    elif kind == "COMPARE_BETWEEN":
+        column, lower, upper = _column(expr["input"], qualifiers), _literal(expr["lower"]), _literal(expr["upper"])
+        if column is not None and lower is not None and upper is not None:
+            return column, "between", [lower, upper]
+    elif kind == "COMPARE_IN":
+        column = _column(expr["children"][0], qualifiers)
+        values = [_literal(c) for c in expr["children"][1:]]
+        if column is not None and values and all(v is not None for v in values):
+            return column, "in", values
+    return None
+
+
+def _column(expr: dict, qualifiers: set[str]) -> str | None:
+    if expr.get("class") != "COLUMN_REF":
+        return None
+    names = [n.lower() for n in expr["column_names"]]
+    # t.col must name the scanned table; anything else may be an outer query's column
+    if len(names) == 2 and names[0] not in qualifiers or len(names) > 2:
+        return None
+    return names[-1]
+
+
+def _bind(tree: Any, params: list | dict) -> Any:
+    """Replace the parameters in a parsed query with constants holding their values."""
+    # Positional parameters ($1, or ? in order) are identified by their 1-based position
+    values = params if isinstance(params, dict) else {str(i): v for i, v in enumerate(params, 1)}
+    if isinstance(tree, list):
+        return [_bind(item, values) for item in tree]
+    if not isinstance(tree, dict):
+        return tree
+    if tree.get("class") == "PARAMETER" and tree.get("identifier") in values:
+        value = values[tree["identifier"]]
+        return {
+            "class": "CONSTANT",
+            "value": {"type": {"id": _PARAM_TYPES.get(type(value), "VARCHAR")}, "is_null": value is None, "value": value},
+        }
+    return {key: _bind(item, values) for key, item in tree.items()}
+
+
+def _literal(expr: dict) -> Any:
+    # DATE '2024-01-01' and friends are casts of a text constant, which stats.coerce parses.
+    # Other casts (e.g. 5.7 to INTEGER) change the value, so they aren't unwrapped.
+    if expr.get("class") == "CAST":
+        child = expr["child"]
+        if (
+            expr.get("try_cast")
+            or expr["cast_type"]["id"] not in _TEXT_CASTS
+            or child.get("class") != "CONSTANT"
+            or child["value"]["type"]["id"] != "VARCHAR"
+        ):
+            return None
+        expr = child
+    if expr.get("class") != "CONSTANT" or expr["value"].get("is_null"):
+        return None
+    value, type_info = expr["value"]["value"], expr["value"]["type"]
+    if type_info["id"] == "DECIMAL":
+        # Decimal constants are serialized as unscaled integers
+        return decimal.Decimal(value).scaleb(-type_info["type_info"]["scale"])
+    return value
+
+
+def _may_match(file: dict, columns: dict[str, dict], conjunct: tuple) -> bool:
+    column, op, values = conjunct
+    if column not in columns:
+        return True
+    column_stats = (file.get("column_stats") or {}).get(columns[column]["name"])
+    if column_stats is None:
+        return True
+    # A comparison with NULL is never true, so an all-null column matches nothing
+    if column_stats["null_count"] is not None and column_stats["null_count"] == file.get("row_count"):
+        return False
+    dtype = columns[column]["dtype"]
+    lo, hi = stats.coerce(dtype, column_stats["min"]), stats.coerce(dtype, column_stats["max"])
+    bounds = [stats.coerce(dtype, v) for v in values]
+    if lo is None or hi is None or any(b is None for b in bounds):
+        return True
+    try:
+        if op == "=":
+            return lo <= bounds[0] <= hi
+        if op == "<":
+            return lo < bounds[0]
+        if op == "<=":
+            return lo <= bounds[0]
+        if op == ">":
+            return hi > bounds[0]
+        if op == ">=":
+            return hi >= bounds[0]
+        if op == "between":
+            return hi >= bounds[0] and lo <= bounds[1]
+        if op == "in":
+            return any(lo <= b <= hi for b in bounds)
+    except TypeError:
+        pass
+    return True
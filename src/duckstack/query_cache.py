@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import hashlib
+import re
+
+import duckdb
+
+from duckstack import statements, views
+
+# Single-quoted literals ('' is an escaped quote), double-quoted identifiers, or whitespace
+_TOKEN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+")
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_$]*")
+
+_FILE_EXTENSIONS = (".parquet", ".csv", ".tsv", ".json", ".jsonl", ".ndjson", ".gz", ".zst")
+_SCHEMES = ("s3://", "s3a://", "gs://", "gcs://", "r2://", "az://", "abfss://", "http://", "https://")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and trailing semicolons, leaving quoted text untouched."""
+
+    def replace(match: re.Match) -> str:
+        token = match.group(0)
+        return token if token[0] in "'\"" else " "
+
+    return _TOKEN.sub(replace, sql).strip().rstrip(";").rstrip()
+
+
+def referenced_paths(sql: str) -> list[str]:
+    """Return the string literals in sql that look like file paths or globs."""
+    paths = []
+    for match in _TOKEN.finditer(sql):
+        token = match.group(0)
+        if not token.startswith("'"):
+            continue
+        literal = token[1:-1].replace("''", "'")
+        if _is_path(literal):
+            paths.append(literal)
+    return sorted(set(paths))
+
+
+def _is_path(text: str) -> bool:
+    lowered = text.lower()
+    return lowered.startswith(_SCHEMES) or "*" in text or lowered.endswith(_FILE_EXTENSIONS)
+
+
+def referenced_identifiers(sql: str) -> set[str]:
+    """Return every bare word and double-quoted identifier in sql, lower-cased.
+
+    This over-approximates the relations a query reads (keywords and column
+    names are included too), which is fine for matching dataset names.
+    """
+    names: set[str] = set()
+    last = 0
+    for match in _TOKEN.finditer(sql):
+        names.update(w.lower() for w in _WORD.findall(sql, last, match.start()))
+        token = match.group(0)
+        if token.startswith('"'):
+            names.add(token[1:-1].replace('""', '"').lower())
+        last = match.end()
+    names.update(w.lower() for w in _WORD.findall(sql, last))
+    return names
+
+
+def fingerprint(cursor: duckdb.DuckDBPyConnection, paths: list[str]) -> list[tuple]:
+    """Return (filename, size, last_modified) for every file matched by paths.
+
+    read_blob only stats the files (a HEAD/LIST for object stores) because
+    the content column is never projected. Paths that match nothing
+    contribute nothing, so a file appearing later still changes the
+    fingerprint.
+    """
+    if not paths:
+        return []
+    result = cursor.execute(
+        "SELECT filename, size, epoch_ms(last_modified) FROM read_blob(?) ORDER BY filename",
+        [paths],
+    )
+    return result.fetchall()
+
+
+def cache_key(cursor: duckdb.DuckDBPyConnection, sql: str, params: list | dict | None = None) -> str:
+    """Key a query result on its normalized SQL, parameters and the state of the files it reads.
+
+    Files are those named by path literals or parameter values (as in
+    read_parquet($1)), plus those behind any registered dataset the query
+    refers to by name.
+    """
+    normalized = normalize_sql(sql)
+    paths = referenced_paths(normalized) + views.files_for(referenced_identifiers(normalized))
+    paths += [value for value in statements.text_values(params) if _is_path(value)]
+    files = fingerprint(cursor, sorted(set(paths)))
+    digest = hashlib.sha256(repr((normalized, params, files)).encode()).hexdigest()
+    return f"query:{digest}"
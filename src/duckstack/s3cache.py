@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+# Needs the s3cache extra (pip install -e ".[s3cache]"), which brings in fsspec and s3fs
+import duckdb
+import fsspec
+from fsspec.spec import AbstractBufferedFile
+
+from duckstack.blockcache import BlockCache
+
+
+class CachingFileSystem(fsspec.AbstractFileSystem):
+    """An fsspec filesystem that reads objects through a BlockCache.
+
+    Reads are split into block_size-aligned blocks; cached blocks come from
+    local disk and runs of missing blocks are fetched from the wrapped
+    filesystem with one ranged GET each, then cached. Listings, metadata
+    and writes go straight to the wrapped filesystem. Registered with
+    DuckDB, it takes over every s3:// path in place of httpfs.
+    """
+
+    protocol = "s3"
+    # The wrapped filesystem and cache aren't hashable config; never share instances
+    cachable = False
+
+    def __init__(self, fs: fsspec.AbstractFileSystem, cache: BlockCache, block_size: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.fs = fs
+        self.cache = cache
+        self.cache_block_size = block_size
+
+    def _open(self, path, mode="rb", block_size=None, autocommit=True, cache_options=None, **kwargs):
+        if mode != "rb":
+            return self.fs.open(path, mode, block_size=block_size, autocommit=autocommit, **kwargs)
+        info = self.fs.info(path)
+        return CachedFile(self, path, info)
+
+    # DuckDB hands over full s3:// URLs; the wrapped filesystem gets them without the protocol
+
+    def info(self, path, **kwargs):
+        return self.fs.info(self._strip_protocol(path), **kwargs)
+
+    def ls(self, path, detail=True, **kwargs):
+        return self.fs.ls(self._strip_protocol(path), detail=detail, **kwargs)
+
+    def glob(self, path, **kwargs):
+        return self.fs.glob(self._strip_protocol(path), **kwargs)
+
+    def find(self, path, maxdepth=None, withdirs=False, detail=False, **kwargs):
+        return self.fs.find(self._strip_protocol(path), maxdepth=maxdepth, withdirs=withdirs, detail=detail, **kwargs)
+
+    def modified(self, path):
+        return self.fs.modified(self._strip_protocol(path))
+
+    def rm_file(self, path):
+        return self.fs.rm_file(self._strip_protocol(path))
+
+    def read_range(self, path: str, etag: str, size: int, start: int, end: int) -> bytes:
+        """Return bytes [start, end) of an object, going to the store only for uncached blocks."""
+        end = min(end, size)
+        if start >= end:
+            return b""
+        bs = self.cache_block_size
+        first, last = start // bs, (end - 1) // bs
+        blocks: dict[int, bytes] = {}
+        missing: list[int] = []
+        for index in range(first, last + 1):
+            data = self.cache.get(self._key(path, etag, size, index))
+            if data is None:
+                missing.append(index)
+            else:
+                blocks[index] = data
+
+        for run in _runs(missing):
+            run_start = run[0] * bs
+            data = self.fs.cat_file(path, start=run_start, end=min((run[-1] + 1) * bs, size))
+            for index in run:
+                block = data[(index - run[0]) * bs : (index - run[0] + 1) * bs]
+                blocks[index] = block
+                self.cache.put(self._key(path, etag, size, index), block)
+
+        joined = b"".join(blocks[i] for i in range(first, last + 1))
+        offset = start - first * bs
+        return joined[offset : offset + (end - start)]
+
+    def _key(self, path: str, etag: str, size: int, index: int) -> str:
+        start = index * self.cache_block_size
+        return BlockCache.block_key(path, etag, start, min(start + self.cache_block_size, size))
+
+
+class CachedFile(AbstractBufferedFile):
+    def __init__(self, fs: CachingFileSystem, path: str, info: dict) -> None:
+        # Every read goes to _fetch_range, which is where the caching happens
+        super().__init__(fs, path, mode="rb", cache_type="none", size=info["size"])
+        # Stores without ETags (e.g. local test doubles) fall back to size and mtime
+        self.etag = info.get("ETag") or f"{info['size']}-{info.get('LastModified') or info.get('mtime') or info.get('created')}"
+
+    def _fetch_range(self, start: int, end: int) -> bytes:
+        return self.fs.read_range(self.path, self.etag, self.size, start, end)
+
+
+def _runs(indexes: list[int]) -> list[list[int]]:
+    """Group sorted block indexes into runs of consecutive ones."""
+    runs: list[list[int]] = []
+    for index in indexes:
+        if runs and runs[-1][-1] == index - 1:
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+    return runs
+
+
+def install(db: duckdb.DuckDBPyConnection, cache: BlockCache, block_size: int, **s3_options) -> CachingFileSystem:
+    """Register a caching s3:// filesystem with a DuckDB connection."""
+    import s3fs
+
+    fs = CachingFileSystem(s3fs.S3FileSystem(**s3_options), cache, block_size)
+    db.register_filesystem(fs)
+    return fs
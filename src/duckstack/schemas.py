@@ -1,22 +1,121 @@
 from datetime import datetime
+from typing import Literal, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+
+ParamValue = Optional[Union[bool, int, float, str]]
 
 
 class QueryRequest(BaseModel):
     sql: str
+    # Values for $1/? placeholders (a list) or $name placeholders (an object)
+    params: Optional[Union[list[ParamValue], dict[str, ParamValue]]] = None
+    stream: bool = False
+    timeout_ms: Optional[int] = Field(default=None, ge=0)
+    cache: bool = False
+    # Keep the result open on the server and return its first page_size rows with a cursor token
+    cursor: bool = False
+    page_size: Optional[int] = Field(default=None, gt=0, le=100_000)
+    # "columnar" returns one array per column under "data" instead of "rows"
+    format: Literal["rows", "columnar"] = "rows"
 
 
 class QueryResponse(BaseModel):
     columns: list[str]
     rows: list[list]
     row_count: int
+    cached: bool = False
+    # Token for GET /query/cursors/{cursor}; None once the result is exhausted
+    cursor: Optional[str] = None
+
+
+class JobCreate(BaseModel):
+    sql: str
+
+
+class JobStatus(BaseModel):
+    id: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    sql: str
+    submitted_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    elapsed_seconds: Optional[float] = None
+    # Percent complete as estimated by DuckDB, when it can tell
+    progress: Optional[float] = None
+    row_count: int = 0
+    error: Optional[str] = None
+    expires_at: Optional[datetime] = None
+
+
+class JobResults(QueryResponse):
+    page: int
+    page_size: int
+    total_rows: int
+    next_page: Optional[int] = None
 
 
 class DatasetCreate(BaseModel):
     name: str
     path: str
     description: str = ""
+    # Hive-style partition columns, outermost first; path is then the root directory
+    partition_columns: list[str] = []
+
+
+class DatasetBulkCreate(BaseModel):
+    # A directory or S3 prefix; each file right under it, and each subdirectory, becomes a dataset
+    prefix: Optional[str] = Field(default=None, min_length=1)
+    # Datasets to register as they are, alongside or instead of those found under prefix
+    datasets: list[DatasetCreate] = []
+    description: str = ""
+
+
+class DatasetBulkResult(BaseModel):
+    name: str
+    path: str
+    status: Literal["created", "exists", "failed"]
+    error: Optional[str] = None
+    file_count: int = 0
+    row_count: Optional[int] = None
+
+
+class DatasetBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[DatasetBulkResult]
+
+
+class DatasetRefresh(BaseModel):
+    # Only re-list these partitions, e.g. [{"date": "2024-06-01"}]; all of them when empty
+    partitions: list[dict[str, str]] = []
+    # Re-read the statistics of files already in the index too
+    full: bool = False
+
+
+class MaterializedCreate(BaseModel):
+    # Also the name of the directory holding its files, so an identifier only
+    name: str = Field(pattern=r"^[A-Za-z_][A-Za-z0-9_]*$")
+    sql: str
+    description: str = ""
+    # Refresh automatically this often; 0 = only on request
+    refresh_interval_seconds: int = Field(default=0, ge=0)
+    # A column whose values only grow (e.g. an event timestamp); refreshes then append newer rows only
+    watermark_column: Optional[str] = None
+
+
+class MaterializedRefresh(BaseModel):
+    # Recompute the whole result instead of appending rows past the watermark
+    full: bool = False
+
+
+class MaterializationInfo(BaseModel):
+    sql: str
+    refresh_interval_seconds: int
+    watermark_column: Optional[str] = None
+    watermark: Optional[str] = None
+    refreshed_at: Optional[datetime] = None
 
 
 class ColumnInfo(BaseModel):
@@ -39,11 +138,34 @@ class DatasetDetail(BaseModel):
     description: str
     created_at: datetime
     columns: list[ColumnInfo]
+    partition_columns: list[str] = []
+    file_count: int = 0
+    row_count: Optional[int] = None
+    materialization: Optional[MaterializationInfo] = None
+
+
+class PartitionInfo(BaseModel):
+    values: dict[str, Optional[str]]
+    file_count: int
+    row_count: Optional[int] = None
 
 
 # --- API Sources ---
 
 
+class PaginationConfig(BaseModel):
+    type: Literal["none", "offset", "page", "cursor", "link"] = "none"
+    page_size: int = Field(default=100, gt=0)
+    limit_param: str = "limit"
+    offset_param: str = "offset"
+    page_param: str = "page"
+    first_page: int = 1
+    cursor_param: str = "cursor"
+    next_cursor_path: str = "next"
+    max_pages: int = Field(default=100, gt=0)
+    concurrency: int = Field(default=4, gt=0)
+
+
 class ApiSourceCreate(BaseModel):
     name: str
     endpoint_url: str
@@ -55,6 +177,9 @@ class ApiSourceCreate(BaseModel):
     response_path: str = "results"
     ttl_seconds: int = 300
     description: str = ""
+    pagination: PaginationConfig = PaginationConfig()
+    stale_ttl_seconds: int = Field(default=0, ge=0)
+    prewarm_params: list[dict[str, str]] = []
 
 
 class ApiSourceSummary(BaseModel):
@@ -72,14 +197,18 @@ class ApiSourceDetail(ApiSourceSummary):
     auth_env_var: str
     api_key_param: str
     response_path: str
+    pagination: PaginationConfig
+    stale_ttl_seconds: int
+    prewarm_params: list[dict[str, str]]
 
 
 class ApiQueryRequest(BaseModel):
     source: str
     params: dict[str, str] = {}
     sql: str = ""
+    format: Literal["rows", "columnar"] = "rows"
 
 
 class ApiQueryResponse(QueryResponse):
-    cached: bool = False
     source_name: str = ""
+    stale: bool = False
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+_TMP_SUFFIX = ".tmp"
+# A temporary file this old belongs to a writer that died mid-write
+_TMP_MAX_AGE_SECONDS = 600.0
+# Schema metadata holding an entry's wall-clock expiry times
+_FRESH_UNTIL = b"duckstack.fresh_until"
+_EXPIRES_AT = b"duckstack.expires_at"
+
+
+class SharedCache:
+    """Arrow tables cached as Arrow IPC files, shared by every worker process on a host.
+
+    Each entry is one file, named by a hash of its key, with its expiry
+    times in the schema metadata. Entries are written to a temporary file
+    and renamed into place, so readers in other processes see either the
+    old table or the new one, never a torn file. Reads memory-map the file,
+    so on a tmpfs such as /dev/shm every worker reads the same pages rather
+    than a copy of its own; a file unlinked while mapped stays readable.
+
+    There is no shared index: sweep() scans the directory, drops expired
+    entries and evicts the least recently read (by mtime, which reads
+    touch) until the files fit in max_bytes. Each process also sweeps once
+    it has written a quarter of max_bytes since its last sweep, so the
+    directory can't grow far past its budget between periodic sweeps.
+    """
+
+    def __init__(self, directory: str | os.PathLike, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._written = 0
+        # As of the last sweep; other processes change the directory in between
+        self._entries = 0
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: str, touch: bool = True) -> tuple[pa.Table, float, float] | None:
+        """Return (table, seconds of freshness left, seconds until it expires), or None.
+
+        Freshness left is <= 0 for an entry in its stale window. With
+        touch=False the read doesn't count towards the statistics or the
+        LRU order.
+        """
+        path = self._file(key)
+        try:
+            with pa.memory_map(str(path)) as source:
+                table = pa.ipc.open_file(source).read_all()
+        except FileNotFoundError:
+            table = None
+        except (pa.ArrowInvalid, OSError):
+            logger.warning("Dropping unreadable shared cache file %s", path)
+            path.unlink(missing_ok=True)
+            table = None
+        now = time.time()
+        if table is not None:
+            metadata = dict(table.schema.metadata or {})
+            fresh_until = float(metadata.pop(_FRESH_UNTIL, 0))
+            expires_at = float(metadata.pop(_EXPIRES_AT, 0))
+            if now >= expires_at:
+                # Left for sweep(): another worker may be republishing it right now
+                table = None
+        if table is None:
+            if touch:
+                with self._lock:
+                    self._misses += 1
+            return None
+        if touch:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass  # evicted since; the mapping we read stays valid
+            with self._lock:
+                self._hits += 1
+        return table.replace_schema_metadata(metadata or None), fresh_until - now, expires_at - now
+
+    def freshness(self, key: str) -> float | None:
+        """Return an entry's seconds of freshness left (<= 0 when stale), reading only its schema.
+
+        None when there is no entry or it has expired. Doesn't count towards
+        the statistics or the LRU order.
+        """
+        fresh_until, expires_at = _expiry(self._file(key))
+        now = time.time()
+        return fresh_until - now if now < expires_at else None
+
+    def put(self, key: str, table: pa.Table, ttl_seconds: float, stale_seconds: float = 0) -> None:
+        """Publish table under key; failures (e.g. a full tmpfs) are logged, not raised."""
+        if table.nbytes > self.max_bytes:
+            return
+        fresh_until = time.time() + ttl_seconds
+        metadata = {
+            **(table.schema.metadata or {}),
+            _FRESH_UNTIL: repr(fresh_until).encode(),
+            _EXPIRES_AT: repr(fresh_until + stale_seconds).encode(),
+        }
+        schema = table.schema.with_metadata(metadata)
+        target = self._file(key)
+        tmp = target.with_name(f"{target.name}.{uuid.uuid4().hex}{_TMP_SUFFIX}")
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+                writer.write_table(table.replace_schema_metadata(metadata))
+            size = tmp.stat().st_size
+            os.replace(tmp, target)
+        except OSError:
+            logger.warning("Writing shared cache file %s failed", target, exc_info=True)
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._writes += 1
+            self._written += size
+            due = self._written >= self.max_bytes // 4
+        if due:
+            self.sweep()
+
+    def invalidate(self, key: str) -> None:
+        self._file(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*/*"):
+            path.unlink(missing_ok=True)
+
+    def sweep(self) -> int:
+        """Drop expired entries and evict down to max_bytes; return how many files were removed."""
+        now = time.time()
+        found = []
+        expired = 0
+        for path in self.directory.glob("*/*"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            if path.name.endswith(_TMP_SUFFIX):
+                if now - st.st_mtime > _TMP_MAX_AGE_SECONDS:
+                    path.unlink(missing_ok=True)
+                continue
+            if now >= _expiry(path)[1]:
+                path.unlink(missing_ok=True)
+                expired += 1
+                continue
+            found.append((st.st_mtime, st.st_size, path))
+        found.sort()
+        total = sum(size for _, size, _ in found)
+        evicted = 0
+        for _, size, path in found:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._written = 0
+            self._entries = len(found) - evicted
+            self._bytes = total
+            self._expirations += expired
+            self._evictions += evicted
+        return expired + evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": self._entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "writes": self._writes,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+    def _file(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        # Fan out over subdirectories so no single directory gets huge
+        return self.directory / digest[:2] / f"{digest}.arrow"
+
+
+def _expiry(path: Path) -> tuple[float, float]:
+    """An entry's (fresh_until, expires_at), read from its schema without reading its data.
+
+    Both are 0 (long expired) for a missing or unreadable file.
+    """
+    try:
+        with pa.memory_map(str(path)) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+        return float(metadata.get(_FRESH_UNTIL, 0)), float(metadata.get(_EXPIRES_AT, 0))
+    except (pa.ArrowInvalid, OSError, ValueError):
+        return 0.0, 0.0
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import weakref
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+
+class SlowQueryLog:
+    """Log queries that take longer than threshold_ms, with DuckDB's operator timings.
+
+    With profile set, DuckDB's profiler is switched on (without printing
+    anything) for each cursor the first time it runs a watched query, so the
+    plan of a slow query, with the time and rows of every operator, can be
+    logged after the fact. A threshold of 0 turns the log off.
+    """
+
+    def __init__(self, threshold_ms: float, profile: bool = True) -> None:
+        self.threshold_ms = threshold_ms
+        self.profile = profile
+        self._profiled: weakref.WeakSet[duckdb.DuckDBPyConnection] = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._count = 0
+
+    @contextmanager
+    def watch(self, cursor: duckdb.DuckDBPyConnection, sql: str) -> Iterator[None]:
+        """Log sql if the block, which runs it on cursor and reads its result, is slow."""
+        if not self.threshold_ms:
+            yield
+            return
+        if self.profile and cursor not in self._profiled:
+            cursor.execute("SET enable_profiling = 'no_output'")
+            self._profiled.add(cursor)
+        started = time.perf_counter()
+        yield
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms < self.threshold_ms:
+            return
+        with self._lock:
+            self._count += 1
+        plan = ""
+        if self.profile:
+            try:
+                plan = "\n" + format_profile(json.loads(cursor.get_profiling_information()))
+            except (duckdb.Error, ValueError):
+                pass
+        logger.warning("Slow query (%.0f ms): %s%s", elapsed_ms, " ".join(sql.split()), plan)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"slow_queries": self._count}
+
+
+def format_profile(profile: dict) -> str:
+    """Render DuckDB's JSON profile as an indented operator tree."""
+    lines = [
+        f"total {profile.get('latency', 0) * 1000:.1f} ms, "
+        f"cpu {profile.get('cpu_time', 0) * 1000:.1f} ms, "
+        f"{profile.get('cumulative_rows_scanned', 0)} rows scanned"
+    ]
+
+    def walk(node: dict, depth: int) -> None:
+        for child in node.get("children", []):
+            name = child.get("operator_name") or child.get("operator_type", "?")
+            lines.append(
+                f"{'  ' * depth}{name.strip()}: {child.get('operator_timing', 0) * 1000:.1f} ms, "
+                f"{child.get('operator_cardinality', 0)} rows"
+            )
+            walk(child, depth + 1)
+
+    walk(profile, 1)
+    return "\n".join(lines)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import itertools
+import math
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Union
+
+import duckdb
+
+from duckstack import views
+
+Params = Union[list, dict]
+
+_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\Z")
+
+
+class StatementCache:
+    """An LRU of prepared statements on each cursor, keyed by SQL text.
+
+    DuckDB prepared statements belong to the connection that prepared them,
+    so each pooled cursor keeps its own LRU of up to max_per_cursor
+    statements. Running a query template that is already prepared on the
+    cursor skips parsing, binding and planning; only the parameter values
+    change. Hit and miss counts cover all cursors.
+    """
+
+    def __init__(self, max_per_cursor: int) -> None:
+        self.max_per_cursor = max_per_cursor
+        # cursor -> SQL text -> name of its prepared statement, least recently used first
+        self._statements: weakref.WeakKeyDictionary[duckdb.DuckDBPyConnection, OrderedDict[str, str]] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._names = itertools.count()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def execute(self, cursor: duckdb.DuckDBPyConnection, sql: str, params: Params) -> duckdb.DuckDBPyConnection:
+        """Run sql with params on cursor, through a prepared statement if possible."""
+        arguments = render_arguments(params)
+        with self._lock:
+            prepared = self._statements.setdefault(cursor, OrderedDict())
+            name = prepared.get(sql)
+            if name is not None:
+                prepared.move_to_end(sql)
+                self._hits += 1
+            else:
+                self._misses += 1
+        if name is None:
+            name = f"duckstack_stmt_{next(self._names)}"
+            try:
+                cursor.execute(f"PREPARE {name} AS {sql}")
+            except duckdb.BinderException:
+                # Some statements can't be prepared; run them the ordinary way
+                return cursor.execute(sql, params)
+            self._remember(cursor, sql, name)
+        try:
+            return cursor.execute(f"EXECUTE {name}({arguments})")
+        except duckdb.Error:
+            # A failed statement may be stale (e.g. its table was dropped); prepare it afresh next time
+            self._forget(cursor, sql, name)
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "statements": sum(len(p) for p in self._statements.values()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, cursor: duckdb.DuckDBPyConnection, sql: str, name: str) -> None:
+        with self._lock:
+            prepared = self._statements.setdefault(cursor, OrderedDict())
+            prepared[sql] = name
+            evicted = []
+            while len(prepared) > self.max_per_cursor:
+                evicted.append(prepared.popitem(last=False)[1])
+            self._evictions += len(evicted)
+        for old in evicted:
+            cursor.execute(f"DEALLOCATE {old}")
+
+    def _forget(self, cursor: duckdb.DuckDBPyConnection, sql: str, name: str) -> None:
+        with self._lock:
+            prepared = self._statements.get(cursor)
+            if prepared is None or prepared.get(sql) != name:
+                return
+            del prepared[sql]
+        try:
+            cursor.execute(f"DEALLOCATE {name}")
+        except duckdb.Error:
+            pass
+
+
+def render_arguments(params: Params) -> str:
+    """Render parameter values as the argument list of an EXECUTE statement.
+
+    EXECUTE takes its arguments as SQL text, so every value is rendered as
+    a literal: text is quoted, and named parameters must be plain
+    identifiers.
+    """
+    if isinstance(params, dict):
+        for key in params:
+            if not _NAME.match(key):
+                raise duckdb.InvalidInputException(f"Invalid parameter name: {key!r}")
+        return ", ".join(f"{key} := {_literal(value)}" for key, value in params.items())
+    return ", ".join(_literal(value) for value in params)
+
+
+def text_values(params: Params | None) -> list[str]:
+    """Return the string parameter values, e.g. to look for file paths or URLs among them."""
+    if not params:
+        return []
+    values = params.values() if isinstance(params, dict) else params
+    return [value for value in values if isinstance(value, str)]
+
+
+def _literal(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value) if math.isfinite(value) else f"CAST('{value}' AS DOUBLE)"
+    if isinstance(value, str):
+        return views.quote_literal(value)
+    raise duckdb.InvalidInputException(f"Unsupported parameter value: {value!r}")
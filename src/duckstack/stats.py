@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import datetime
+import decimal
+from typing import Any
+
+import duckdb
+
+_NUMERIC_TYPES = (
+    "TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT",
+    "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT", "UHUGEINT",
+    "FLOAT", "DOUBLE", "DECIMAL",
+)
+
+
+def collect(cursor: duckdb.DuckDBPyConnection, files: list[str], columns: list[dict]) -> list[dict]:
+    """Read the parquet footers of files and summarize them per file.
+
+    Returns one dict per file with its row count, row-group count and, for
+    every top-level column, the min, max and null count over all of its row
+    groups. Min and max are kept as the text DuckDB renders them in; use
+    coerce() with the column's type to compare them. A column whose stats
+    are missing from any row group gets no min/max for the file.
+    """
+    dtypes = {c["name"]: c["dtype"] for c in columns}
+    summary = {
+        row[0]: {"path": row[0], "row_count": row[1], "row_group_count": row[2], "column_stats": {}}
+        for row in cursor.execute(
+            "SELECT file_name, num_rows, num_row_groups FROM parquet_file_metadata(?)", [files]
+        ).fetchall()
+    }
+    chunks = cursor.execute(
+        "SELECT file_name, path_in_schema, row_group_num_rows, stats_min_value, stats_max_value, "
+        "stats_null_count FROM parquet_metadata(?)",
+        [files],
+    ).fetchall()
+
+    grouped: dict[tuple[str, str], list[tuple]] = {}
+    for file_name, column, rows, lo, hi, nulls in chunks:
+        if column in dtypes and file_name in summary:
+            grouped.setdefault((file_name, column), []).append((rows, lo, hi, nulls))
+
+    for (file_name, column), parts in grouped.items():
+        null_count = None if any(p[3] is None for p in parts) else sum(p[3] for p in parts)
+        # Row groups holding nothing but nulls have no range and don't widen it
+        ranged = [p for p in parts if p[3] is None or p[3] < p[0]]
+        lo = _extreme(dtypes[column], [p[1] for p in ranged], min)
+        hi = _extreme(dtypes[column], [p[2] for p in ranged], max)
+        summary[file_name]["column_stats"][column] = {"min": lo, "max": hi, "null_count": null_count}
+
+    # Keep the caller's file order; files DuckDB reported nothing for get empty stats
+    return [summary.get(f, {"path": f, "row_count": None, "row_group_count": None, "column_stats": {}}) for f in files]
+
+
+def coerce(dtype: str, value: Any) -> Any:
+    """Convert a stats value or query literal to something comparable for dtype.
+
+    Returns None when the value can't be compared safely, which callers must
+    treat as "unknown" and never use to rule a file out.
+    """
+    if value is None:
+        return None
+    base = dtype.split("(", 1)[0].strip().upper()
+    try:
+        if base in _NUMERIC_TYPES:
+            if isinstance(value, bool):
+                return None
+            number = decimal.Decimal(str(value))
+            return number if number.is_finite() else None
+        if base == "DATE":
+            return datetime.date.fromisoformat(str(value))
+        if base in ("TIMESTAMP", "TIMESTAMP_S", "TIMESTAMP_MS", "TIMESTAMP_NS", "DATETIME"):
+            parsed = datetime.datetime.fromisoformat(str(value))
+            return parsed if parsed.tzinfo is None else None
+        if base in ("VARCHAR", "TEXT", "STRING"):
+            return value if isinstance(value, str) else None
+    except (ValueError, ArithmeticError):
+        return None
+    return None
+
+
+def _extreme(dtype: str, values: list[str | None], choose) -> str | None:
+    """Return whichever of values is smallest/largest, or None if any is unknown."""
+    keyed = [(coerce(dtype, v), v) for v in values]
+    if not keyed or any(k is None for k, _ in keyed):
+        return None
+    return choose(keyed, key=lambda kv: kv[0])[1]
+
+
+def with_partition_stats(entry: dict, values: dict) -> dict:
+    """Record a file's partition values, and each as its column's exact range.
+
+    Partition columns live in the path rather than the file, so this is the
+    only place their statistics come from.
+    """
+    column_stats = dict(entry.get("column_stats") or {})
+    for column, value in values.items():
+        null_count = entry.get("row_count") if value is None else 0
+        column_stats[column] = {"min": value, "max": value, "null_count": null_count}
+    return {**entry, "partition_values": values, "column_stats": column_stats}
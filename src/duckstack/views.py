@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from collections import defaultdict
+from urllib.parse import unquote
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+_GLOB_CHARS = ("*", "?", "[")
+_UNLISTABLE = ("http://", "https://")
+_COMPRESSION_SUFFIXES = (".gz", ".zst")
+_DATA_SUFFIXES = (".parquet", ".csv", ".tsv", ".json", ".jsonl", ".ndjson")
+# How Hive-style writers spell a NULL partition value
+HIVE_NULL = "__HIVE_DEFAULT_PARTITION__"
+
+# lower-cased dataset name -> the dataset as registered, with the files its view reads
+_registered: dict[str, dict] = {}
+_lock = threading.Lock()
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def resolve_files(cursor: duckdb.DuckDBPyConnection, path: str) -> list[str]:
+    """Expand a dataset path to the sorted list of files it currently matches.
+
+    Paths come back fully resolved (e.g. relative to file_search_path), the
+    same way DuckDB reports them in parquet_metadata().
+    """
+    if path.lower().startswith(_UNLISTABLE) and not any(c in path for c in _GLOB_CHARS):
+        return [path]
+    return [row[0] for row in cursor.execute("SELECT file FROM glob(?) ORDER BY file", [path]).fetchall()]
+
+
+def reader_function(path: str) -> str:
+    """Return the DuckDB table function for a dataset path, chosen by its extension."""
+    lowered = path.lower()
+    for suffix in _COMPRESSION_SUFFIXES:
+        lowered = lowered.removesuffix(suffix)
+    if lowered.endswith((".csv", ".tsv")):
+        return "read_csv"
+    if lowered.endswith((".json", ".jsonl", ".ndjson")):
+        return "read_json_auto"
+    return "read_parquet"
+
+
+def reader_sql(dataset: dict, files: list[str]) -> str:
+    """Return the table function call that reads files of dataset as one relation.
+
+    Partition columns are read from the file paths. Their types are pinned
+    to the dataset's recorded ones, so a subset of the files (see pruning)
+    exposes the same schema as the whole dataset.
+    """
+    args = [f"[{', '.join(quote_literal(f) for f in files)}]"]
+    partition_columns = dataset.get("partition_columns") or []
+    if partition_columns:
+        args.append("hive_partitioning = true")
+        dtypes = {c["name"]: c["dtype"] for c in dataset.get("columns") or []}
+        if all(c in dtypes for c in partition_columns):
+            types = ", ".join(f"{quote_literal(c)}: {quote_literal(dtypes[c])}" for c in partition_columns)
+            args.append(f"hive_types = {{{types}}}")
+    return f"{reader_function(dataset['path'])}({', '.join(args)})"
+
+
+def file_pattern(dataset: dict, partition: dict | None = None) -> str:
+    """Return the glob matching a dataset's files, or one partition's files.
+
+    A partitioned dataset's path is the root of a col=value/... directory
+    tree with one level per partition column. partition pins some of those
+    levels to a value, which keeps the listing to that part of the tree.
+    """
+    partition_columns = dataset.get("partition_columns") or []
+    if not partition_columns:
+        return dataset["path"]
+    levels = [f"{c}={(partition or {}).get(c, '*')}" for c in partition_columns]
+    return "/".join([dataset["path"].rstrip("/"), *levels, "*.parquet"])
+
+
+def partition_values(dataset: dict, file: str) -> dict:
+    """Parse the partition column values out of a file path.
+
+    Only the directory levels right above the file are looked at (one per
+    partition column, as file_pattern lays them out), so a col=value
+    segment in the root itself is never mistaken for a partition.
+    """
+    partition_columns = dataset.get("partition_columns") or []
+    if not partition_columns:
+        return {}
+    values = {}
+    for segment in file.split("/")[-len(partition_columns) - 1 : -1]:
+        key, sep, value = segment.partition("=")
+        if sep and key in partition_columns:
+            value = unquote(value)
+            values[key] = None if value == HIVE_NULL else value
+    return values
+
+
+def discover(cursor: duckdb.DuckDBPyConnection, prefix: str) -> list[dict]:
+    """Split the data files under a directory or prefix into datasets to register.
+
+    Each file right under prefix is a dataset of its own, and so is each
+    subdirectory, with all the files below it. A subdirectory laid out as
+    col=value/... levels of parquet files becomes a partitioned dataset.
+    Files that aren't data (_SUCCESS, .crc, hidden files) are skipped.
+    Datasets are named after the file or subdirectory; a subdirectory
+    mixing formats is returned with an "error" instead of a path.
+    """
+    root = prefix.rstrip("/")
+    files = resolve_files(cursor, f"{root}/**")
+    if not files:
+        raise duckdb.IOException(f"No files found under \"{prefix}\"")
+    resolved = _resolved_root(root, files[0])
+
+    top: list[dict] = []
+    nested: dict[str, list[list[str]]] = defaultdict(list)
+    for file in files:
+        parts = file[len(resolved) + 1 :].split("/")
+        if any(part.startswith(("_", ".")) for part in parts) or _data_suffix(parts[-1]) is None:
+            continue
+        if len(parts) == 1:
+            suffix = _data_suffix(parts[0])
+            top.append({"name": _dataset_name(parts[0][: -len(suffix)]), "path": f"{root}/{parts[0]}"})
+        else:
+            nested[parts[0]].append(parts[1:])
+
+    datasets = top
+    for directory, paths in sorted(nested.items()):
+        dataset = {"name": _dataset_name(directory), "path": f"{root}/{directory}"}
+        suffixes = {_data_suffix(path[-1]) for path in paths}
+        levels = {tuple(part.partition("=")[0] for part in path[:-1]) for path in paths}
+        if len(suffixes) > 1:
+            dataset["error"] = f"Mixed file formats: {', '.join(sorted(suffixes))}"
+        elif suffixes == {".parquet"} and len(levels) == 1 and levels != {()} and all(
+            "=" in part for path in paths for part in path[:-1]
+        ):
+            dataset["partition_columns"] = list(levels.pop())
+        else:
+            dataset["path"] += f"/**/*{suffixes.pop()}"
+        datasets.append(dataset)
+    return datasets
+
+
+def register(cursor: duckdb.DuckDBPyConnection, dataset: dict) -> list[str]:
+    """Create or replace the view exposing a dataset under its catalog name.
+
+    The view reads the dataset's recorded file list (see stats.collect), so
+    queries don't list the bucket or directory again. Datasets without one
+    have their path's globs expanded here, once. Files added later are
+    picked up when the dataset is refreshed.
+    """
+    name, pattern = dataset["name"], file_pattern(dataset)
+    files = [f["path"] for f in dataset.get("files") or []] or resolve_files(cursor, pattern)
+    if not files:
+        raise duckdb.IOException(f"No files found that match the pattern \"{pattern}\"")
+    cursor.execute(f"CREATE OR REPLACE VIEW {quote_identifier(name)} AS SELECT * FROM {reader_sql(dataset, files)}")
+    if not dataset.get("files"):
+        dataset = {**dataset, "files": [{"path": f} for f in files]}
+    with _lock:
+        _registered[name.lower()] = dataset
+    return files
+
+
+def unregister(cursor: duckdb.DuckDBPyConnection, name: str) -> None:
+    cursor.execute(f"DROP VIEW IF EXISTS {quote_identifier(name)}")
+    with _lock:
+        _registered.pop(name.lower(), None)
+
+
+def sync(cursor: duckdb.DuckDBPyConnection, datasets: list[dict]) -> None:
+    """Make the registered views match datasets, touching only what changed.
+
+    A dataset whose files can't be read is logged and skipped rather than
+    failing the whole sync; it stays unqueryable by name until it is
+    registered again.
+    """
+    wanted = {d["name"].lower(): d for d in datasets}
+    with _lock:
+        current = dict(_registered)
+
+    for key in current.keys() - wanted.keys():
+        try:
+            unregister(cursor, key)
+        except duckdb.Error:
+            logger.exception("Dropping view for dataset %s failed", key)
+
+    for key, dataset in wanted.items():
+        if key in current and _same_files(current[key], dataset):
+            if current[key] is not dataset:
+                # Same view; pick up any new stats or columns without touching DuckDB
+                with _lock:
+                    _registered[key] = {**dataset, "files": dataset.get("files") or current[key]["files"]}
+            continue
+        try:
+            register(cursor, dataset)
+        except duckdb.Error:
+            logger.exception("Registering view for dataset %s failed", dataset["name"])
+
+
+def forget_all() -> None:
+    """Forget every registered view, e.g. when they belonged to a database that is gone."""
+    with _lock:
+        _registered.clear()
+
+
+def get(name: str) -> dict | None:
+    with _lock:
+        return _registered.get(name.lower())
+
+
+def files_for(names: set[str]) -> list[str]:
+    """Return the files read by whichever of names are registered datasets."""
+    with _lock:
+        return sorted(f["path"] for name in names if name in _registered for f in _registered[name]["files"])
+
+
+def registered() -> dict[str, list[str]]:
+    with _lock:
+        return {name: [f["path"] for f in d["files"]] for name, d in _registered.items()}
+
+
+def _same_files(current: dict, dataset: dict) -> bool:
+    if current["path"] != dataset["path"]:
+        return False
+    if current.get("partition_columns") != dataset.get("partition_columns"):
+        return False
+    # A dataset loaded without a file list keeps whatever its path expanded to
+    if not dataset.get("files"):
+        return True
+    return [f["path"] for f in current["files"]] == [f["path"] for f in dataset["files"]]
+
+
+def _resolved_root(root: str, file: str) -> str:
+    """Return root as DuckDB spells it in the paths it lists, given one of them."""
+    if file.startswith(f"{root}/"):
+        return root
+    # Relative roots come back resolved against file_search_path
+    tail = "/" + root.removeprefix("./")
+    end = file.find(tail + "/")
+    if root in (".", "") or end < 0:
+        raise duckdb.IOException(f"Cannot tell which part of \"{file}\" is under \"{root}\"")
+    return file[: end + len(tail)]
+
+
+def _data_suffix(filename: str) -> str | None:
+    """Return a data file's suffix, compression included (".csv.gz"), or None for other files."""
+    lowered = filename.lower()
+    compression = next((c for c in _COMPRESSION_SUFFIXES if lowered.endswith(c)), "")
+    lowered = lowered.removesuffix(compression)
+    suffix = next((s for s in _DATA_SUFFIXES if lowered.endswith(s)), None)
+    return suffix + compression if suffix else None
+
+
+def _dataset_name(stem: str) -> str:
+    return re.sub(r"\W+", "_", stem).strip("_").lower() or "dataset"
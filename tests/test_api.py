@@ -1,3 +1,8 @@
+import json
+import time
+
+import duckdb
+import pyarrow as pa
 from fastapi.testclient import TestClient
 
 from duckstack.main import app
@@ -30,6 +35,94 @@ def test_query_aggregate():
     assert body["row_count"] == 3
 
 
+def test_query_arrow_stream():
+    resp = client.post(
+        "/query",
+        json={"sql": "SELECT * FROM 'sample.parquet' ORDER BY id"},
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(resp.content).read_all()
+    assert table.column_names == ["id", "name", "department", "salary"]
+    assert table.num_rows == 8
+    assert table.column("name")[0].as_py() == "Alice"
+
+
+def test_query_stream_ndjson():
+    resp = client.post(
+        "/query",
+        json={"sql": "SELECT * FROM 'sample.parquet' ORDER BY id", "stream": True},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert len(lines) == 8
+    assert lines[0] == {"id": 1, "name": "Alice", "department": "Engineering", "salary": 95000}
+
+
+def test_query_stream_arrow_batches():
+    resp = client.post(
+        "/query",
+        json={"sql": "SELECT range AS n FROM range(25000)", "stream": True},
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+    assert resp.status_code == 200
+    reader = pa.ipc.open_stream(resp.content)
+    batches = list(reader)
+    assert len(batches) > 1
+    assert sum(b.num_rows for b in batches) == 25000
+
+
+def test_query_stream_invalid_sql():
+    resp = client.post("/query", json={"sql": "SELECT * FROM nonexistent_table", "stream": True})
+    assert resp.status_code == 400
+
+
+def test_query_timeout_interrupts_query():
+    resp = client.post(
+        "/query",
+        json={"sql": "SELECT count(*) FROM range(10000000000) a", "timeout_ms": 200},
+    )
+    assert resp.status_code == 504
+    assert "timeout" in resp.json()["detail"]
+
+
+def test_query_cache_hit():
+    sql = "SELECT department, count(*) AS n FROM 'sample.parquet' GROUP BY ALL ORDER BY ALL"
+    first = client.post("/query", json={"sql": sql, "cache": True}).json()
+    second = client.post("/query", json={"sql": "  " + sql + " ;", "cache": True}).json()
+    assert second["cached"] is True
+    assert second["rows"] == first["rows"]
+    assert second["columns"] == ["department", "n"]
+
+
+def test_query_cache_invalidated_when_file_changes(tmp_path):
+    path = tmp_path / "data.parquet"
+    duckdb.execute(f"COPY (SELECT 1 AS x) TO '{path}' (FORMAT PARQUET)")
+    body = {"sql": f"SELECT sum(x) AS total FROM '{path}'", "cache": True}
+    assert client.post("/query", json=body).json()["rows"] == [[1]]
+    assert client.post("/query", json=body).json()["cached"] is True
+
+    duckdb.execute(f"COPY (SELECT range AS x FROM range(100)) TO '{path}' (FORMAT PARQUET)")
+    resp = client.post("/query", json=body).json()
+    assert resp["cached"] is False
+    assert resp["rows"] == [[4950]]
+
+
+def test_query_cache_invalidated_when_file_passed_as_parameter_changes(tmp_path):
+    path = str(tmp_path / "data.parquet")
+    duckdb.execute(f"COPY (SELECT 1 AS x) TO '{path}' (FORMAT PARQUET)")
+    body = {"sql": "SELECT sum(x) AS total FROM read_parquet($1)", "params": [path], "cache": True}
+    assert client.post("/query", json=body).json()["rows"] == [[1]]
+    assert client.post("/query", json=body).json()["cached"] is True
+
+    duckdb.execute(f"COPY (SELECT range AS x FROM range(100)) TO '{path}' (FORMAT PARQUET)")
+    resp = client.post("/query", json=body).json()
+    assert resp["cached"] is False
+    assert resp["rows"] == [[4950]]
+
+
 def test_query_invalid_sql():
     resp = client.post("/query", json={"sql": "SELECT * FROM nonexistent_table"})
     assert resp.status_code == 400
@@ -38,3 +131,80 @@ def test_query_invalid_sql():
 def test_query_s3_path_returns_error_without_real_bucket():
     resp = client.post("/query", json={"sql": "SELECT * FROM 's3://no-such-bucket/file.parquet'"})
     assert resp.status_code == 400
+
+
+def test_job_results_pages():
+    resp = client.post("/jobs", json={"sql": "SELECT * FROM 'sample.parquet' ORDER BY id"})
+    assert resp.status_code == 202
+    job_id = resp.json()["id"]
+    for _ in range(500):
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.01)
+    assert status["status"] == "succeeded" and status["row_count"] == 8
+
+    body = client.get(f"/jobs/{job_id}/results", params={"page": 1, "page_size": 3}).json()
+    assert [row[0] for row in body["rows"]] == [4, 5, 6]
+    assert body["total_rows"] == 8 and body["next_page"] == 2
+
+    assert client.delete(f"/jobs/{job_id}").status_code == 204
+    assert client.get(f"/jobs/{job_id}").status_code == 404
+
+
+def test_query_cursor_pages():
+    sql = "SELECT id FROM 'sample.parquet' ORDER BY id"
+    body = client.post("/query", json={"sql": sql, "cursor": True, "page_size": 5}).json()
+    assert [row[0] for row in body["rows"]] == [1, 2, 3, 4, 5] and body["cursor"]
+
+    rest = client.get(f"/query/cursors/{body['cursor']}", params={"page_size": 5}).json()
+    assert [row[0] for row in rest["rows"]] == [6, 7, 8] and rest["cursor"] is None
+    # Exhausted cursors are closed
+    assert client.get(f"/query/cursors/{body['cursor']}").status_code == 404
+
+
+def test_query_params():
+    sql = "SELECT name FROM 'sample.parquet' WHERE department = $dept AND salary > $min ORDER BY id"
+    for _ in range(2):
+        resp = client.post("/query", json={"sql": sql, "params": {"dept": "Engineering", "min": 90000}})
+        assert resp.status_code == 200
+        assert resp.json()["rows"] == [["Alice"], ["Grace"]]
+    resp = client.post("/query", json={"sql": "SELECT ? + 1", "params": [41], "cache": True})
+    assert resp.json()["rows"] == [[42]]
+
+
+def test_query_columnar():
+    resp = client.post(
+        "/query",
+        json={"sql": "SELECT id, name FROM 'sample.parquet' ORDER BY id LIMIT 3", "format": "columnar"},
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["columns"] == ["id", "name"]
+    assert body["data"] == [[1, 2, 3], ["Alice", "Bob", "Charlie"]]
+    assert body["row_count"] == 3
+    resp = client.post("/query", json={"sql": "SELECT 'nan'::DOUBLE AS x", "format": "columnar", "cache": True})
+    assert resp.json()["data"] == [[None]]
+
+
+def test_query_compressed():
+    sql = "SELECT * FROM range(5000)"
+    resp = client.post("/query", json={"sql": sql}, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["vary"]
+    assert resp.json()["row_count"] == 5000
+    resp = client.post("/query", json={"sql": "SELECT 1"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+
+
+def test_metrics_endpoint():
+    client.post("/query", json={"sql": "SELECT * FROM 'sample.parquet'"})
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    for phase in ("queue", "execute", "fetch", "serialize", "send"):
+        assert f'duckstack_request_phase_seconds_count{{endpoint="/query",phase="{phase}"}}' in body
+    assert 'duckstack_request_rows_count{endpoint="/query"}' in body
+    assert "duckstack_query_pool_in_use 0" in body
+    assert "duckstack_result_cache_hit_ratio" in body
@@ -0,0 +1,176 @@
+import asyncio
+
+import httpx
+
+from duckstack import api_client, cache
+
+SOURCE = {
+    "name": "people",
+    "endpoint_url": "https://api.example.com/people",
+    "query_params": {},
+    "auth_header": "",
+    "auth_env_var": "",
+    "api_key_param": "",
+    "api_key_override": "",
+    "response_path": "data.items",
+    "ttl_seconds": 60,
+}
+
+
+def _client(calls: list) -> httpx.AsyncClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"data": {"items": [{"id": 1, "name": "Ada"}, {"id": 2, "name": "Bo"}]}})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_concurrent_misses_share_one_upstream_fetch():
+    cache.clear()
+    calls: list = []
+
+    async def main():
+        async with _client(calls) as client:
+            return await asyncio.gather(
+                *(api_client.fetch_api_data(SOURCE, {"q": "x"}, client) for _ in range(5))
+            )
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    for table, was_cached, _ in results:
+        assert table.column_names == ["id", "name"]
+        assert table.to_pylist() == [{"id": 1, "name": "Ada"}, {"id": 2, "name": "Bo"}]
+        assert was_cached is False
+    assert api_client._inflight == {}
+
+
+def test_second_call_is_served_from_cache():
+    cache.clear()
+    calls: list = []
+
+    async def main():
+        async with _client(calls) as client:
+            first, _, _ = await api_client.fetch_api_data(SOURCE, {}, client)
+            second, was_cached, _ = await api_client.fetch_api_data(SOURCE, {}, client)
+            return first, second, was_cached
+
+    first, second, was_cached = asyncio.run(main())
+    assert was_cached is True
+    assert second is first
+    assert len(calls) == 1
+
+
+def test_to_arrow_unions_keys_across_records():
+    table = api_client._to_arrow([{"a": 1}, {"a": 2, "b": {"x": "y"}}])
+    assert table.column_names == ["a", "b"]
+    assert table.column("b").to_pylist() == [None, {"x": "y"}]
+
+
+def test_to_arrow_keeps_mixed_type_fields_as_text():
+    table = api_client._to_arrow([{"a": 1, "b": 1}, {"a": 2, "b": "two"}])
+    assert table.column("a").to_pylist() == [1, 2]
+    assert table.column("b").to_pylist() == ["1", "two"]
+
+
+def test_stale_entry_is_served_while_refreshing():
+    cache.clear()
+    calls: list = []
+    source = {**SOURCE, "name": "swr", "ttl_seconds": 0, "stale_ttl_seconds": 60}
+
+    async def main():
+        async with _client(calls) as client:
+            await api_client.fetch_api_data(source, {}, client)
+            table, was_cached, is_stale = await api_client.fetch_api_data(source, {}, client)
+            # The stale read returned without waiting for the refresh it started
+            assert len(calls) == 1
+            await asyncio.gather(*api_client._inflight.values())
+            return table, was_cached, is_stale
+
+    table, was_cached, is_stale = asyncio.run(main())
+    assert (was_cached, is_stale) == (True, True)
+    assert table.num_rows == 2
+    assert len(calls) == 2
+
+
+def test_prewarm_fetches_missing_and_expiring_entries():
+    cache.clear()
+    calls: list = []
+    source = {**SOURCE, "name": "warm", "prewarm_params": [{"q": "a"}, {"q": "b"}]}
+
+    async def main():
+        async with _client(calls) as client:
+            await api_client._prewarm(source, client, interval_seconds=10)
+            await api_client._prewarm(source, client, interval_seconds=10)  # still fresh: no refetch
+            _, was_cached, _ = await api_client.fetch_api_data(source, {"q": "a"}, client)
+            return was_cached
+
+    assert asyncio.run(main()) is True
+    assert sorted(r.url.params["q"] for r in calls) == ["a", "b"]
+
+
+def _paged_source(**pagination) -> dict:
+    return {**SOURCE, "name": f"paged-{pagination['type']}", "response_path": "items", "pagination": pagination}
+
+
+def _fetch(source: dict, handler) -> tuple:
+    cache.clear()
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await api_client.fetch_api_data(source, {}, client)
+
+    return asyncio.run(main())
+
+
+ITEMS = [{"id": i} for i in range(7)]
+
+
+def test_offset_pagination_fetches_pages_concurrently():
+    in_flight = {"now": 0, "max": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.02)
+        in_flight["now"] -= 1
+        offset, limit = int(request.url.params["offset"]), int(request.url.params["limit"])
+        return httpx.Response(200, json={"items": ITEMS[offset:offset + limit]})
+
+    table, _, _ = _fetch(_paged_source(type="offset", page_size=2, concurrency=3), handler)
+    assert table.column("id").to_pylist() == list(range(7))
+    assert in_flight["max"] == 3
+
+
+def test_page_number_pagination_stops_at_max_pages():
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params["page"])
+        return httpx.Response(200, json={"items": [{"id": page}] * 2})
+
+    table, _, _ = _fetch(_paged_source(type="page", page_size=2, max_pages=3), handler)
+    assert table.column("id").to_pylist() == [1, 1, 2, 2, 3, 3]
+
+
+def test_cursor_pagination_follows_next_token():
+    def handler(request: httpx.Request) -> httpx.Response:
+        position = int(request.url.params.get("after", 0))
+        body = {"items": ITEMS[position:position + 3], "meta": {"next": None}}
+        if position + 3 < len(ITEMS):
+            body["meta"]["next"] = position + 3
+        return httpx.Response(200, json=body)
+
+    source = _paged_source(type="cursor", cursor_param="after", next_cursor_path="meta.next")
+    table, _, _ = _fetch(source, handler)
+    assert table.column("id").to_pylist() == list(range(7))
+
+
+def test_link_header_pagination():
+    def handler(request: httpx.Request) -> httpx.Response:
+        position = int(request.url.params.get("start", 0))
+        headers = {}
+        if position + 4 < len(ITEMS):
+            headers["Link"] = f'<https://api.example.com/people?start={position + 4}>; rel="next"'
+        return httpx.Response(200, json={"items": ITEMS[position:position + 4]}, headers=headers)
+
+    table, _, _ = _fetch(_paged_source(type="link"), handler)
+    assert table.column("id").to_pylist() == list(range(7))
@@ -0,0 +1,92 @@
+"""Tests for the on-disk block cache and the caching s3:// filesystem."""
+
+import io
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from duckstack.blockcache import BlockCache
+
+
+def test_hits_misses_and_lru_eviction(tmp_path):
+    cache = BlockCache(tmp_path, max_bytes=10)
+    assert cache.get("a") is None
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")  # over budget: "b" is the least recently used
+
+    assert cache.get("b") is None
+    assert cache.get("c") == b"cccc"
+    assert cache.stats() == {"blocks": 2, "bytes": 8, "max_bytes": 10, "hits": 2, "misses": 2, "evictions": 1}
+
+
+def test_recovery_rebuilds_the_index(tmp_path):
+    cache = BlockCache(tmp_path, max_bytes=100)
+    cache.put("a" * 64, b"1234")
+    cache.put("b" * 64, b"5678")
+    (tmp_path / "cc").mkdir()
+    (tmp_path / "cc" / "partial.tmp").write_bytes(b"torn")
+
+    recovered = BlockCache(tmp_path, max_bytes=100)
+    assert recovered.get("b" * 64) == b"5678"
+    assert recovered.stats()["bytes"] == 8
+    assert not (tmp_path / "cc" / "partial.tmp").exists()
+
+    # A smaller capacity on restart evicts down to it
+    assert BlockCache(tmp_path, max_bytes=4).stats()["blocks"] == 1
+
+
+@pytest.fixture
+def memory_fs():
+    fsspec = pytest.importorskip("fsspec")
+    fs = fsspec.filesystem("memory")
+    fs.store.clear()
+    reads = []
+    cat_file = fs.cat_file
+
+    def counting_cat_file(path, start=None, end=None, **kwargs):
+        reads.append((start, end))
+        return cat_file(path, start=start, end=end, **kwargs)
+
+    fs.cat_file = counting_cat_file
+    fs.reads = reads
+    yield fs
+    fs.store.clear()
+
+
+def test_reads_are_served_from_cached_blocks(tmp_path, memory_fs):
+    from duckstack.s3cache import CachingFileSystem
+
+    memory_fs.pipe("/bucket/obj", bytes(range(256)) * 4)
+    fs = CachingFileSystem(memory_fs, BlockCache(tmp_path, max_bytes=1 << 20), block_size=100)
+    with fs.open("s3://bucket/obj") as f:
+        f.seek(150)
+        assert f.read(100) == (bytes(range(256)) * 4)[150:250]
+    # Blocks 1 and 2 were missing and contiguous: one ranged read
+    assert memory_fs.reads == [(100, 300)]
+
+    with fs.open("s3://bucket/obj") as f:
+        f.seek(120)
+        assert f.read(50) == (bytes(range(256)) * 4)[120:170]
+        f.seek(1000)
+        assert f.read() == (bytes(range(256)) * 4)[1000:]
+    assert memory_fs.reads == [(100, 300), (1000, 1024)]
+
+
+def test_duckdb_reads_s3_paths_through_the_cache(tmp_path, memory_fs):
+    from duckstack.s3cache import CachingFileSystem
+
+    buf = io.BytesIO()
+    pq.write_table(pa.table({"x": list(range(1000))}), buf)
+    memory_fs.pipe("/bucket/data.parquet", buf.getvalue())
+    cache = BlockCache(tmp_path, max_bytes=1 << 20)
+    conn = duckdb.connect()
+    conn.register_filesystem(CachingFileSystem(memory_fs, cache, block_size=4096))
+
+    for _ in range(2):
+        assert conn.execute("SELECT sum(x) FROM 's3://bucket/data.parquet'").fetchone() == (499500,)
+    stats = cache.stats()
+    assert stats["hits"] > 0 and stats["misses"] == stats["blocks"]
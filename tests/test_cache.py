@@ -0,0 +1,70 @@
+import time
+
+import pyarrow as pa
+
+from duckstack.cache import ResultCache, sizeof
+
+
+def test_get_put_and_stats():
+    cache = ResultCache(max_bytes=1_000_000)
+    cache.put("a", [1, 2, 3], ttl_seconds=60)
+    assert cache.get("a") == [1, 2, 3]
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    assert stats["bytes"] == sizeof([1, 2, 3])
+
+
+def test_expired_entry_is_a_miss():
+    cache = ResultCache(max_bytes=1_000_000)
+    cache.put("a", "value", ttl_seconds=0)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_sweep_removes_expired_entries():
+    cache = ResultCache(max_bytes=1_000_000)
+    cache.put("stale", "x", ttl_seconds=0.01)
+    cache.put("fresh", "y", ttl_seconds=60)
+    time.sleep(0.02)
+    assert cache.sweep() == 1
+    assert cache.stats()["entries"] == 1
+    assert cache.get("fresh") == "y"
+
+
+def test_lru_eviction_under_byte_budget():
+    table = pa.table({"x": list(range(1000))})
+    cache = ResultCache(max_bytes=table.nbytes * 2)
+    cache.put("a", table, ttl_seconds=60)
+    cache.put("b", table, ttl_seconds=60)
+    cache.get("a")  # "b" is now least recently used
+    cache.put("c", table, ttl_seconds=60)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+
+
+def test_oversized_value_is_not_cached():
+    cache = ResultCache(max_bytes=10)
+    cache.put("big", "x" * 100, ttl_seconds=60)
+    assert cache.get("big") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_stale_entry_is_only_returned_by_lookup():
+    cache = ResultCache(max_bytes=1_000_000)
+    cache.put("a", "old", ttl_seconds=0, stale_seconds=60)
+    assert cache.get("a") is None
+    value, fresh_for = cache.lookup("a")
+    assert value == "old"
+    assert fresh_for <= 0
+    cache.put("a", "new", ttl_seconds=60)
+    value, fresh_for = cache.lookup("a")
+    assert value == "new"
+    assert fresh_for > 0
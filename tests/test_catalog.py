@@ -4,6 +4,8 @@ These tests run without a PostgreSQL database — they verify that
 endpoints return 503 when DATABASE_URL is not configured.
 """
 
+from types import SimpleNamespace
+
 from fastapi.testclient import TestClient
 
 from duckstack.main import app
@@ -25,6 +27,11 @@ def test_create_dataset_returns_503_without_database():
     assert resp.status_code == 503
 
 
+def test_bulk_create_datasets_returns_503_without_database():
+    resp = client.post("/datasets/bulk", json={"prefix": "s3://bucket/tables/"})
+    assert resp.status_code == 503
+
+
 def test_get_dataset_returns_503_without_database():
     resp = client.get("/datasets/test")
     assert resp.status_code == 503
@@ -33,3 +40,23 @@ def test_get_dataset_returns_503_without_database():
 def test_delete_dataset_returns_503_without_database():
     resp = client.delete("/datasets/test")
     assert resp.status_code == 503
+
+
+def test_refresh_dataset_rejects_materialized_datasets(monkeypatch):
+    dataset = {"name": "daily", "materialization": {"sql": "SELECT 1"}}
+    monkeypatch.setattr(app.state, "catalog_pool", object(), raising=False)
+    monkeypatch.setattr(app.state, "catalog_cache", SimpleNamespace(get_dataset=lambda name: dataset), raising=False)
+    resp = client.post("/datasets/daily/refresh")
+    assert resp.status_code == 409
+    assert "/materialized/daily/refresh" in resp.json()["detail"]
+
+
+def test_create_materialized_returns_503_without_database():
+    resp = client.post("/materialized", json={"name": "daily", "sql": "SELECT 1"})
+    assert resp.status_code == 503
+
+
+def test_create_materialized_rejects_names_that_are_not_identifiers():
+    for name in ("../escape", "/tmp/x", "a b"):
+        resp = client.post("/materialized", json={"name": name, "sql": "SELECT 1"})
+        assert resp.status_code == 422
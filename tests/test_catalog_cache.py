@@ -0,0 +1,76 @@
+"""Tests for the in-memory catalog mirror, with the Postgres loaders stubbed out."""
+
+import asyncio
+
+from duckstack import catalog
+from duckstack.catalog_cache import CatalogCache
+
+
+def _stub_loaders(monkeypatch, datasets: list, sources: list, calls: list):
+    async def load_datasets(pool):
+        calls.append("datasets")
+        await asyncio.sleep(0.01)
+        return list(datasets)
+
+    async def load_api_sources(pool):
+        calls.append("api_sources")
+        return list(sources)
+
+    monkeypatch.setattr(catalog, "load_datasets", load_datasets)
+    monkeypatch.setattr(catalog, "load_api_sources", load_api_sources)
+
+
+def test_reads_are_served_from_memory(monkeypatch):
+    calls: list = []
+    datasets = [{"id": 2, "name": "b"}, {"id": 1, "name": "a"}]
+    sources = [{"id": 1, "name": "s", "prewarm_params": [{"q": "x"}]}, {"id": 2, "name": "t", "prewarm_params": []}]
+    _stub_loaders(monkeypatch, datasets, sources, calls)
+
+    mirror = CatalogCache(pool=None)
+    asyncio.run(mirror.reload_all())
+    calls.clear()
+
+    assert [d["name"] for d in mirror.list_datasets()] == ["a", "b"]
+    assert mirror.get_dataset("b") == {"id": 2, "name": "b"}
+    assert mirror.get_dataset("missing") is None
+    assert [s["name"] for s in mirror.list_prewarm_sources()] == ["s"]
+    assert calls == []
+
+
+def test_local_writes_are_visible_immediately():
+    mirror = CatalogCache(pool=None)
+    mirror.put_dataset({"id": 1, "name": "a"})
+    assert mirror.get_dataset("a") is not None
+    mirror.drop_dataset("a")
+    assert mirror.get_dataset("a") is None
+
+
+def test_notification_bursts_are_coalesced(monkeypatch):
+    calls: list = []
+    datasets: list = []
+    _stub_loaders(monkeypatch, datasets, [], calls)
+    mirror = CatalogCache(pool=None)
+
+    async def main():
+        datasets.append({"id": 1, "name": "a"})
+        for table in ("datasets", "dataset_columns", "datasets", "dataset_columns"):
+            mirror._on_notify(None, 0, catalog.NOTIFY_CHANNEL, table)
+        await mirror._reloads["datasets"]
+
+    asyncio.run(main())
+    # One reload for the first notification, one more for everything that arrived meanwhile
+    assert calls == ["datasets", "datasets"]
+    assert mirror.get_dataset("a") is not None
+
+
+def test_dataset_loads_notify_the_listener(monkeypatch):
+    calls: list = []
+    _stub_loaders(monkeypatch, [{"id": 1, "name": "a"}], [], calls)
+    seen: list = []
+
+    async def on_loaded(datasets):
+        seen.append([d["name"] for d in datasets])
+
+    mirror = CatalogCache(pool=None, on_datasets_loaded=on_loaded)
+    asyncio.run(mirror.reload_all())
+    assert seen == [["a"]]
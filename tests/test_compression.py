@@ -0,0 +1,94 @@
+"""Tests for negotiated response compression."""
+
+import asyncio
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from duckstack.compression import CompressionMiddleware, negotiate
+
+BODY = "duckstack " * 500
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+
+@app.get("/big")
+def big():
+    return PlainTextResponse(BODY)
+
+
+@app.get("/small")
+def small():
+    return PlainTextResponse("tiny")
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse(iter([BODY, BODY]), media_type="text/plain")
+
+
+client = TestClient(app)
+
+
+def test_negotiate():
+    assert negotiate("gzip, deflate, br", ("zstd", "gzip")) == "gzip"
+    assert negotiate("gzip, zstd", ("zstd", "gzip")) == "zstd"
+    assert negotiate("zstd;q=0.5, gzip", ("zstd", "gzip")) == "gzip"
+    assert negotiate("*", ("gzip",)) == "gzip"
+    assert negotiate("gzip;q=0, identity", ("gzip",)) is None
+    assert negotiate("", ("zstd", "gzip")) is None
+
+
+def test_gzip_above_threshold_only():
+    resp = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["vary"] == "Accept-Encoding"
+    assert resp.text == BODY
+    assert int(resp.headers["content-length"]) < len(BODY)
+
+    resp = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+    assert resp.text == "tiny"
+
+    resp = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers
+
+
+def test_streamed_chunks_decode_as_they_arrive():
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "method": "GET",
+        "path": "/stream",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "query_string": b"",
+    }
+    asyncio.run(app.build_middleware_stack()(scope, receive, send))
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    chunks = [m["body"] for m in sent[1:] if m["body"]]
+    decoder = zlib.decompressobj(31)
+    # Flushed after each chunk: the first decodes without waiting for the rest
+    assert decoder.decompress(chunks[0]).decode() == BODY
+    assert decoder.decompress(b"".join(chunks[1:])).decode() == BODY
+
+
+def test_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    with client.stream("GET", "/big", headers={"Accept-Encoding": "zstd, gzip"}) as resp:
+        assert resp.headers["content-encoding"] == "zstd"
+        raw = b"".join(resp.iter_raw())
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(raw).decode() == BODY
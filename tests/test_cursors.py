@@ -0,0 +1,53 @@
+"""Tests for server-held result cursors."""
+
+import duckdb
+import pytest
+
+from duckstack import cursors
+from duckstack.pool import QueryTimeout
+
+
+@pytest.fixture
+def registry():
+    db = duckdb.connect()
+    registry = cursors.CursorRegistry(db, max_per_client=2, max_open=3, idle_seconds=60, batch_size=7)
+    yield registry
+    registry.close_all()
+    db.close()
+
+
+def test_pages_continue_where_the_last_one_stopped(registry):
+    result = registry.open("a", "SELECT i FROM range(25) t(i) ORDER BY i")
+    pages = [result.fetch(10).column("i").to_pylist() for _ in range(3)]
+    assert pages == [list(range(10)), list(range(10, 20)), list(range(20, 25))]
+    assert result.exhausted
+
+
+def test_last_full_page_reports_exhaustion(registry):
+    result = registry.open("a", "SELECT i FROM range(14) t(i)")
+    assert result.fetch(7).num_rows == 7 and not result.exhausted
+    assert result.fetch(7).num_rows == 7 and result.exhausted
+
+
+def test_per_client_and_overall_caps(registry):
+    for _ in range(2):
+        registry.open("a", "SELECT 1")
+    with pytest.raises(cursors.CursorLimit, match="client"):
+        registry.open("a", "SELECT 1")
+    registry.open("b", "SELECT 1")
+    with pytest.raises(cursors.CursorLimit):
+        registry.open("c", "SELECT 1")
+
+
+def test_idle_cursors_are_evicted(registry):
+    result = registry.open("a", "SELECT 1")
+    result.last_used -= 120
+    registry.sweep()
+    assert registry.get(result.token) is None
+    assert registry.stats() == {"open": 0, "evictions": 1}
+
+
+def test_slow_queries_time_out(registry):
+    with pytest.raises(QueryTimeout):
+        registry.open("a", "SELECT count(*) FROM range(10000000000) t(i) WHERE i % 7 = 3", timeout=0.2)
+    assert registry.stats()["open"] == 0
@@ -0,0 +1,100 @@
+"""Tests for lazy, per-process engine startup."""
+
+import logging
+import os
+import subprocess
+import sys
+
+import duckdb
+import pytest
+from fastapi.testclient import TestClient
+
+from duckstack import engine as engine_module
+from duckstack import main, views
+from duckstack.config import Settings
+from duckstack.engine import Engine
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # Opening an engine forgets the views of earlier ones; keep the other tests' views
+    monkeypatch.setattr(views, "_registered", dict(views._registered))
+    engine = Engine(Settings(jobs_dir=str(tmp_path / "jobs")), tmp_path)
+    yield engine
+    engine.close()
+
+
+def test_import_opens_nothing():
+    code = "import duckstack.main as m; print(m.engine.started)"
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert out.stdout.strip() == "False"
+
+
+def test_started_on_first_use_without_httpfs(engine):
+    assert not engine.started and engine.stats() == {"started": False, "start_seconds": 0.0}
+    with engine.query_pool.cursor() as cursor:
+        assert cursor.execute("SELECT 42").fetchone() == (42,)
+        engine.require_remote("SELECT * FROM 'local.parquet'")
+        loaded = cursor.execute("SELECT loaded FROM duckdb_extensions() WHERE extension_name = 'httpfs'").fetchone()
+    assert engine.started and engine.stats()["start_seconds"] > 0
+    assert loaded in (None, (False,))
+
+
+def test_forked_process_opens_its_own_database(engine, monkeypatch):
+    parent = engine.db
+    monkeypatch.setattr(engine_module.os, "getpid", lambda: -1)
+    assert not engine.started
+    child = engine.db
+    assert child is not parent and engine.started
+    assert child.execute("SELECT 1").fetchone() == (1,)
+    parent.close()
+
+
+def test_remote_support_failure_is_logged_and_retried(engine, monkeypatch, caplog):
+    calls = []
+
+    def fail(state):
+        calls.append(state)
+        raise duckdb.IOException("no network")
+
+    monkeypatch.setattr(engine, "_load_remote", fail)
+    with caplog.at_level(logging.ERROR, logger="duckstack.engine"):
+        engine.require_remote("SELECT * FROM 's3://bucket/a.parquet'")
+        engine.require_remote("SELECT * FROM 'https://example.com/a.parquet'")
+    assert len(calls) == 2 and "Loading remote file support failed" in caplog.text
+
+
+def test_warm_up_reads_registered_datasets(engine, tmp_path, caplog):
+    path = str(tmp_path / "events.parquet")
+    with engine.query_pool.cursor() as cursor:
+        cursor.execute(f"COPY (SELECT range AS id FROM range(10)) TO '{path}'")
+        views.register(cursor, {"name": "events", "path": path, "format": "parquet"})
+    with caplog.at_level(logging.INFO, logger="duckstack.engine"):
+        engine.warm_up(["events", "missing"])
+    assert "Warmed up dataset events (1 files)" in caplog.text
+    assert "Warm-up skipped unknown dataset missing" in caplog.text
+
+
+def test_parameter_values_can_require_remote_support(monkeypatch):
+    texts = []
+    monkeypatch.setattr(main.engine, "require_remote", lambda *t: texts.extend(t))
+    with main.engine.query_pool.cursor() as cursor:
+        main._execute(cursor, "SELECT $1::VARCHAR", ["s3://bucket/events.parquet"]).fetchall()
+    assert "s3://bucket/events.parquet" in texts
+
+
+def test_cached_remote_query_sets_up_remote_support_before_the_cache_key(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main.engine, "require_remote", lambda *texts: calls.append(("require_remote", texts)))
+    monkeypatch.setattr(main.query_cache, "fingerprint", lambda cursor, paths: calls.append(("fingerprint", paths)) or [])
+    body = {"sql": "SELECT * FROM read_parquet($1)", "params": ["s3://bucket/events.parquet"], "cache": True}
+    TestClient(main.app).post("/query", json=body)
+    assert [name for name, _ in calls][:2] == ["require_remote", "fingerprint"]
+    assert calls[0][1] == (body["sql"], "s3://bucket/events.parquet")
+
@@ -0,0 +1,64 @@
+"""Tests for background query jobs and paging through their results."""
+
+import time
+
+import duckdb
+import pytest
+
+from duckstack import jobs
+
+
+@pytest.fixture
+def manager(tmp_path):
+    db = duckdb.connect()
+    manager = jobs.JobManager(db, tmp_path, max_workers=1, max_queued=1, result_ttl=60, batch_size=100)
+    yield manager
+    manager.close()
+    db.close()
+
+
+def _wait(job, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while job.status in (jobs.QUEUED, jobs.RUNNING):
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.01)
+
+
+def test_results_are_paged_from_the_spilled_file(manager):
+    job = manager.submit("SELECT i, i * 2 AS double FROM range(250) t(i) ORDER BY i")
+    _wait(job)
+    assert job.status == jobs.SUCCEEDED and job.row_count == 250 and job.progress() == 100.0
+
+    page, total = jobs.read_page(job.path, 90, 20)
+    assert total == 250
+    assert page.column("i").to_pylist() == list(range(90, 110))
+    assert jobs.read_page(job.path, 300, 20)[0].num_rows == 0
+
+
+def test_failures_are_reported(manager):
+    job = manager.submit("SELECT * FROM missing_table")
+    _wait(job)
+    assert job.status == jobs.FAILED and "missing_table" in job.error
+
+
+def test_cancel_running_and_queued_jobs(manager, tmp_path):
+    slow = manager.submit("SELECT count(*) FROM range(10000000000) t(i) WHERE i % 7 = 3")
+    while slow.status == jobs.QUEUED:
+        time.sleep(0.01)
+    queued = manager.submit("SELECT 1")
+    with pytest.raises(jobs.JobQueueFull):
+        manager.submit("SELECT 2")
+
+    assert manager.delete(queued.id) and manager.delete(slow.id)
+    assert queued.status == slow.status == jobs.CANCELLED
+    assert manager.get(slow.id) is None
+    slow.future.result(timeout=10)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sweep_expires_finished_jobs(manager):
+    job = manager.submit("SELECT 1")
+    _wait(job)
+    job.finished_at -= 120
+    manager.sweep()
+    assert manager.get(job.id) is None and not job.path.exists()
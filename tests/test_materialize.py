@@ -0,0 +1,94 @@
+"""Tests for writing materialized datasets to parquet."""
+
+import datetime
+import os
+
+import duckdb
+import pytest
+
+from duckstack import materialize
+
+
+@pytest.fixture
+def cursor():
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE src (ts TIMESTAMP, v INTEGER)")
+    yield conn
+    conn.close()
+
+
+def _add(cursor, start, count):
+    cursor.execute(
+        "INSERT INTO src SELECT TIMESTAMP '2024-01-01' + INTERVAL (i) HOUR, i FROM range(?, ?) t(i)",
+        [start, start + count],
+    )
+
+
+def test_watermark_appends_only_new_rows(cursor, tmp_path):
+    _add(cursor, 0, 5)
+    columns, first, watermark, replace = materialize.run(cursor, tmp_path, "SELECT * FROM src;", "ts")
+    assert replace and first["row_count"] == 5 and watermark == "2024-01-01 04:00:00"
+    assert first["column_stats"]["v"] == {"min": "0", "max": "4", "null_count": 0}
+
+    _add(cursor, 5, 3)
+    _, second, watermark, replace = materialize.run(cursor, tmp_path, "SELECT * FROM src", "ts", watermark, columns)
+    assert not replace and second["row_count"] == 3 and watermark == "2024-01-01 07:00:00"
+
+    # Nothing new: no file is written and the watermark stays put
+    _, entry, same, _ = materialize.run(cursor, tmp_path, "SELECT * FROM src", "ts", watermark, columns)
+    assert entry is None and same == watermark
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        p.rsplit("/", 1)[-1] for p in (first["path"], second["path"])
+    )
+    assert cursor.execute(f"SELECT count(*) FROM '{tmp_path}/*.parquet'").fetchone() == (8,)
+
+
+def test_full_result_without_watermark_or_when_schema_changed(cursor, tmp_path):
+    _add(cursor, 0, 2)
+    columns, _, watermark, _ = materialize.run(cursor, tmp_path, "SELECT * FROM src", "ts")
+    _, entry, _, replace = materialize.run(cursor, tmp_path, "SELECT *, 1 AS extra FROM src", "ts", watermark, columns)
+    assert replace and entry["row_count"] == 2
+
+    _, entry, watermark, replace = materialize.run(cursor, tmp_path, "SELECT v FROM src WHERE v < 0")
+    # A recompute keeps an empty result, so the dataset still has a schema
+    assert replace and entry["row_count"] == 0 and watermark is None
+
+
+def test_unknown_watermark_column_is_rejected(cursor, tmp_path):
+    with pytest.raises(duckdb.BinderException):
+        materialize.run(cursor, tmp_path, "SELECT 1 AS x", "ts")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_is_due():
+    now = datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc)
+    refreshed = {"refresh_interval_seconds": 60, "refreshed_at": now - datetime.timedelta(seconds=30)}
+    assert not materialize.is_due(refreshed, now)
+    assert materialize.is_due(refreshed, now + datetime.timedelta(seconds=30))
+    assert materialize.is_due({"refresh_interval_seconds": 60, "refreshed_at": None}, now)
+    assert not materialize.is_due({"refresh_interval_seconds": 0, "refreshed_at": None}, now)
+
+
+def test_directory_stays_inside_the_root(tmp_path):
+    assert materialize.directory(tmp_path, "daily_sales") == tmp_path.resolve() / "daily_sales"
+    for name in ("/tmp/x", "..", "../escape", "a/b", "."):
+        with pytest.raises(ValueError):
+            materialize.directory(tmp_path, name)
+    materialize.remove_directory(tmp_path / "inner", "..")
+    assert tmp_path.exists()
+
+
+def test_superseded_files_are_removed_after_the_grace_period(tmp_path):
+    target = materialize.directory(tmp_path, "daily")
+    target.mkdir()
+    old, current, unlisted = (target / f"part-{i}.parquet" for i in range(3))
+    for path in (old, current, unlisted):
+        path.write_bytes(b"")
+        os.utime(path, (0, 0))
+    materialize.retire([str(old)])
+
+    # old was just superseded and unlisted is as good as new to the grace period; current is listed
+    os.utime(unlisted)
+    assert materialize.sweep(tmp_path, "daily", [str(current)], grace_seconds=60) == []
+    assert materialize.sweep(tmp_path, "daily", [str(current)], grace_seconds=0) == [str(old), str(unlisted)]
+    assert current.exists()
@@ -0,0 +1,42 @@
+"""Tests for request instrumentation and Prometheus rendering."""
+
+from duckstack import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = registry.histogram("t_seconds", "Test", ("endpoint",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.observe(value, "/q")
+    lines = registry.render().splitlines()
+    assert 't_seconds_bucket{endpoint="/q",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{endpoint="/q",le="1"} 3' in lines
+    assert 't_seconds_bucket{endpoint="/q",le="+Inf"} 4' in lines
+    assert 't_seconds_count{endpoint="/q"} 4' in lines
+
+
+def test_stats_collector_exports_gauges_counters_and_hit_ratio():
+    registry = metrics.Registry()
+    stats = {"entries": 3, "hits": 3, "misses": 1, "hit_rate": 0.75, "name": "x"}
+    registry.collector(metrics.stats_collector("c", "Cache", lambda: stats, counters=["hits", "misses"]))
+    lines = registry.render().splitlines()
+    assert "c_entries 3" in lines
+    assert "# TYPE c_hits_total counter" in lines and "c_hits_total 3" in lines
+    assert "c_hit_ratio 0.75" in lines
+    assert not any(line.startswith(("c_hit_rate", "c_name")) for line in lines)
+
+
+def test_phases_record_only_inside_an_instrumented_request():
+    with metrics.phase("execute"):
+        metrics.record_rows(5)
+    timings = metrics.RequestTimings("/q")
+    token = metrics._current.set(timings)
+    try:
+        for _ in range(2):
+            with metrics.phase("execute"):
+                pass
+        metrics.record_rows(5)
+    finally:
+        metrics._current.reset(token)
+    assert list(timings.phases) == ["execute"]
+    assert timings.rows == 5
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+import duckdb
+import pytest
+
+from duckstack.pool import CursorPool, PoolSaturated, QueryTimeout
+
+
+def _pool(**kwargs) -> CursorPool:
+    options = {"max_concurrency": 2, "max_queue": 1, "queue_timeout": 5.0}
+    options.update(kwargs)
+    return CursorPool(duckdb.connect(), **options)
+
+
+def test_cursors_are_isolated_and_reused():
+    pool = _pool()
+    with pool.cursor() as a, pool.cursor() as b:
+        assert a is not b
+        a.execute("SELECT 1")
+        b.execute("SELECT 2")
+        assert a.fetchall() == [(1,)]
+        assert b.fetchall() == [(2,)]
+    with pool.cursor() as c:
+        assert c is a or c is b
+    assert pool.in_use == 0
+
+
+def test_rejects_when_queue_is_full():
+    pool = _pool(max_concurrency=1, max_queue=0)
+    with pool.cursor():
+        with pytest.raises(PoolSaturated):
+            pool.acquire()
+
+
+def test_waiter_times_out():
+    pool = _pool(max_concurrency=1, queue_timeout=0.05)
+    with pool.cursor():
+        with pytest.raises(PoolSaturated):
+            pool.acquire()
+    assert pool.waiting == 0
+
+
+def test_waiter_is_admitted_on_release():
+    pool = _pool(max_concurrency=1)
+    held = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    pool.release(held)
+    waiter.join(timeout=5)
+    assert acquired == [held]
+
+
+def test_run_interrupts_past_deadline():
+    pool = _pool()
+
+    def work(cursor):
+        return cursor.execute("SELECT count(*) FROM range(10000000000) a").fetchall()
+
+    with pytest.raises(QueryTimeout):
+        asyncio.run(pool.run(work, timeout=0.1))
+    assert pool.in_use == 0
+    with pool.cursor() as cursor:
+        assert cursor.execute("SELECT 1").fetchall() == [(1,)]
+
+
+def test_run_returns_result_before_deadline():
+    pool = _pool()
+    result = asyncio.run(pool.run(lambda cursor: cursor.execute("SELECT 42").fetchall(), timeout=5))
+    assert result == [(42,)]
+
+
+def test_run_cancelled_while_queued_releases_its_cursor():
+    pool = _pool(max_concurrency=1)
+    held = pool.acquire()
+    ran = []
+
+    async def main():
+        task = asyncio.ensure_future(pool.run(ran.append))
+        while pool.waiting == 0:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0.01)
+        pool.release(held)
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The queued thread goes on to take the cursor after the task is gone
+        while pool.waiting:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert pool.in_use == 0 and not ran
@@ -0,0 +1,121 @@
+"""Tests for parquet statistics capture and file-level pruning of dataset views."""
+
+import datetime
+import json
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from duckstack import pruning, stats, views
+
+COLUMNS = [{"name": "id", "dtype": "BIGINT"}, {"name": "day", "dtype": "DATE"}, {"name": "note", "dtype": "VARCHAR"}]
+
+
+@pytest.fixture
+def cursor():
+    conn = duckdb.connect()
+    yield conn
+    conn.close()
+    views._registered.clear()
+
+
+@pytest.fixture
+def events(cursor, tmp_path):
+    # Three files with disjoint id and day ranges; the last has only null notes
+    for i in range(3):
+        pq.write_table(
+            pa.table(
+                {
+                    "id": [i * 10, i * 10 + 9],
+                    "day": [datetime.date(2024, i + 1, 1), datetime.date(2024, i + 1, 28)],
+                    "note": ["a", "b"] if i < 2 else pa.array([None, None], pa.string()),
+                }
+            ),
+            tmp_path / f"part-{i}.parquet",
+            row_group_size=1,
+        )
+    paths = views.resolve_files(cursor, str(tmp_path / "*.parquet"))
+    dataset = {
+        "name": "events",
+        "path": str(tmp_path / "*.parquet"),
+        "columns": COLUMNS,
+        "files": stats.collect(cursor, paths, COLUMNS),
+    }
+    views.register(cursor, dataset)
+    return dataset
+
+
+def test_collect_summarizes_every_row_group(events):
+    first = events["files"][0]
+    assert first["row_count"] == 2 and first["row_group_count"] == 2
+    assert first["column_stats"]["id"] == {"min": "0", "max": "9", "null_count": 0}
+    assert first["column_stats"]["day"]["max"] == "2024-01-28"
+    assert events["files"][2]["column_stats"]["note"] == {"min": None, "max": None, "null_count": 2}
+
+
+@pytest.mark.parametrize(
+    "sql, kept",
+    [
+        ("SELECT * FROM events WHERE id = 15", [1]),
+        ("SELECT * FROM events e WHERE e.id >= 20 AND note = 'x'", []),
+        ("SELECT * FROM events WHERE 10 > id", [0]),
+        ("SELECT * FROM events WHERE id BETWEEN 5 AND 12.5", [0, 1]),
+        ("SELECT * FROM events WHERE day IN (DATE '2024-03-05', '2024-01-01')", [0, 2]),
+        ("SELECT * FROM events WHERE note = 'a'", [0, 1]),
+        ("SELECT count(*) FROM (SELECT * FROM events WHERE id < 5) UNION ALL SELECT 1 FROM events WHERE id > 25", [0, 2]),
+    ],
+)
+def test_predicates_select_files(cursor, events, sql, kept):
+    tree = cursor.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0]
+    scans = pruning._scans(json.loads(tree), {"events"})
+    assert pruning.select_files(events, scans["events"]) == [events["files"][i]["path"] for i in kept]
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT * FROM events",
+        "SELECT * FROM events WHERE id = 1 OR id = 25",
+        "SELECT * FROM events JOIN events e2 USING (id) WHERE events.id = 1",
+        "SELECT * FROM events WHERE id = 1 UNION ALL SELECT * FROM events",
+        "SELECT * FROM events WHERE id = CAST(5.7 AS INTEGER)",
+        "DESCRIBE events",
+    ],
+)
+def test_unprunable_queries_read_every_file(cursor, events, sql):
+    assert pruning.shadow(cursor, sql) == []
+
+
+def test_shadow_views_are_scoped_to_one_query(cursor, events):
+    other = cursor.cursor()
+    sql = "SELECT id FROM events WHERE id > 25 ORDER BY id"
+    with pruning.pruned(cursor, sql):
+        assert cursor.execute(sql).fetchall() == [(29,)]
+        assert cursor.execute("SELECT count(*) FROM events").fetchone() == (2,)
+        # Other cursors keep seeing the full dataset
+        assert other.execute("SELECT count(*) FROM events").fetchone() == (6,)
+    assert cursor.execute("SELECT count(*) FROM events").fetchone() == (6,)
+
+    with pruning.pruned(cursor, "SELECT * FROM events WHERE id > 100"):
+        assert cursor.execute("SELECT * FROM events WHERE id > 100").fetchall() == []
+
+
+def test_parameters_prune_by_their_values(cursor, events):
+    sql = "SELECT id FROM events WHERE id > $1 AND day <= ?"
+    with pruning.pruned(cursor, sql, [25, "2024-03-31"]):
+        assert cursor.execute("SELECT count(*) FROM events").fetchone() == (2,)
+    assert pruning.shadow(cursor, "SELECT * FROM events WHERE id = $id", {"other": 1}) == []
+
+
+def test_partition_values_prune_like_exact_ranges():
+    columns = [{"name": "date", "dtype": "DATE"}, {"name": "region", "dtype": "VARCHAR"}]
+    files = [
+        stats.with_partition_stats({"path": "a", "row_count": 5}, {"date": "2024-06-01", "region": "eu"}),
+        stats.with_partition_stats({"path": "b", "row_count": 5}, {"date": "2024-06-02", "region": None}),
+    ]
+    dataset = {"name": "events", "path": "/lake", "columns": columns, "files": files}
+    assert pruning.select_files(dataset, [[("date", ">=", ["2024-06-02"])]]) == ["b"]
+    assert pruning.select_files(dataset, [[("region", "=", ["us"])]]) == []
+    assert files[1]["partition_values"] == {"date": "2024-06-02", "region": None}
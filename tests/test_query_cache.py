@@ -0,0 +1,14 @@
+from duckstack.query_cache import normalize_sql, referenced_paths
+
+
+def test_normalize_sql_collapses_whitespace_outside_literals():
+    sql = "SELECT  *\n  FROM 'a  b.parquet'\tWHERE name = 'x  y' ;"
+    assert normalize_sql(sql) == "SELECT * FROM 'a  b.parquet' WHERE name = 'x  y'"
+
+
+def test_referenced_paths_only_returns_file_like_literals():
+    sql = (
+        "SELECT * FROM read_parquet(['s3://bucket/events/*.parquet', 'local.parquet']) "
+        "WHERE dept = 'Engineering' AND note = 'it''s.csv'"
+    )
+    assert referenced_paths(sql) == ["it's.csv", "local.parquet", "s3://bucket/events/*.parquet"]
@@ -0,0 +1,82 @@
+"""Tests for the cross-process Arrow result cache."""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pyarrow as pa
+
+from duckstack import cache
+from duckstack.sharedcache import SharedCache
+
+TABLE = pa.table({"id": list(range(1000)), "name": [f"row {i}" for i in range(1000)]})
+
+
+def test_tables_written_by_one_process_are_read_by_another(tmp_path):
+    code = (
+        "import pyarrow as pa; from duckstack.sharedcache import SharedCache; "
+        f"SharedCache({str(tmp_path)!r}, 10**8).put('people', pa.table({{'name': ['Ada', 'Bo']}}), 60)"
+    )
+    subprocess.run([sys.executable, "-c", code], env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}, check=True)
+
+    table, fresh_for, expires_in = SharedCache(tmp_path, 10**8).get("people")
+    assert table.to_pydict() == {"name": ["Ada", "Bo"]}
+    assert table.schema.metadata is None
+    assert 0 < fresh_for <= 60 and expires_in == fresh_for
+
+
+def test_stale_window_and_expiry(tmp_path):
+    shared = SharedCache(tmp_path, 10**8)
+    shared.put("stale", TABLE, ttl_seconds=0, stale_seconds=60)
+    shared.put("gone", TABLE, ttl_seconds=0)
+    _, fresh_for, _ = shared.get("stale")
+    assert fresh_for <= 0
+    assert shared.get("gone") is None
+    assert shared.sweep() == 1
+    assert shared.stats()["entries"] == 1 and shared.stats()["expirations"] == 1
+
+
+def test_sweep_evicts_least_recently_read(tmp_path):
+    shared = SharedCache(tmp_path, max_bytes=10**8)
+    for key in ("a", "b", "c"):
+        shared.put(key, TABLE, 60)
+        time.sleep(0.01)
+    assert shared.sweep() == 0
+    size = shared.stats()["bytes"] // 3
+    shared.get("a")  # now "b" is the least recently read
+    shared.max_bytes = 2 * size + size // 2
+    assert shared.sweep() == 1
+    assert shared.get("b") is None and shared.get("a") is not None and shared.get("c") is not None
+    (tmp_path / "ab").mkdir()
+    (tmp_path / "ab" / "torn.arrow").write_bytes(b"not arrow")
+    assert shared.sweep() == 1  # unreadable files count as expired
+
+
+def test_module_cache_falls_back_to_shared_tier(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_shared", SharedCache(tmp_path, 10**8))
+    cache.put("query:abc", TABLE, 60)
+    cache.put("not-arrow", [1, 2], 60)
+    cache._cache.clear()  # as seen from another worker
+
+    assert cache.get("query:abc").equals(TABLE)
+    assert cache.get("not-arrow") is None
+    assert cache.shared_stats()["hits"] == 1
+    # Served from this process from now on
+    assert cache._cache.get("query:abc") is not None
+    cache.invalidate("query:abc")
+    assert cache.lookup("query:abc") is None
+
+
+def test_async_lookups_read_the_shared_tier(tmp_path, monkeypatch):
+    shared = SharedCache(tmp_path, 10**8)
+    monkeypatch.setattr(cache, "_shared", shared)
+    shared.put("people", TABLE, ttl_seconds=0, stale_seconds=60)
+
+    fresh_for = asyncio.run(cache.freshness("people"))
+    assert fresh_for <= 0 and shared.stats()["hits"] == 0
+    assert asyncio.run(cache.freshness("nobody")) is None
+    table, fresh_for = asyncio.run(cache.lookup_async("people"))
+    assert table.equals(TABLE) and fresh_for <= 0 and shared.stats()["hits"] == 1
+    cache.invalidate("people")
@@ -0,0 +1,29 @@
+"""Tests for the slow query log."""
+
+import logging
+
+import duckdb
+
+from duckstack.slowlog import SlowQueryLog
+
+SQL = "SELECT i % 7 AS r, count(*) FROM range(2000000) t(i) GROUP BY r"
+
+
+def test_slow_query_logged_with_operator_timings(caplog):
+    cursor = duckdb.connect()
+    log = SlowQueryLog(threshold_ms=0.001)
+    with caplog.at_level(logging.WARNING, logger="duckstack.slowlog"):
+        with log.watch(cursor, SQL):
+            cursor.execute(SQL).fetchall()
+    assert log.stats() == {"slow_queries": 1}
+    assert "HASH_GROUP_BY" in caplog.text and "rows scanned" in caplog.text
+
+
+def test_fast_queries_and_disabled_log_stay_quiet(caplog):
+    cursor = duckdb.connect()
+    with caplog.at_level(logging.WARNING, logger="duckstack.slowlog"):
+        for log in (SlowQueryLog(threshold_ms=60_000), SlowQueryLog(threshold_ms=0)):
+            with log.watch(cursor, "SELECT 1"):
+                cursor.execute("SELECT 1").fetchall()
+            assert log.stats() == {"slow_queries": 0}
+    assert caplog.text == ""
@@ -0,0 +1,47 @@
+"""Tests for the prepared statement cache behind parameterized queries."""
+
+import duckdb
+import pytest
+
+from duckstack import statements
+
+
+@pytest.fixture
+def cursor():
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE t AS SELECT i, 'name ' || i AS name FROM range(10) r(i)")
+    yield conn
+    conn.close()
+
+
+def test_templates_are_prepared_once_per_cursor(cursor):
+    cache = statements.StatementCache(max_per_cursor=4)
+    sql = "SELECT name FROM t WHERE i = $1"
+    assert [cache.execute(cursor, sql, [i]).fetchone()[0] for i in (1, 2, 3)] == ["name 1", "name 2", "name 3"]
+    other = cursor.cursor()
+    assert cache.execute(other, sql, [4]).fetchone() == ("name 4",)
+    assert cache.stats() == {"statements": 2, "hits": 2, "misses": 2, "evictions": 0, "hit_rate": 0.5}
+
+
+def test_least_recently_used_statements_are_deallocated(cursor):
+    cache = statements.StatementCache(max_per_cursor=2)
+    for sql in ("SELECT $1::INT + 1", "SELECT $1::INT + 2", "SELECT $1::INT + 3", "SELECT $1::INT + 1"):
+        cache.execute(cursor, sql, [1])
+    assert cache.stats()["evictions"] == 2 and cache.stats()["statements"] == 2
+    prepared = cursor.execute("SELECT count(*) FROM duckdb_prepared_statements()").fetchone()
+    assert prepared == (2,)
+
+
+def test_named_parameters_and_quoting(cursor):
+    cache = statements.StatementCache(max_per_cursor=4)
+    sql = "SELECT count(*) FROM t WHERE name = $name OR i > $min"
+    assert cache.execute(cursor, sql, {"name": "name 1' OR true --", "min": 8.5}).fetchone() == (1,)
+    assert cache.execute(cursor, "SELECT $1, $2, $3", [None, True, "it's"]).fetchone() == (None, True, "it's")
+    with pytest.raises(duckdb.InvalidInputException):
+        cache.execute(cursor, sql, {"name) ; DROP TABLE t; --": 1})
+
+
+def test_text_values():
+    assert statements.text_values(None) == []
+    assert statements.text_values(["s3://b/k.parquet", 1, None]) == ["s3://b/k.parquet"]
+    assert statements.text_values({"path": "https://x/y.csv", "n": 2.5}) == ["https://x/y.csv"]
@@ -0,0 +1,111 @@
+"""Tests for exposing catalog datasets to DuckDB as named views."""
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from duckstack import query_cache, views
+
+
+@pytest.fixture
+def cursor():
+    conn = duckdb.connect()
+    yield conn
+    conn.close()
+    views._registered.clear()
+
+
+def _write_parts(directory, count: int) -> None:
+    for i in range(count):
+        pq.write_table(pa.table({"id": [i], "name": [f"row{i}"]}), directory / f"part-{i}.parquet")
+
+
+def test_register_expands_globs_once(cursor, tmp_path):
+    _write_parts(tmp_path, 2)
+    files = views.register(cursor, {"name": "events", "path": str(tmp_path / "*.parquet")})
+    assert [f.rsplit("/", 1)[-1] for f in files] == ["part-0.parquet", "part-1.parquet"]
+
+    # A file appearing later isn't read until the dataset is registered again
+    pq.write_table(pa.table({"id": [9], "name": ["late"]}), tmp_path / "part-9.parquet")
+    assert cursor.execute("SELECT count(*) FROM events").fetchone() == (2,)
+    views.register(cursor, {"name": "events", "path": str(tmp_path / "*.parquet")})
+    assert cursor.execute("SELECT count(*) FROM events").fetchone() == (3,)
+
+
+def test_register_rejects_patterns_matching_nothing(cursor, tmp_path):
+    with pytest.raises(duckdb.IOException):
+        views.register(cursor, {"name": "empty", "path": str(tmp_path / "*.parquet")})
+
+
+def test_sync_adds_and_drops_views(cursor, tmp_path):
+    _write_parts(tmp_path, 1)
+    path = str(tmp_path / "part-0.parquet")
+    views.sync(cursor, [{"name": "a", "path": path}, {"name": "Weird \"name\"", "path": path}])
+    assert cursor.execute('SELECT name FROM "Weird ""name"""').fetchall() == [("row0",)]
+
+    views.sync(cursor, [{"name": "a", "path": path}, {"name": "broken", "path": str(tmp_path / "nope*.parquet")}])
+    assert set(views.registered()) == {"a"}
+    with pytest.raises(duckdb.CatalogException):
+        cursor.execute('SELECT * FROM "Weird ""name"""')
+
+
+def test_cache_key_tracks_files_behind_dataset_names(cursor, tmp_path):
+    _write_parts(tmp_path, 1)
+    views.register(cursor, {"name": "events", "path": str(tmp_path / "*.parquet")})
+    before = query_cache.cache_key(cursor, "SELECT * FROM Events")
+
+    pq.write_table(pa.table({"id": [1, 2], "name": ["x", "y"]}), tmp_path / "part-0.parquet")
+    assert query_cache.cache_key(cursor, "SELECT * FROM Events") != before
+
+
+def test_partitioned_dataset_layout():
+    dataset = {"name": "events", "path": "s3://lake/events/", "partition_columns": ["date", "region"]}
+    assert views.file_pattern(dataset) == "s3://lake/events/date=*/region=*/*.parquet"
+    assert views.file_pattern(dataset, {"date": "2024-06-01"}) == "s3://lake/events/date=2024-06-01/region=*/*.parquet"
+    assert views.partition_values(dataset, "s3://lake/k=v/date=2024-06-01/region=eu%20west/part-0.parquet") == {
+        "date": "2024-06-01",
+        "region": "eu west",
+    }
+    assert views.partition_values(dataset, f"/e/date={views.HIVE_NULL}/region=us/p.parquet")["date"] is None
+
+
+def test_partitioned_view_pins_partition_types(cursor, tmp_path):
+    for day, region in [("2024-01-01", "1"), ("2024-01-02", "eu")]:
+        directory = tmp_path / f"date={day}" / f"region={region}"
+        directory.mkdir(parents=True)
+        pq.write_table(pa.table({"v": [1]}), directory / "part-0.parquet")
+    dataset = {
+        "name": "events",
+        "path": str(tmp_path),
+        "partition_columns": ["date", "region"],
+        "columns": [{"name": "v", "dtype": "BIGINT"}, {"name": "date", "dtype": "DATE"}, {"name": "region", "dtype": "VARCHAR"}],
+    }
+    files = views.register(cursor, dataset)
+    assert len(files) == 2
+    # A view over the first file alone would infer region as a number
+    cursor.execute(f"CREATE TEMP VIEW first AS SELECT * FROM {views.reader_sql(dataset, files[:1])}")
+    assert cursor.execute("SELECT typeof(date), typeof(region) FROM first").fetchone() == ("DATE", "VARCHAR")
+
+
+def test_discover_splits_a_prefix_into_datasets(cursor, tmp_path):
+    for day in ("2024-01-01", "2024-01-02"):
+        (tmp_path / "events" / f"date={day}").mkdir(parents=True)
+        pq.write_table(pa.table({"id": [1]}), tmp_path / "events" / f"date={day}" / "part-0.parquet")
+    (tmp_path / "orders" / "2024").mkdir(parents=True)
+    _write_parts(tmp_path / "orders" / "2024", 2)
+    (tmp_path / "Web Logs.csv.gz").write_bytes(b"")
+    (tmp_path / "_SUCCESS").write_bytes(b"")
+    (tmp_path / "mixed").mkdir()
+    (tmp_path / "mixed" / "a.json").write_bytes(b"")
+    (tmp_path / "mixed" / "b.csv").write_bytes(b"")
+
+    root = str(tmp_path)
+    assert views.discover(cursor, root + "/") == [
+        {"name": "web_logs", "path": f"{root}/Web Logs.csv.gz"},
+        {"name": "events", "path": f"{root}/events", "partition_columns": ["date"]},
+        {"name": "mixed", "path": f"{root}/mixed", "error": "Mixed file formats: .csv, .json"},
+        {"name": "orders", "path": f"{root}/orders/**/*.parquet"},
+    ]
+    with pytest.raises(duckdb.IOException):
+        views.discover(cursor, root + "/nothing-here")